@@ -1,175 +1,631 @@
+import json
+import re
+from collections import Counter
+from json.encoder import encode_basestring_ascii
+from types import MappingProxyType
+
 from utils import get_logger
 
 
 _LOGGER = get_logger(__name__, info=True)
 
+# Jira rejects comment and description bodies longer than this many characters. Sizes are measured
+# in compact JSON, the encoding of encode_json and iter_json
+MAX_BODY_SIZE = 32767
+
+# node types each node type may contain
+# https://developer.atlassian.com/cloud/jira/platform/apis/document/structure/
+_INLINE_NODES = frozenset(('emoji', 'hardBreak', 'inlineCard', 'mention', 'text'))
+_TABLE_CELL_NODES = frozenset((
+    'blockquote', 'bulletList', 'codeBlock', 'heading', 'mediaGroup', 'orderedList', 'panel',
+    'paragraph', 'rule',
+))
+ALLOWED_CHILDREN = MappingProxyType({
+    'doc': frozenset((
+        'blockquote', 'bulletList', 'codeBlock', 'heading', 'mediaGroup', 'mediaSingle',
+        'orderedList', 'panel', 'paragraph', 'rule', 'table',
+    )),
+    'blockquote': frozenset(('bulletList', 'codeBlock', 'mediaGroup', 'mediaSingle', 'orderedList', 'paragraph')),
+    'bulletList': frozenset(('listItem',)),
+    'orderedList': frozenset(('listItem',)),
+    'listItem': frozenset(('bulletList', 'codeBlock', 'mediaSingle', 'orderedList', 'paragraph')),
+    'codeBlock': frozenset(('text',)),
+    'heading': _INLINE_NODES,
+    'paragraph': _INLINE_NODES,
+    'panel': frozenset(('bulletList', 'heading', 'orderedList', 'paragraph')),
+    'mediaGroup': frozenset(('media',)),
+    'mediaSingle': frozenset(('media',)),
+    'table': frozenset(('tableRow',)),
+    'tableRow': frozenset(('tableHeader', 'tableCell')),
+    'tableHeader': _TABLE_CELL_NODES,
+    'tableCell': _TABLE_CELL_NODES,
+})
+LEAF_NODES = frozenset(('emoji', 'hardBreak', 'inlineCard', 'media', 'mention', 'rule', 'text'))
+# nodes that don't count as content
+_EMPTY_NODES = frozenset(('hardBreak', 'rule'))
+# marks that can be applied to text nodes
+ALLOWED_MARKS = frozenset(('code', 'em', 'link', 'strike', 'strong', 'subsup', 'textColor', 'underline'))
+# marks each mark may not be combined with
+_MARK_CONFLICTS = MappingProxyType({
+    'code': ALLOWED_MARKS - {'code', 'link'},
+    'textColor': frozenset(('code', 'link')),
+})
+_MARKS_WITH_ATTRS = frozenset(('link', 'subsup', 'textColor'))
+# Markdown delimiters of the marks that have one, from the outermost to the innermost
+_MARKDOWN_DELIMITERS = MappingProxyType({'strike': '~~', 'strong': '**', 'em': '*', 'code': '`'})
+# the order in which marks that go on as long are opened, links being the outermost
+_MARK_ORDER = MappingProxyType({t: i for i, t in enumerate(('link',) + tuple(_MARKDOWN_DELIMITERS))})
+# text that would be read as Markdown syntax by ADF.from_markdown
+_MD_ESCAPE = re.compile(r'([\\`*_~\[\]<])')
+_MD_LINE_START = re.compile(r'(^|\n)([ \t]*)([#>+-]|\d{1,9}(?=[.)]))')
+_MD_BACKTICKS = re.compile(r'`+')
+_NO_KEYS = frozenset()
+
+# Markdown syntax understood by ADF.from_markdown
+# the info string of a backtick fence can't have backticks, ```a` b``` is a code span
+_MD_FENCE = re.compile(r'^ {0,3}(`{3,}(?!.*`)|~{3,})\s*([\w+-]*)')
+_MD_HEADING = re.compile(r'^ {0,3}(#{1,6})(?:\s+(.*?))?\s*#*\s*$')
+_MD_RULE = re.compile(r'^ {0,3}([-*_])(?:\s*\1){2,}\s*$')
+_MD_LIST_ITEM = re.compile(r'^(\s*)([-*+]|\d{1,9}[.)])\s+(.*)$')
+_MD_QUOTE = re.compile(r'^ {0,3}> ?(.*)$')
+_MD_TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$')
+_MD_INLINE = re.compile(
+    r'\\([\\`*_~\[\]()#>|!<+.-])'       # escaped character
+    r'|(`+)(.+?)\2'                         # code span
+    r'|\[([^\]]+)\]\(([^)\s]+)\)'            # link
+    r'|<(https?://[^>\s]+)>'                # autolink
+    r'|(\*\*|__|~~|\*|_)'                    # emphasis delimiters
+)
+_MD_DELIMITER_MARKS = {'**': 'strong', '__': 'strong', '*': 'em', '_': 'em', '~~': 'strike'}
+_MD_TEXT, _MD_DELIMITER, _MD_CODE, _MD_LINK, _MD_NODES = range(5)
+
+# instructions in the token stack of ADF.render, nodes are the other tokens
+_WRITE, _TEXT, _END_BLOCK, _PUSH_PREFIX, _POP_PREFIX, _CELL, _SEPARATOR, _LIST_ITEM = range(8)
+
+# shared by every node built by CompactADF that needs them, so they must never be mutated
+DEFAULT_TABLE_ATTRS = MappingProxyType({'isNumberColumnEnabled': False, 'layout': 'default'})
+EMPTY_ATTRS = MappingProxyType({})
+EMPTY_CONTENT = ()
+
+
+class ADFNode:
+    """An ADF node that keeps its fields in slots instead of a dict, which takes a fraction of the
+    memory of the equivalent dict when documents have tens of thousands of nodes.
+
+    Nodes support the dict operations used on ADF nodes (node['type'], 'marks' in node,
+    node.get('attrs'), node['marks'] = [...]), so they can be passed to the ADF methods. A key whose
+    value is None is treated as missing. Call to_dict to get the JSON-ready form.
+    """
+
+    __slots__ = ('type', 'attrs', 'content', 'text', 'marks')
+
+    def __init__(self, type, attrs=None, content=None, text=None, marks=None):
+        self.type = type
+        self.attrs = attrs
+        self.content = content
+        self.text = text
+        self.marks = marks
+
+    def keys(self):
+        keys = ['version'] if self.type == 'doc' else []
+        keys.extend(k for k in self.__slots__ if getattr(self, k) is not None)
+        return keys
+
+    def __getitem__(self, key):
+        if key == 'version' and self.type == 'doc':
+            return 1
+        if key in self.__slots__:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if isinstance(other, (ADFNode, dict)):
+            return self.to_dict() == _to_dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f"{k}={getattr(self, k)!r}" for k in self.__slots__ if getattr(self, k) is not None)
+        return f"ADFNode({fields})"
+
+    def to_dict(self):
+        """Returns the node and its descendants as new dicts and lists."""
+        return _to_dict(self)
+
+
+def _to_dict(node):
+    """Convert a tree of ADFNode and/or dict nodes to dicts, without recursion."""
+    root = {}
+    stack = [(node, root)]
+    while stack:
+        node, out = stack.pop()
+        if isinstance(node, ADFNode):
+            if node.type == 'doc':
+                out['version'] = 1
+            out['type'] = node.type
+            if node.attrs is not None:
+                out['attrs'] = dict(node.attrs)
+            content = node.content
+            if content is not None:
+                out['content'] = None
+            if node.text is not None:
+                out['text'] = node.text
+            if node.marks is not None:
+                out['marks'] = [dict(m) for m in node.marks]
+        else:
+            out.update(node)
+            if isinstance(out.get('attrs'), MappingProxyType):
+                out['attrs'] = dict(out['attrs'])
+            content = node.get('content')
+        if content is not None:
+            children = [{} for _ in content]
+            out['content'] = children
+            stack.extend(zip(content, children))
+    return root
+
+
+def iter_json(value, chunk_size=64 * 1024):
+    """Encode a JSON value that may contain ADFNode and dict nodes as a stream of chunks, without
+    building the whole string or converting ADFNode trees to dicts first. Works without recursion.
+
+    Args:
+        value: A JSON compatible value, such as an ADF document or a request payload containing one.
+
+    Kwargs:
+        chunk_size (int): The minimum size of the chunks, except the last one.
+
+    Yields:
+        bytes: UTF-8 encoded chunks of compact JSON
+    """
+    encode = _ENCODER.encode
+    buffer = []
+    size = 0
+    # tokens are either JSON text to write or values still to be encoded, in reverse order
+    stack = [value]
+    while stack:
+        token = stack.pop()
+        if isinstance(token, _Raw):
+            text = token.text
+        elif isinstance(token, ADFNode):
+            text = '{"version":1,"type":' if token.type == 'doc' else '{"type":'
+            text += encode_basestring_ascii(token.type)
+            if token.attrs is not None:
+                text += ',"attrs":' + encode(dict(token.attrs))
+            if token.text is not None:
+                text += ',"text":' + encode_basestring_ascii(token.text)
+            if token.marks is not None:
+                text += ',"marks":' + encode(token.marks)
+            if token.content is None:
+                text += '}'
+            else:
+                stack.append(_CLOSE_NODE)
+                stack.append(token.content)
+                text += ',"content":'
+        elif isinstance(token, (dict, MappingProxyType)):
+            if not token:
+                text = '{}'
+            else:
+                tokens = []
+                prefix = '{'
+                for k, v in token.items():
+                    key = prefix + encode_basestring_ascii(k) + ':'
+                    if k in _ADF_LEAF_KEYS:
+                        # these never contain nodes, let the C encoder do them in one call
+                        tokens.append(_Raw(key + encode(dict(v) if isinstance(v, MappingProxyType) else v)))
+                    else:
+                        tokens.append(_Raw(key))
+                        tokens.append(v)
+                    prefix = ','
+                tokens.append(_CLOSE_NODE)
+                stack.extend(reversed(tokens))
+                continue
+        elif isinstance(token, (list, tuple)):
+            if not token:
+                text = '[]'
+            else:
+                stack.append(_CLOSE_LIST)
+                for i in range(len(token) - 1, 0, -1):
+                    stack.append(token[i])
+                    stack.append(_COMMA)
+                stack.append(token[0])
+                text = '['
+        elif isinstance(token, str):
+            text = encode_basestring_ascii(token)
+        else:
+            text = encode(token)
+        buffer.append(text)
+        size += len(text)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def encode_json(value):
+    """Encode a JSON value that may contain ADFNode and dict nodes as compact JSON in one go.
+
+    This is the encoding the body size limits of ADF are measured in, so JiraClient sends
+    non-streamed ADF bodies with it rather than with the spaced separators of `json=`.
+
+    Returns:
+        bytes: UTF-8 encoded compact JSON, the same as the chunks of iter_json joined
+    """
+    return b''.join(iter_json(value))
+
+
+class _Raw:
+    """JSON text in the token stack of iter_json, as opposed to a string value to encode."""
+
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+_COMMA = _Raw(',')
+_CLOSE_LIST = _Raw(']')
+_CLOSE_NODE = _Raw('}')
+_ENCODER = json.JSONEncoder(separators=(',', ':'))
+# keys of ADF dict nodes whose values are plain JSON
+_ADF_LEAF_KEYS = frozenset(('type', 'version', 'text', 'attrs', 'marks'))
+
+
+class ADFJSONBody:
+    """A request body that streams a JSON payload containing ADF with iter_json.
+
+    Passed as `data` to requests, it is sent with chunked transfer encoding, so the encoded JSON
+    is never held in memory as a whole. Each iteration starts the encoding over, so a request can
+    be retried with the same body.
+    """
+
+    def __init__(self, payload, chunk_size=64 * 1024):
+        """
+        Args:
+            payload: The JSON compatible value to send.
+
+        Kwargs:
+            chunk_size (int): see iter_json.
+        """
+        self.payload = payload
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return iter_json(self.payload, chunk_size=self.chunk_size)
+
+
+def _render_markdown_text(text_nodes, in_cell=False):
+    """Render consecutive text nodes as Markdown, escaping their text.
+
+    Adjacent nodes with the same marks are rendered as one, a mark shared by adjacent nodes is
+    opened once around all of them, and the marks that go on the longest are opened first, so that
+    bold text with an italic word in it is `**a *b* c**` and not `**a *****b***** c**`. Whitespace
+    is moved outside the delimiters around it.
+    """
+    # the mark keys and texts of the runs of nodes with the same marks
+    run_keys = []
+    run_texts = []
+    for node in text_nodes:
+        marks = node.get('marks')
+        keys = _NO_KEYS
+        if marks:
+            keys = set()
+            for mark in marks:
+                mark_type = mark['type']
+                if mark_type == 'link':
+                    keys.add(('link', mark['attrs']['href']))
+                elif mark_type in _MARKDOWN_DELIMITERS:
+                    keys.add((mark_type, None))
+        if run_keys and run_keys[-1] == keys:
+            run_texts[-1].append(node['text'])
+        else:
+            run_keys.append(keys)
+            run_texts.append([node['text']])
+    if len(run_keys) == 1 and not run_keys[0]:
+        return _escape_markdown(''.join(run_texts[0]), False, in_cell)
+    # closes everything after the last run
+    run_keys.append(_NO_KEYS)
+    run_texts.append([])
+
+    parts = []
+    # (key, closing delimiter), from the outermost
+    open_marks = []
+    # whether the whitespace at the end of parts[-1] may be moved after closing delimiters
+    movable = False
+    for i, keys in enumerate(run_keys):
+        closing = opening = None
+        if open_marks:
+            depth = 0
+            while depth < len(open_marks) and open_marks[depth][0] in keys:
+                depth += 1
+            if len(keys) > depth and depth and open_marks[depth - 1][0][0] == 'code':
+                # nothing can be opened inside a code span
+                depth -= 1
+            if depth < len(open_marks):
+                closing = [delimiter for _, delimiter in reversed(open_marks[depth:])]
+                del open_marks[depth:]
+        if len(keys) > len(open_marks):
+            opening = []
+            new_keys = keys.difference(key for key, _ in open_marks) if open_marks else keys
+            if len(new_keys) > 1:
+                new_keys = sorted(new_keys, key=lambda key: (key[0] == 'code', -_extent(run_keys, i, key), _MARK_ORDER[key[0]]))
+            for key in new_keys:
+                if key[0] == 'link':
+                    href = key[1].replace(' ', '%20').replace(')', '%29')
+                    opening.append('[')
+                    open_marks.append((key, f"]({href})"))
+                    continue
+                delimiter = _MARKDOWN_DELIMITERS[key[0]]
+                if key[0] == 'code':
+                    # backticks can't be escaped in a code span, so its delimiter is longer than
+                    # any run of them inside it
+                    code = ''.join(''.join(texts) for texts in run_texts[i:i + _extent(run_keys, i, key)])
+                    delimiter *= max(map(len, _MD_BACKTICKS.findall(code)), default=0) + 1
+                opening.append(delimiter)
+                open_marks.append((key, delimiter))
+        in_code = ('code', None) in keys
+        text = _escape_markdown(''.join(run_texts[i]), in_code, in_cell)
+        if closing:
+            if movable:
+                # the whitespace at the end of the previous text goes after the closing delimiters
+                stripped = parts[-1].rstrip()
+                if stripped:
+                    closing.append(parts[-1][len(stripped):])
+                    parts[-1] = stripped
+            parts.append(''.join(closing))
+        if opening:
+            if not in_code:
+                stripped = text.lstrip()
+                if stripped:
+                    parts.append(text[:len(text) - len(stripped)])
+                    text = stripped
+            parts.append(''.join(opening))
+        parts.append(text)
+        movable = not in_code
+    return ''.join(parts)
+
+
+def _escape_markdown(text, in_code=False, in_cell=False):
+    if not in_code and _MD_ESCAPE.search(text):
+        text = _MD_ESCAPE.sub(r'\\\1', text)
+    if in_cell and '|' in text:
+        # escaped inside code spans as well, the cells of a row are split first
+        text = text.replace('|', '\\|')
+    return text
+
+
+def _markdown_inline(content, in_cell=False):
+    """Replace the runs of text nodes in inline content with (_TEXT, their Markdown) for render."""
+    if len(content) == 1 and content[0]['type'] == 'text' and not content[0].get('marks'):
+        return [(_TEXT, _escape_markdown(content[0]['text'], False, in_cell))]
+    tokens = []
+    run = []
+    for node in content:
+        if node['type'] == 'text':
+            run.append(node)
+            continue
+        if run:
+            tokens.append((_TEXT, _render_markdown_text(run, in_cell)))
+            run = []
+        tokens.append(node)
+    if run:
+        tokens.append((_TEXT, _render_markdown_text(run, in_cell)))
+    return tokens
+
+
+def _extent(run_keys, i, key):
+    """The number of runs from the i-th one that have the mark of key."""
+    j = i
+    while key in run_keys[j]:
+        j += 1
+    return j - i
+
+
+def _escape_line_starts(text, line_start):
+    """Escape what would start a heading, list or block quote at the start of the lines of text.
+    The start of text itself is only escaped if line_start is true.
+    """
+    def escape(match):
+        if not line_start and match.start() == 0 and not match.group(1):
+            return match.group(0)
+        marker = match.group(3)
+        if marker[0].isdigit():
+            return match.group(1) + match.group(2) + marker + '\\'
+        return match.group(1) + match.group(2) + '\\' + marker
+
+    return _MD_LINE_START.sub(escape, text)
+
 
 class ADF:
     """Class to help wrap and unwrap content in appropriate Atlassian Document Format nodes
     API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/structure/
     """
 
+    # set to False in a subclass to skip the checks of the adf_* methods, e.g. to build a large
+    # document fast and check it once with validate
+    check_children = True
+
+    @classmethod
+    def _validate_children(cls, node_type, content_list):
+        """Returns True if every node of content_list may be a child of a node_type node. Logs an
+        error otherwise.
+        """
+        if not cls.check_children:
+            return True
+        allowed = ALLOWED_CHILDREN[node_type]
+        invalid_types_present = [i['type'] for i in content_list if i['type'] not in allowed]
+        if invalid_types_present:
+            _LOGGER.error(f"{node_type} nodes may not have any of the following as children nodes: {invalid_types_present}")
+            return False
+        return True
+
     @staticmethod
-    def adf_doc(content_list=[]):
+    def validate(adf_node):
+        """Check a whole tree against the ADF structure in one pass, without recursion: the
+        children each node may have, the marks of text nodes and their combinations, and empty
+        text nodes.
+
+        Args:
+            adf_node (dict or ADFNode): Usually a `doc` node.
+
+        Returns:
+            list[str]: one message per violation, prefixed with the path of the node, e.g.
+                `doc.content[2].content[0]: ...`. Empty if the tree is valid.
+        """
+        violations = []
+        stack = [(adf_node, adf_node['type'], None)]
+        while stack:
+            node, path, parent_type = stack.pop()
+            node_type = node['type']
+            if parent_type is not None and node_type not in ALLOWED_CHILDREN[parent_type]:
+                violations.append(f"{path}: {parent_type} nodes may not contain {node_type} nodes")
+            if node_type == 'text':
+                if not node.get('text'):
+                    violations.append(f"{path}: text nodes may not be empty")
+                marks = node.get('marks') or ()
+                mark_types = [m['type'] for m in marks]
+                if marks and parent_type == 'codeBlock':
+                    violations.append(f"{path}: text in codeBlock nodes may not have marks")
+                for mark_type in dict.fromkeys(mark_types):
+                    if mark_type not in ALLOWED_MARKS:
+                        violations.append(f"{path}: unknown mark {mark_type}")
+                    elif _MARK_CONFLICTS.get(mark_type, frozenset()).intersection(mark_types):
+                        violations.append(f"{path}: {mark_type} marks may not be combined with {sorted(_MARK_CONFLICTS[mark_type].intersection(mark_types))} marks")
+                if len(set(mark_types)) != len(mark_types):
+                    violations.append(f"{path}: duplicate marks {mark_types}")
+            elif node.get('marks'):
+                violations.append(f"{path}: only text nodes may have marks")
+            content = node.get('content')
+            if node_type in ALLOWED_CHILDREN:
+                # pushed in reverse so violations are reported in document order
+                for i in range(len(content or ()) - 1, -1, -1):
+                    stack.append((content[i], f"{path}.content[{i}]", node_type))
+            elif node_type not in LEAF_NODES:
+                violations.append(f"{path}: unknown node type {node_type}")
+        return violations
+
+    @staticmethod
+    def _node(type, content=None, attrs=None, text=None, marks=None):
+        """Build a node from its fields. Overridden by CompactADF to build ADFNode instances."""
+        node = {'version': 1, 'type': type} if type == 'doc' else {'type': type}
+        if attrs is not None:
+            # copy shared read-only attrs so every dict node can be modified
+            node['attrs'] = dict(attrs) if isinstance(attrs, MappingProxyType) else attrs
+        if content is not None:
+            node['content'] = content
+        if text is not None:
+            node['text'] = text
+        if marks is not None:
+            node['marks'] = marks
+        return node
+
+    @staticmethod
+    def to_dict(adf_node):
+        """Returns a tree of ADFNode and/or dict nodes as new dicts and lists, ready to be sent to
+        Jira as JSON.
+        """
+        return _to_dict(adf_node)
+
+    @classmethod
+    def adf_doc(cls, content_list=[]):
         """Returns a `doc` node containing passed in content
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/doc/
         """
-        invalid_types_present = [i['type'] for i in content_list if i['type'] not in [
-            # valid types
-            'blockquote', 'bulletList', 'codeBlock', 'heading', 'mediaGroup', 
-            'mediaSingle', 'orderedList', 'panel', 'paragraph', 'rule', 'table',
-        ]]
-        if invalid_types_present:
-            _LOGGER.error(f"doc nodes may not have any of the following as children nodes: {invalid_types_present}")
+        if not cls._validate_children('doc', content_list):
             return None
-        return {
-            'version': 1,
-            'type': 'doc',
-            'content': content_list
-        }
+        return cls._node('doc', content=content_list)
 
-    @staticmethod
-    def adf_heading(text='', level=1):
+    @classmethod
+    def adf_heading(cls, text='', level=1):
         """Returns a `heading` node
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/heading/
         """
-        return {
-            'type': 'heading',
-            'attrs': {
-                'level': level
-            },
-            'content': [
-                {
-                    'type': 'text',
-                    'text': text
-                }
-            ]
-        }
+        return cls._node('heading', content=[cls.adf_text(text=text)], attrs={'level': level})
 
-    @staticmethod
-    def adf_paragraph(content_list=[]):
+    @classmethod
+    def adf_paragraph(cls, content_list=[]):
         """Returns a `paragraph` node containing passed in content
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/paragraph/
         """
-        # TODO: fix this
-        _LOGGER.debug(f"content_list: {content_list}")
-        invalid_types_present = []
-        for i in content_list:
-            _LOGGER.debug(f"item: {i}")
-            if i['type'] not in ['emoji', 'hardBreak', 'inlineCard', 'mention', 'text']:
-                invalid_types_present.append(i)
-        # invalid_types_present = [i['type'] for i in content_list if i['type'] not in [
-        #     # valid types
-        #     'emoji', 'hardBreak', 'inlineCard', 'mention', 'text',
-        # ]]
-        if invalid_types_present:
-            _LOGGER.error(f"paragraph nodes may not have any of the following as children nodes: {invalid_types_present}")
+        if not cls._validate_children('paragraph', content_list):
             return None
-        return {
-            'type': 'paragraph',
-            'content': content_list
-        }
+        return cls._node('paragraph', content=content_list)
 
-    @staticmethod
-    def adf_text(text=''):
+    @classmethod
+    def adf_text(cls, text=''):
         """Returns a `text` node
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/text/
         """
-        return {
-            'type': 'text',
-            'text': text,
-        }
+        return cls._node('text', text=text)
 
-    @staticmethod
-    def adf_br():
+    @classmethod
+    def adf_br(cls):
         """Returns a `hardBreak` node
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/hardBreak/
         """
-        return {
-            'type': 'hardBreak'
-        }
+        return cls._node('hardBreak')
 
-    @staticmethod
-    def adf_table(content_list=[]):
+    @classmethod
+    def adf_table(cls, content_list=[]):
         """Returns a `table` node
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/table/
         """
-        invalid_types_present = [i['type'] for i in content_list if i['type'] not in [
-            # valid types
-            'tableRow',
-        ]]
-        if invalid_types_present:
-            _LOGGER.error(
-                f"table nodes may not have any of the following as children nodes: {invalid_types_present}")
+        if not cls._validate_children('table', content_list):
             return None
-        return {
-            'type': 'table',
-            'attrs': {
-                'isNumberColumnEnabled': False,
-                'layout': 'default'
-            },
-            'content': content_list
-        }
+        return cls._node('table', content=content_list, attrs=DEFAULT_TABLE_ATTRS)
 
-    @staticmethod
-    def adf_table_row(content_list=[]):
+    @classmethod
+    def adf_table_row(cls, content_list=[]):
         """Returns a `tableRow` node
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/table_row/
         """
-        invalid_types_present = [i['type'] for i in content_list if i['type'] not in [
-            # valid types
-            'tableHeader', 'tableCell',
-        ]]
-        if invalid_types_present:
-            _LOGGER.error(
-                f"tableRow nodes may not have any of the following as children nodes: {invalid_types_present}")
+        if not cls._validate_children('tableRow', content_list):
             return None
-        return {
-            'type': 'tableRow',
-            'content': content_list
-        }
+        return cls._node('tableRow', content=content_list)
 
-    @staticmethod
-    def adf_table_header(content_list=[], attrs={}):
+    @classmethod
+    def adf_table_header(cls, content_list=[], attrs={}):
         """Returns a `tableHeader` node
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/table_header/
         """
-        invalid_types_present = [i['type'] for i in content_list if i['type'] not in [
-            # valid types
-            'blockquote', 'bulletList', 'codeBlock', 'heading', 'mediaGroup', 'orderedList',
-            'panel', 'paragraph', 'rule',
-        ]]
-        if invalid_types_present:
-            _LOGGER.error(
-                f"tableHeader nodes may not have any of the following as children nodes: {invalid_types_present}")
+        if not cls._validate_children('tableHeader', content_list):
             return None
-        return {
-            'type': 'tableHeader',
-            # TODO: should add in some validation for this
-            'attrs': attrs,
-            'content': content_list
-        }
+        # TODO: should add in some validation for attrs
+        return cls._node('tableHeader', content=content_list, attrs=attrs)
 
-    @staticmethod
-    def adf_table_cell(content_list=[], attrs={}):
+    @classmethod
+    def adf_table_cell(cls, content_list=[], attrs={}):
         """Returns a `tableCell` node
         API Documentation: https://developer.atlassian.com/cloud/jira/platform/apis/document/nodes/table_cell/
         """
-        invalid_types_present = [i['type'] for i in content_list if i['type'] not in [
-            # valid types
-            'blockquote', 'bulletList', 'codeBlock', 'heading', 'mediaGroup', 'orderedList',
-            'panel', 'paragraph', 'rule',
-        ]]
-        if invalid_types_present:
-            _LOGGER.error(
-                f"tableCell nodes may not have any of the following as children nodes: {invalid_types_present}")
+        if not cls._validate_children('tableCell', content_list):
             return None
-        return {
-            'type': 'tableCell',
-            # TODO: should add in some validation for this
-            'attrs': attrs,
-            'content': content_list
-        }
+        # TODO: should add in some validation for attrs
+        return cls._node('tableCell', content=content_list, attrs=attrs)
 
     @staticmethod
     def adf_mark(adf_text_node, mark, attr_value=None, attr_dict=None):
@@ -185,19 +641,21 @@ class ADF:
         if 'marks' not in adf_text_node:
             adf_text_node['marks'] = []
 
+        existing_marks = {i['type'] for i in adf_text_node['marks']}
+
         # avoid adding duplicate mark
-        if mark in [i['type'] for i in adf_text_node['marks']]:
+        if mark in existing_marks:
             _LOGGER.warning(f"{mark} mark already in node")
             return adf_text_node
 
         # avoid adding invalid combinations of marks
-        if mark == 'textColor' and [i['type'] for i in adf_text_node['marks'] if i['type'] in ['code', 'link']]:
+        if mark == 'textColor' and existing_marks & _MARK_CONFLICTS['textColor']:
             _LOGGER.warning(f"{mark} mark cannot be combined with code or link marks")
             return adf_text_node
-        if mark == 'code' and [i['type'] for i in adf_text_node['marks'] if i['type'] != 'link']:
+        if mark == 'code' and existing_marks - {'link'}:
             _LOGGER.warning(f"{mark} mark can only be combined with link marks")
             return adf_text_node
-        if mark != 'link' and [i['type'] for i in adf_text_node['marks'] if i['type'] == 'code']:
+        if mark != 'link' and 'code' in existing_marks:
             _LOGGER.warning(f"code mark can only be combined with link marks, not {mark} marks")
             return adf_text_node
 
@@ -205,7 +663,7 @@ class ADF:
         m = {'type': mark}
 
         # some marks take attr values
-        if mark in ['link', 'subsup', 'textColor']:
+        if mark in _MARKS_WITH_ATTRS:
             if attr_dict:
                 # NOTE: does not verify validity of this dict
                 m['attrs'] = attr_dict
@@ -225,7 +683,39 @@ class ADF:
         return adf_text_node
 
     @staticmethod
-    def split_doc_by_headings(adf_doc, smallest_heading_level=1):
+    def _heading_text(heading):
+        """Returns the text of the first node of a heading, or an empty string."""
+        content = heading.get('content')
+        return (content[0].get('text') or '') if content else ''
+
+    @classmethod
+    def iter_doc_sections(cls, adf_doc, smallest_heading_level=1):
+        """Yields the members of split_doc_by_headings one at a time, in a single pass over the
+        content of the doc. See split_doc_by_headings.
+        """
+        heading = None
+        section_content = []
+        for node in adf_doc['content'] or ():
+            if node['type'] == 'heading' and node['attrs']['level'] <= smallest_heading_level:
+                if heading is not None or section_content:
+                    yield {
+                        'heading': heading,
+                        'heading_text': cls._heading_text(heading) if heading is not None else '',
+                        'content': section_content
+                    }
+                heading = node
+                section_content = []
+            else:
+                section_content.append(node)
+        if heading is not None or section_content:
+            yield {
+                'heading': heading,
+                'heading_text': cls._heading_text(heading) if heading is not None else '',
+                'content': section_content
+            }
+
+    @classmethod
+    def split_doc_by_headings(cls, adf_doc, smallest_heading_level=1):
         """Returns a list of dictionaries with `heading` and `content` attrs both of which contain
         adf and also a `heading_text` attr which contains a string.
 
@@ -242,100 +732,638 @@ class ADF:
 
         Returns an empty list if content attr is falsy.
         """
+        return list(cls.iter_doc_sections(adf_doc, smallest_heading_level=smallest_heading_level))
 
-        # TODO: update all comments with consistent language about higher, lower, smaller, larger re heading levels
-        content = adf_doc['content']
-        if not content:
-            return []
-
-        split_content = []
-        next_member = {'heading': None, 'heading_text': '', 'content': []}
-        for i in range(len(content)):
-            _LOGGER.debug(f"Handling: {content[i]}")
-            _LOGGER.debug(f"split_content: {split_content}")
-            _LOGGER.debug(f"next_member: {next_member}")
-            # handle headings of specified level or higher
-            if content[i]['type'] == 'heading' and content[i]['attrs']['level'] <= smallest_heading_level:
-                
-                _LOGGER.debug(f"Is heading of specified level or higher")
-                # next member is new - set the heading of next member
-                if next_member == {'heading': None, 'heading_text': '', 'content': []}:
-                    _LOGGER.debug(f"Next member is new")
-                    next_member['heading'] = content[i]
-                    next_member['heading_text'] = content[i]['content'][0]['text']
-                    # handle last item - iterate
-                    if i == len(content) - 1:
-                        _LOGGER.debug(f"Handle last item - Iterate")
-                        split_content.append(next_member)
-                    continue
-                # next member already has a heading or content - iterate - and then set the heading of next member
-                elif next_member['heading'] or next_member['content']:
-                    _LOGGER.debug(f"Next member already has a heading")
-                    _LOGGER.debug(f"Iterate")
-                    split_content.append(next_member)
-                    next_member = {
-                        'heading': content[i],
-                        'heading_text': content[i]['content'][0]['text'],
-                        'content': []
-                    }
-                    # handle last item - iterate
-                    if i == len(content) - 1:
-                        _LOGGER.debug(f"Handle last item - Iterate")
-                        split_content.append(next_member)
-                    continue
-                else:
-                    _LOGGER.debug(f"Not handling this case")
-            
-            # handle non-headings or headings smaller than the threshold
-            else:
-                _LOGGER.debug(f"Is not heading or is smaller than specified level")
-                next_member['content'].append(content[i])
-                # handle last item - iterate
-                if i == len(content) - 1:
-                    _LOGGER.debug(f"Handle last item - Iterate")
-                    split_content.append(next_member)
+    @classmethod
+    def get_heading_outline(cls, adf_doc, smallest_heading_level=6):
+        """Returns the headings of a doc as a tree of sections, built in a single pass, so that any
+        section can be reached without scanning the doc again.
 
-        return split_content
+        A section starts at its heading and ends before the next heading of the same or a smaller
+        level, so it includes its subsections: adf_doc['content'][section['start']:section['end']]
+        is the whole section. Content before the first heading isn't part of any section.
+
+        Kwargs:
+            smallest_heading_level (int): Headings of larger levels are treated as content. See
+                split_doc_by_headings.
+
+        Returns:
+            list[dict]: the top level sections, each with the keys level, heading_text, heading
+                (the heading node), start and end (offsets into the content of the doc) and
+                children (the subsections, in the same form)
+        """
+        content = adf_doc['content'] or ()
+        outline = []
+        # sections that haven't ended yet, from the outermost to the innermost
+        open_sections = []
+        for i, node in enumerate(content):
+            if node['type'] != 'heading' or node['attrs']['level'] > smallest_heading_level:
+                continue
+            level = node['attrs']['level']
+            while open_sections and open_sections[-1]['level'] >= level:
+                open_sections.pop()['end'] = i
+            section = {
+                'level': level,
+                'heading_text': cls._heading_text(node),
+                'heading': node,
+                'start': i,
+                'end': None,
+                'children': [],
+            }
+            (open_sections[-1]['children'] if open_sections else outline).append(section)
+            open_sections.append(section)
+        for section in open_sections:
+            section['end'] = len(content)
+        return outline
+
+    @staticmethod
+    def walk(adf_node, with_paths=False):
+        """Yields every node of a tree in document order (depth first, parents before their
+        children), without recursion, so trees of any depth can be walked. Stop iterating to stop
+        the walk early.
+
+        Kwargs:
+            with_paths (bool): Yield (path, node) tuples, with paths in the form used by validate,
+                e.g. `doc.content[2].content[0]`.
+
+        Yields:
+            nodes, or (path, node) tuples
+        """
+        if not with_paths:
+            stack = [adf_node]
+            while stack:
+                node = stack.pop()
+                yield node
+                content = node.get('content')
+                if content:
+                    stack.extend(reversed(content))
+            return
+        stack = [(adf_node['type'], adf_node)]
+        while stack:
+            path, node = stack.pop()
+            yield path, node
+            content = node.get('content')
+            if content:
+                stack.extend((f"{path}.content[{i}]", content[i]) for i in range(len(content) - 1, -1, -1))
+
+    @classmethod
+    def visit(cls, adf_node, visitors):
+        """Call a function for every node of a tree, in document order, based on its type.
+
+        Args:
+            adf_node (dict or ADFNode): The root of the tree.
+            visitors (dict): node type to a function that takes the node. Nodes of other types are
+                walked but not passed to any function.
+        """
+        for node in cls.walk(adf_node):
+            visitor = visitors.get(node['type'])
+            if visitor is not None:
+                visitor(node)
+
+    @classmethod
+    def find_first(cls, adf_node, predicate):
+        """Returns the first node in document order for which predicate(node) is truthy, or None.
+        Nodes after it aren't visited.
+        """
+        for node in cls.walk(adf_node):
+            if predicate(node):
+                return node
+        return None
+
+    @classmethod
+    def collect_mentions(cls, adf_node):
+        """Returns the attrs of every `mention` node, in document order, e.g.
+        [{'id': '5b10ac8d82e05b22cc7d4ef5', 'text': '@Jane'}]
+        """
+        return [node['attrs'] for node in cls.walk(adf_node) if node['type'] == 'mention']
+
+    @classmethod
+    def collect_links(cls, adf_node):
+        """Returns the URLs of every `link` mark and `inlineCard`/`blockCard` node, in document
+        order.
+        """
+        links = []
+        for node in cls.walk(adf_node):
+            if node['type'] in ('inlineCard', 'blockCard'):
+                url = node.get('attrs', {}).get('url')
+                if url:
+                    links.append(url)
+            for mark in node.get('marks') or ():
+                if mark['type'] == 'link':
+                    links.append(mark['attrs']['href'])
+        return links
 
     @classmethod
-    def adf_node_is_empty(cls, adf_node):
+    def count_node_types(cls, adf_node):
+        """Returns a Counter of node type to the number of nodes of that type in the tree."""
+        return Counter(node['type'] for node in cls.walk(adf_node))
+
+    @staticmethod
+    def adf_node_is_empty(adf_node):
         """Establish a truthy/falsy value for any instance of an ADF node.
         hardBreak and rule nodes are falsy.
         Tables without content are falsy, but column headers count as content.
+        Nodes of unknown types are truthy unless they have content, which is then checked like
+        the content of any other node.
+
+        The tree is walked without recursion and the walk stops at the first non-empty node.
         """
-        # inline nodes
-        if adf_node['type'] in ['emoji', 'inlineCard', 'mention']:
-            return False
-        if adf_node['type'] == 'hardBreak':
-            return True
-        if adf_node['type'] == 'text':
-            return False if adf_node['text'] else True
+        stack = [adf_node]
+        while stack:
+            node = stack.pop()
+            node_type = node['type']
+            if node_type == 'text':
+                if node.get('text'):
+                    return False
+            elif node_type in _EMPTY_NODES:
+                continue
+            elif node_type in ALLOWED_CHILDREN or node.get('content') is not None:
+                stack.extend(node.get('content') or ())
+            else:
+                # emoji, inlineCard, media, mention and unknown leaves
+                return False
+        return True
 
-        # child nodes
-        if adf_node['type'] in ['media']:
-            return False
+    @staticmethod
+    def render(adf_node, markdown=False, out=None):
+        """Render a tree as plain text or Markdown, without recursion.
 
-        # top level nodes
-        if adf_node['type'] == 'heading':
-            return False if adf_node['content'][0]['text'] else True
-        if adf_node['type'] == 'rule':
-            return True
-        
-        # recursion required
-        if adf_node['type'] in [
-            'blockquote', 'bulletList', 'codeBlock', 'doc', 'listItem', 'mediaGroup', 'mediaSingle',
-            'orderedList', 'panel', 'paragraph', 'table', 'tableCell', 'tableHeader', 'tableRow'
-        ]:
-            if not adf_node['content']:
-                return True
+        Paragraphs, headings, lists, block quotes, code blocks, tables, mentions, emojis, smart
+        cards and the strike, strong, em, code and link marks are rendered. Media and other nodes
+        without text are skipped, and the text inside other unknown nodes is kept.
+
+        In plain text blocks are separated by a newline and table cells by a tab. In Markdown blocks
+        are separated by a blank line, and tables become pipe tables whose first row is the header.
+        Markdown syntax in the text is escaped, so that from_markdown gives the text back, and a
+        mark shared by adjacent text nodes is opened once around all of them.
+
+        Args:
+            adf_node (dict or ADFNode): Usually a `doc` node.
+
+        Kwargs:
+            markdown (bool): Render Markdown instead of plain text.
+            out (list): A buffer the rendered strings are appended to instead of being joined and
+                returned. Pass the same list for many documents to join them only once; a blank
+                line is written between a document and what the buffer already holds.
+
+        Returns:
+            str or None: the rendered text, or None if out is passed
+        """
+        buffer = [] if out is None else out
+        write = buffer.append
+        # another document was rendered into out before
+        separate = bool(buffer)
+        block_breaks = 2 if markdown else 1
+        # the prefix written at the start of every line, e.g. `> ` in a block quote
+        prefix = ''
+        prefixes = []
+        # the number of newlines owed before the next text, written lazily so that nothing
+        # trails the last block
+        breaks = 0
+        # the prefix of the blank lines between blocks, that of the block that ended
+        break_prefix = ''
+        # blocks in list items are separated by a single newline to keep lists tight
+        list_depth = 0
+        started = False
+        at_line_start = True
+        # nothing but a prefix or list markers written on the line yet, in Markdown text written
+        # there is escaped so that it doesn't start a heading, a list or a block quote
+        line_start = True
+        in_cell = False
+
+        stack = [adf_node]
+        while stack:
+            token = stack.pop()
+            if token.__class__ is tuple:
+                op, arg = token
+                if op == _WRITE or op == _TEXT:
+                    text = arg
+                elif op == _END_BLOCK:
+                    breaks = 1 if list_depth else arg
+                    break_prefix = prefix
+                    continue
+                elif op == _LIST_ITEM:
+                    list_depth += arg
+                    continue
+                elif op == _PUSH_PREFIX:
+                    prefixes.append(prefix)
+                    prefix += arg
+                    continue
+                elif op == _POP_PREFIX:
+                    prefix = prefixes.pop()
+                    continue
+                elif op == _CELL:
+                    in_cell = arg
+                    if not arg:
+                        # the blocks of a cell don't end the row
+                        breaks = 0
+                    continue
+                else:
+                    # _SEPARATOR: the line under the header row of a Markdown table
+                    text = '| ' + ' | '.join(['---'] * arg) + ' |'
             else:
-                non_empty_nodes = [i for i in adf_node['content'] if not cls.adf_node_is_empty(i)]
-                return False if non_empty_nodes else True
+                op = None
+                node_type = token['type']
+                if node_type == 'text':
+                    if markdown:
+                        op = _TEXT
+                        text = _render_markdown_text((token,), in_cell)
+                    else:
+                        text = token['text']
+                elif node_type == 'paragraph':
+                    stack.append((_END_BLOCK, block_breaks))
+                    content = token.get('content') or ()
+                    stack.extend(reversed(_markdown_inline(content, in_cell) if markdown else content))
+                    continue
+                elif node_type == 'heading':
+                    stack.append((_END_BLOCK, block_breaks))
+                    content = token.get('content') or ()
+                    stack.extend(reversed(_markdown_inline(content, in_cell) if markdown else content))
+                    if not markdown:
+                        continue
+                    text = '#' * token['attrs']['level'] + ' '
+                elif node_type == 'hardBreak':
+                    # a backslash makes the line break hard in Markdown
+                    text = '\\\n' if markdown else '\n'
+                elif node_type == 'mention':
+                    attrs = token.get('attrs') or {}
+                    text = attrs.get('text') or f"@{attrs.get('id', '')}"
+                elif node_type == 'emoji':
+                    attrs = token.get('attrs') or {}
+                    text = attrs.get('text') or attrs.get('shortName', '')
+                elif node_type in ('inlineCard', 'blockCard'):
+                    url = (token.get('attrs') or {}).get('url', '')
+                    text = f"<{url}>" if markdown else url
+                    if node_type == 'blockCard':
+                        stack.append((_END_BLOCK, block_breaks))
+                elif node_type in ('bulletList', 'orderedList'):
+                    stack.append((_END_BLOCK, block_breaks))
+                    items = token.get('content') or ()
+                    number = (token.get('attrs') or {}).get('order', 1)
+                    for i in range(len(items) - 1, -1, -1):
+                        marker = f"{number + i}. " if node_type == 'orderedList' else '- '
+                        stack.append((_END_BLOCK, 1))
+                        stack.append((_LIST_ITEM, -1))
+                        stack.append((_POP_PREFIX, None))
+                        stack.extend(reversed(items[i].get('content') or ()))
+                        stack.append((_PUSH_PREFIX, ' ' * len(marker)))
+                        stack.append((_LIST_ITEM, 1))
+                        stack.append((_WRITE, marker))
+                    continue
+                elif node_type == 'blockquote':
+                    stack.append((_END_BLOCK, block_breaks))
+                    if markdown:
+                        stack.append((_POP_PREFIX, None))
+                        stack.extend(reversed(token.get('content') or ()))
+                        stack.append((_PUSH_PREFIX, '> '))
+                    else:
+                        stack.extend(reversed(token.get('content') or ()))
+                    continue
+                elif node_type == 'codeBlock':
+                    stack.append((_END_BLOCK, block_breaks))
+                    if markdown:
+                        # the code is written as is, in a fence longer than any run of backticks in it
+                        code = ''.join(n.get('text', '') for n in token.get('content') or ())
+                        fence = '`' * max(3, max(map(len, _MD_BACKTICKS.findall(code)), default=0) + 1)
+                        stack.append((_WRITE, '\n' + fence))
+                        stack.append((_WRITE, code))
+                        language = (token.get('attrs') or {}).get('language') or ''
+                        text = f"{fence}{language}\n"
+                    else:
+                        stack.extend(reversed(token.get('content') or ()))
+                        continue
+                elif node_type == 'table':
+                    stack.append((_END_BLOCK, block_breaks))
+                    opening, between, closing = ('| ', ' | ', ' |') if markdown else ('', '\t', '')
+                    rows = token.get('content') or ()
+                    for r in range(len(rows) - 1, -1, -1):
+                        cells = rows[r].get('content') or ()
+                        if markdown and r == 0:
+                            stack.append((_END_BLOCK, 1))
+                            stack.append((_SEPARATOR, len(cells)))
+                        stack.append((_END_BLOCK, 1))
+                        stack.append((_WRITE, closing))
+                        for c in range(len(cells) - 1, -1, -1):
+                            stack.append((_CELL, False))
+                            stack.extend(reversed(cells[c].get('content') or ()))
+                            stack.append((_CELL, True))
+                            stack.append((_WRITE, between if c else opening))
+                    continue
+                elif node_type == 'rule':
+                    if not markdown:
+                        continue
+                    stack.append((_END_BLOCK, block_breaks))
+                    text = '---'
+                else:
+                    # doc, panel, expand, media and unknown nodes: only their content has text
+                    content = token.get('content')
+                    if content:
+                        stack.extend(reversed(content))
+                    continue
+
+            if breaks and started:
+                if in_cell:
+                    write(' ')
+                else:
+                    write('\n')
+                    for _ in range(breaks - 1):
+                        write(break_prefix.rstrip() + '\n')
+                    at_line_start = True
+                    line_start = True
+                breaks = 0
+            if op == _TEXT and (line_start or '\n' in text):
+                text = _escape_line_starts(text, line_start)
+            if op != _WRITE:
+                line_start = text.endswith('\n')
+            if '\n' in text:
+                text = text.replace('\n', ' ' if in_cell else '\n' + prefix)
+            if not started and separate:
+                write('\n\n')
+            if at_line_start:
+                if prefix:
+                    write(prefix)
+                at_line_start = False
+            write(text)
+            started = True
+
+        if out is None:
+            return ''.join(buffer)
+        return None
+
+    @classmethod
+    def to_text(cls, adf_node):
+        """Returns the plain text of a tree. See render."""
+        return cls.render(adf_node)
+
+    @classmethod
+    def to_markdown(cls, adf_node):
+        """Returns a tree rendered as Markdown. See render."""
+        return cls.render(adf_node, markdown=True)
 
     @classmethod
     def get_adf_comment_from_text(cls, text):
         return cls.adf_doc(content_list=[cls.adf_paragraph(content_list=[cls.adf_text(text=text)])])
 
+    @classmethod
+    def _compile_inline(cls, text, link=None):
+        """Tokenize one block of Markdown text into inline nodes in a single pass.
+
+        Emphasis delimiters toggle their mark. A delimiter that is never closed is kept as text and
+        doesn't mark the text after it.
+        """
+        # pieces are (kind, value, the indexes in pieces of the delimiters open at that point) and
+        # are only turned into nodes at the end, once it is known which delimiters were closed
+        pieces = []
+        # mark type to the index of its open delimiter
+        open_marks = {}
+        closed = set()
+
+        position = 0
+        for match in _MD_INLINE.finditer(text):
+            if match.start() > position:
+                pieces.append((_MD_TEXT, text[position:match.start()], tuple(open_marks.values())))
+            position = match.end()
+            escaped, _, code, link_text, href, autolink, delimiter = match.groups()
+            if escaped is not None:
+                pieces.append((_MD_TEXT, escaped, tuple(open_marks.values())))
+            elif code is not None:
+                pieces.append((_MD_CODE, code, None))
+            elif link_text is not None:
+                if link:
+                    # links can't be nested
+                    pieces.append((_MD_TEXT, match.group(0), tuple(open_marks.values())))
+                else:
+                    pieces.append((_MD_NODES, cls._compile_inline(link_text, link=href), None))
+            elif autolink is not None:
+                pieces.append((_MD_LINK, autolink, None))
+            else:
+                if delimiter[0] == '_' and text[match.start() - 1:match.start()].isalnum() and text[position:position + 1].isalnum():
+                    # underscores inside words, e.g. snake_case, aren't emphasis
+                    pieces.append((_MD_TEXT, delimiter, tuple(open_marks.values())))
+                    continue
+                mark_type = _MD_DELIMITER_MARKS[delimiter]
+                opener = open_marks.get(mark_type)
+                if opener is not None and pieces[opener][1] == delimiter:
+                    closed.add(opener)
+                    del open_marks[mark_type]
+                    continue
+                if opener is None:
+                    open_marks[mark_type] = len(pieces)
+                # kept as text unless it gets closed
+                pieces.append((_MD_DELIMITER, delimiter, tuple(i for i in open_marks.values() if i != len(pieces))))
+        if position < len(text):
+            pieces.append((_MD_TEXT, text[position:], tuple(open_marks.values())))
+
+        node = cls._node
+        link_marks = [{'type': 'link', 'attrs': {'href': link}}] if link else []
+        nodes = []
+        # the text and mark types of the text node being built, to merge adjacent pieces
+        buffer = []
+        buffer_marks = None
+        for i, (kind, value, active) in enumerate(pieces):
+            if kind == _MD_DELIMITER and i in closed:
+                continue
+            if kind == _MD_TEXT or kind == _MD_DELIMITER:
+                marks = tuple(_MD_DELIMITER_MARKS[pieces[o][1]] for o in active if o in closed)
+                if marks == buffer_marks:
+                    buffer.append(value)
+                    continue
+            if buffer:
+                marks_list = link_marks + [{'type': m} for m in buffer_marks]
+                nodes.append(node('text', text=''.join(buffer), marks=marks_list or None))
+                buffer = []
+                buffer_marks = None
+            if kind == _MD_TEXT or kind == _MD_DELIMITER:
+                buffer = [value]
+                buffer_marks = marks
+            elif kind == _MD_CODE:
+                # code can only be combined with link marks
+                nodes.append(node('text', text=value, marks=link_marks + [{'type': 'code'}]))
+            elif kind == _MD_LINK:
+                nodes.append(node('text', text=value, marks=link_marks or [{'type': 'link', 'attrs': {'href': value}}]))
+            else:
+                nodes.extend(value)
+        if buffer:
+            marks_list = link_marks + [{'type': m} for m in buffer_marks]
+            nodes.append(node('text', text=''.join(buffer), marks=marks_list or None))
+        return nodes
+
+    @classmethod
+    def _compile_blocks(cls, lines, in_quote=False):
+        """Compile Markdown lines into block nodes in a single pass. Inside a block quote,
+        headings, rules and tables aren't allowed by ADF and are kept as paragraph text.
+        """
+        node = cls._node
+        blocks = []
+        paragraph = []
+        # open lists, from the outermost: [indent, ordered, list node content, current listItem content]
+        lists = []
+        quote = []
+        i = 0
+
+        def flush_paragraph():
+            if not paragraph:
+                return
+            content = []
+            # soft wrapped lines are compiled together, joined by a space
+            wrapped = []
+            for j, line in enumerate(paragraph):
+                # a backslash escaping another one doesn't make a hard break
+                backslash_break = (len(line) - len(line.rstrip('\\'))) % 2 == 1
+                hard_break = (line.endswith('  ') or backslash_break) and j < len(paragraph) - 1
+                wrapped.append((line[:-1] if hard_break and backslash_break else line).strip())
+                if hard_break:
+                    content.extend(cls._compile_inline(' '.join(wrapped)))
+                    content.append(node('hardBreak'))
+                    wrapped = []
+            content.extend(cls._compile_inline(' '.join(wrapped)))
+            target = lists[-1][3] if lists else blocks
+            target.append(node('paragraph', content=content))
+            paragraph.clear()
+
+        def flush_quote():
+            if quote:
+                blocks.append(node('blockquote', content=cls._compile_blocks(quote, in_quote=True)))
+                quote.clear()
+
+        while i < len(lines):
+            line = lines[i]
+            i += 1
+            if quote:
+                match = _MD_QUOTE.match(line)
+                if match:
+                    quote.append(match.group(1))
+                    continue
+                if line.strip():
+                    # lazy continuation of the quoted paragraph
+                    quote.append(line)
+                    continue
+                flush_quote()
+                continue
+            if not line.strip():
+                flush_paragraph()
+                if i < len(lines) and not _MD_LIST_ITEM.match(lines[i]) and not lines[i].startswith(' '):
+                    lists.clear()
+                continue
+
+            fence = _MD_FENCE.match(line)
+            if fence:
+                flush_paragraph()
+                lists.clear()
+                code_lines = []
+                # closed by a line of at least as many of the same fence characters
+                while i < len(lines) and not (lines[i].strip().startswith(fence.group(1)) and not lines[i].strip().strip(fence.group(1)[0])):
+                    code_lines.append(lines[i])
+                    i += 1
+                # skip the closing fence
+                i += 1
+                code = '\n'.join(code_lines)
+                attrs = {'language': fence.group(2)} if fence.group(2) else None
+                blocks.append(node('codeBlock', content=[node('text', text=code)] if code else [], attrs=attrs))
+                continue
+
+            if not in_quote:
+                heading = _MD_HEADING.match(line)
+                if heading:
+                    flush_paragraph()
+                    lists.clear()
+                    blocks.append(node(
+                        'heading',
+                        content=cls._compile_inline(heading.group(2) or ''),
+                        attrs={'level': len(heading.group(1))}
+                    ))
+                    continue
+                if _MD_RULE.match(line) and not paragraph:
+                    lists.clear()
+                    blocks.append(node('rule'))
+                    continue
+                if '|' in line and i < len(lines) and _MD_TABLE_SEPARATOR.match(lines[i]) and '-' in lines[i]:
+                    flush_paragraph()
+                    lists.clear()
+                    rows = [line]
+                    i += 1
+                    while i < len(lines) and '|' in lines[i] and lines[i].strip():
+                        rows.append(lines[i])
+                        i += 1
+                    table_rows = []
+                    for r, row in enumerate(rows):
+                        cells = re.split(r'(?<!\\)\|', row.strip().strip('|'))
+                        cell_type = 'tableHeader' if r == 0 else 'tableCell'
+                        # as in GFM, an escaped pipe is a pipe even inside a code span
+                        table_rows.append(node('tableRow', content=[
+                            node(cell_type, content=[node('paragraph', content=cls._compile_inline(c.strip().replace('\\|', '|')))], attrs={})
+                            for c in cells
+                        ]))
+                    blocks.append(node('table', content=table_rows, attrs=DEFAULT_TABLE_ATTRS))
+                    continue
+
+            quoted = _MD_QUOTE.match(line)
+            if quoted and not paragraph:
+                lists.clear()
+                quote.append(quoted.group(1))
+                continue
+
+            item = _MD_LIST_ITEM.match(line)
+            if item:
+                flush_paragraph()
+                indent = len(item.group(1).expandtabs(4))
+                marker = item.group(2)
+                ordered = marker[0].isdigit()
+                while lists and lists[-1][0] > indent:
+                    lists.pop()
+                if lists and lists[-1][0] == indent and lists[-1][1] != ordered:
+                    lists.pop()
+                if not lists or lists[-1][0] < indent:
+                    items = []
+                    attrs = None
+                    if ordered and int(marker[:-1]) != 1:
+                        attrs = {'order': int(marker[:-1])}
+                    list_node = node('orderedList' if ordered else 'bulletList', attrs=attrs)
+                    # set after the node is built, CompactADF would replace an empty list with a
+                    # shared tuple
+                    list_node['content'] = items
+                    (lists[-1][3] if lists else blocks).append(list_node)
+                    lists.append([indent, ordered, items, None])
+                item_content = []
+                list_item = node('listItem')
+                list_item['content'] = item_content
+                lists[-1][2].append(list_item)
+                lists[-1][3] = item_content
+                paragraph.append(item.group(3))
+                continue
+
+            paragraph.append(line)
+
+        flush_paragraph()
+        flush_quote()
+        return blocks
+
+    @classmethod
+    def from_markdown(cls, markdown):
+        """Compile a Markdown subset into a `doc` node in a single pass over the lines.
+
+        Supported: ATX headings (# Heading), paragraphs whose soft wrapped lines are joined by a
+        space, hard line breaks (a line ending with two spaces or a backslash), bullet and ordered
+        lists with nesting by indentation, block quotes, code blocks fenced by three or more
+        backticks or tildes, pipe tables whose first row is the header, rules, and the
+        **strong**, *em*, ~~strike~~, `code`, [link](url) and <url> inline syntax. Anything else is
+        kept as text.
+
+        Nodes are built directly, without the checks of the adf_* methods. The result is valid
+        ADF; check it with validate if in doubt.
+
+        Args:
+            markdown (str): The Markdown text.
+
+        Returns:
+            a `doc` node
+        """
+        return cls._node('doc', content=cls._compile_blocks(markdown.splitlines()))
+
+    @classmethod
+    def get_adf_comment_from_markdown(cls, markdown):
+        return cls.from_markdown(markdown)
+
     @classmethod
     def convert_text_to_adf_paragraph(cls, text):
         if text:
@@ -344,31 +1372,82 @@ class ADF:
         else:
             return cls.adf_paragraph()
 
+    @staticmethod
+    def _json_size(adf_node):
+        """Returns the length of the compact JSON of a node, as sent by encode_json and iter_json."""
+        return len(_ENCODER.encode(_to_dict(adf_node)))
+
     @classmethod
-    def convert_dateframe_to_adf(cls, df):
-        _LOGGER.warning(
-            f"This function (ADF.convert_dateframe_to_adf) is brittle and will likely break if large or irregular DataFrames are passed in.")
-        # adf content list
-        t_content_list = []
-        # get columns
-        columns = df.columns.to_list()
-        tr_headers = [cls.adf_table_header(content_list=[cls.convert_text_to_adf_paragraph(str(c))])
+    def iter_dataframe_tables(cls, df, max_size=None, include_index=False):
+        """Convert a DataFrame to `table` nodes, one row per DataFrame row after a header row of
+        the column names. Every value is converted to a string.
+
+        Each column is converted to strings in one call and rows are read positionally, so
+        duplicate or non-default index labels don't matter. Cells are built directly instead of
+        through the validating adf_* methods, and all empty cells are the same node, so the result
+        must not be modified in place.
+
+        Kwargs:
+            max_size (int): Start a new table, repeating the header row, before the compact JSON of
+                a table would exceed this many characters. A row that doesn't fit on its own gets a
+                table to itself. Defaults to a single table.
+            include_index (bool): Add the index as the first column.
+
+        Yields:
+            table nodes
+        """
+        columns = [str(c) for c in df.columns]
+        # iloc instead of df[column] so duplicate column names each get their own values
+        column_values = [df.iloc[:, i].astype(str).tolist() for i in range(len(columns))]
+        if include_index:
+            columns.insert(0, str(df.index.name) if df.index.name is not None else '')
+            column_values.insert(0, df.index.astype(str).tolist())
+
+        attrs = {}
+        node = cls._node
+        empty_cell = node('tableCell', content=[node('paragraph', content=[])], attrs=attrs)
+        header_row = cls.adf_table_row(content_list=[
+            cls.adf_table_header(content_list=[cls.convert_text_to_adf_paragraph(c)], attrs=attrs)
             for c in columns
-        ]
-        t_content_list.append(cls.adf_table_row(content_list=tr_headers))
-        # convert all data to strings
-        df_str = df.astype(str)
-        # convert each df row to adf
-        # TODO: compare with `for i in range(df_str.index.stop):`
-        for i in range(len(df_str.index)):
-            # convert each cell in a df row to adf
-            tr_i = [cls.adf_table_cell(content_list=[cls.convert_text_to_adf_paragraph(c)])
-                for c in df_str.loc[df_str.index[i]]
-            ]
-            # wrap in row adf and add to list
-            t_content_list.append(cls.adf_table_row(content_list=tr_i))
-        t = cls.adf_table(content_list=t_content_list)
-        return t
+        ])
+
+        if max_size:
+            # sizes are worked out from the templates instead of serializing every row
+            empty_cell_size = cls._json_size(empty_cell)
+            # the text of a cell is added as a JSON string to the size of a cell with no text
+            text_cell_size = cls._json_size(node('tableCell', content=[node('paragraph', content=[node('text', text='')])], attrs=attrs)) - 2
+            row_size = cls._json_size(node('tableRow', content=[])) + max(len(columns) - 1, 0)
+            table_size = cls._json_size(cls.adf_table(content_list=[])) + cls._json_size(header_row)
+            size = table_size
+
+        tables = 0
+        rows = [header_row]
+        for values in zip(*column_values):
+            row = node('tableRow', content=[
+                node('tableCell', content=[node('paragraph', content=[node('text', text=v)])], attrs=attrs)
+                if v else empty_cell
+                for v in values
+            ])
+            if max_size:
+                size_of_row = row_size + 1 + sum(
+                    text_cell_size + len(encode_basestring_ascii(v)) if v else empty_cell_size
+                    for v in values
+                )
+                if len(rows) > 1 and size + size_of_row > max_size:
+                    yield cls.adf_table(content_list=rows)
+                    tables += 1
+                    rows = [header_row]
+                    size = table_size
+                size += size_of_row
+            rows.append(row)
+        # an empty DataFrame still gets a table with the header row
+        if len(rows) > 1 or not tables:
+            yield cls.adf_table(content_list=rows)
+
+    @classmethod
+    def convert_dateframe_to_adf(cls, df):
+        """Returns a `table` node of a DataFrame. See iter_dataframe_tables."""
+        return next(cls.iter_dataframe_tables(df))
 
     @classmethod
     def construct_adf_comment_with_dataframe(
@@ -389,6 +1468,78 @@ class ADF:
             adf_content.append(cls.convert_text_to_adf_paragraph(post_table_text))
         return cls.adf_doc(content_list=adf_content)
 
+    @classmethod
+    def construct_adf_comments_with_dataframe(
+        cls,
+        df,
+        heading=None,
+        heading_level=1,
+        pre_table_text=None,
+        post_table_text=None,
+        max_size=MAX_BODY_SIZE,
+        include_index=False
+    ):
+        """Like construct_adf_comment_with_dataframe, but splits the table over as many `doc` nodes
+        as needed to keep each one under max_size characters of compact JSON. The heading and
+        pre_table_text are in the first doc and post_table_text is in the last one.
+
+        Kwargs:
+            max_size (int): see iter_dataframe_tables. Defaults to the body size limit of Jira.
+            include_index (bool): see iter_dataframe_tables.
+
+        Returns:
+            list: doc nodes
+        """
+        before = []
+        if heading:
+            before.append(cls.adf_heading(text=heading, level=heading_level))
+        if pre_table_text:
+            before.append(cls.convert_text_to_adf_paragraph(pre_table_text))
+        after = [cls.convert_text_to_adf_paragraph(post_table_text)] if post_table_text else []
+        # leave room for the nodes around the table in the first and last docs
+        overhead = cls._json_size(cls.adf_doc(content_list=before + after)) + 2
+        tables = cls.iter_dataframe_tables(df, max_size=max_size - overhead, include_index=include_index)
+        docs = [cls.adf_doc(content_list=[t]) for t in tables]
+        docs[0] = cls.adf_doc(content_list=before + docs[0]['content'])
+        docs[-1] = cls.adf_doc(content_list=docs[-1]['content'] + after)
+        if len(docs) > 1:
+            _LOGGER.info(f"Split a DataFrame of {len(df.index)} rows over {len(docs)} docs")
+        return docs
+
+class CompactADF(ADF):
+    """ADF whose adf_* methods, and every method built on them such as
+    construct_adf_comment_with_dataframe, return ADFNode instances instead of dicts.
+
+    Empty content, empty attrs and the default table attrs are shared read-only objects instead of
+    being allocated for every node. Pass the result through ADF.to_dict before sending it to Jira.
+
+    Example:
+        doc = CompactADF.construct_adf_comment_with_dataframe(df, heading='Report')
+        body = ADF.to_dict(doc)
+    """
+
+    @staticmethod
+    def _node(type, content=None, attrs=None, text=None, marks=None):
+        if content is not None and not content:
+            content = EMPTY_CONTENT
+        if attrs is not None and not attrs:
+            attrs = EMPTY_ATTRS
+        return ADFNode(type, attrs=attrs, content=content, text=text, marks=marks)
+
+
+class TrustedADF(ADF):
+    """ADF that skips the child checks of the adf_* methods. Check the finished document once with
+    ADF.validate instead.
+    """
+
+    check_children = False
+
+
+class TrustedCompactADF(CompactADF):
+    """CompactADF that skips the child checks of the adf_* methods, see TrustedADF."""
+
+    check_children = False
+
 
 if __name__ == '__main__':
     pass
@@ -0,0 +1,528 @@
+"""
+
+asyncio version of JiraClient. All calls share a single aiohttp connection pool.
+
+Jira API Documentation: https://developer.atlassian.com/cloud/jira/platform/rest/v3/intro/
+
+"""
+
+import asyncio
+import os
+
+import aiohttp
+
+from jira_client import JiraClient
+from rate_limiter import IDEMPOTENT_METHODS
+from rate_limiter import RETRY_STATUS_CODES
+from rate_limiter import RateLimiter
+from rate_limiter import backoff_delay
+from utils import get_logger
+
+
+_JIRA_USER = os.environ.get('JIRA_USER')
+_JIRA_API_TOKEN = os.environ.get('JIRA_API_TOKEN')
+_JIRA_URL = os.environ.get('JIRA_URL')
+
+_LOGGER = get_logger('async_jira_client')
+
+
+def _encode_params(params):
+    """aiohttp only accepts str, int and float query parameter values."""
+    if not params:
+        return params
+    return {k: str(v).lower() if isinstance(v, bool) else v for k, v in params.items()}
+
+
+class AsyncJiraClient:
+    """Mirrors the methods of JiraClient as coroutines. Use it as an async context manager, or
+    await close() when done, so the connection pool is released.
+
+    Methods that return a response in JiraClient return an aiohttp.ClientResponse whose body has
+    already been read, so `await response.json()` and `await response.text()` can still be used
+    after the call. Note that aiohttp uses `response.status` rather than `response.status_code`.
+    """
+
+    def __init__(
+        self,
+        user=_JIRA_USER,
+        api_token=_JIRA_API_TOKEN,
+        url=_JIRA_URL,
+        page_workers=1,
+        max_workers=8,
+        connection_limit=100,
+        connection_limit_per_host=0,
+        keep_alive=True,
+        compress=True,
+        connect_timeout=10,
+        read_timeout=60,
+        rate_limiter=None,
+        requests_per_second=10,
+        max_retries=4
+    ):
+        """
+        Kwargs:
+            user (str): The Jira user (email address) used to authenticate.
+            api_token (str): The API token of the user.
+            url (str): The base url of the Jira instance.
+            page_workers (int): The number of pages of a paginated call that may be fetched at the
+                same time. Defaults to 1, which fetches pages one after another.
+            max_workers (int): The number of calls bulk methods may have in flight at the same
+                time, e.g. the number of groups whose members are fetched concurrently.
+            connection_limit (int): The maximum number of open connections in the pool.
+            connection_limit_per_host (int): The maximum number of open connections per host. 0
+                means no limit other than connection_limit.
+            keep_alive (bool): Reuse connections between calls. Set to False to close every
+                connection after its call.
+            compress (bool): Ask for gzip/deflate compressed responses.
+            connect_timeout (float): Seconds to wait for a connection to be established. None waits
+                forever.
+            read_timeout (float): Seconds to wait for the server to send data. None waits forever.
+            rate_limiter (RateLimiter): The limiter every call is paced by. It can be shared with
+                JiraClient instances. Defaults to a new RateLimiter.
+            requests_per_second (float): The rate of the default RateLimiter. Ignored if
+                rate_limiter is passed.
+            max_retries (int): The number of times a throttled or failed idempotent call is retried.
+        """
+        self._headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip, deflate' if compress else 'identity',
+        }
+        self._auth = None
+        if hasattr(aiohttp, 'encode_basic_auth'):
+            # aiohttp 3.14 deprecates BasicAuth in favour of encode_basic_auth
+            self._headers['Authorization'] = aiohttp.encode_basic_auth(user or '', api_token or '')
+        else:
+            self._auth = aiohttp.BasicAuth(user or '', api_token or '')
+        self._connection_limit = connection_limit
+        self._connection_limit_per_host = connection_limit_per_host
+        self._keep_alive = keep_alive
+        self._timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self._session = None
+        self.url = url
+        self.url_api_3 = f"{self.url}/rest/api/3"
+        self.url_agile_1 = f"{self.url}/rest/agile/1.0"
+        self.page_workers = page_workers
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or RateLimiter(rate=requests_per_second)
+        self.max_retries = max_retries
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Close the connection pool."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # the session has to be created while the event loop is running
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._connection_limit,
+                    limit_per_host=self._connection_limit_per_host,
+                    force_close=not self._keep_alive
+                ),
+                headers=self._headers,
+                auth=self._auth,
+                timeout=self._timeout
+            )
+        return self._session
+
+    async def _request(self, method, url, params=None, json=None, idempotent=None):
+        """Send a request through the shared connection pool, paced by the client's rate limiter.
+        Retries work the same way as in JiraClient._request.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The full url of the API endpoint.
+
+        Kwargs:
+            params (dict): URL parameters.
+            json (dict): json encoded body parameters.
+            idempotent (bool): Whether the request may be retried. Defaults to True for GET, HEAD,
+                OPTIONS, PUT and DELETE requests.
+
+        Returns:
+            aiohttp.ClientResponse: The response, with its body already read
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        max_retries = self.max_retries if idempotent else 0
+        attempt = 0
+        while True:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                async with self._get_session().request(method, url, params=_encode_params(params), json=json) as response:
+                    await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                _LOGGER.warning(f"{method} {url} failed: {e!r}. Retrying in {delay:.1f}s")
+            else:
+                retry_after = self.rate_limiter.update_from_headers(response.headers, response.status)
+                if response.status not in RETRY_STATUS_CODES or attempt >= max_retries:
+                    return response
+                delay = backoff_delay(attempt, retry_after=retry_after)
+                if response.status == 429 and retry_after is None:
+                    # without a Retry-After every caller of the limiter backs off
+                    self.rate_limiter.pause(delay)
+                _LOGGER.warning(f"{method} {url} returned {response.status}. Retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _get_page(self, url, parameters, use_post=False):
+        """Get a single page of a paginated call. See JiraClient._get_page.
+
+        Raises:
+            ClientResponseError: raised if the call doesn't return a successful status code.
+        """
+        if use_post:
+            # paginated POST calls only read data so they are safe to retry
+            response = await self._request('POST', url, json=parameters, idempotent=True)
+        else:
+            response = await self._request('GET', url, params=parameters)
+        response.raise_for_status()
+        return await response.json()
+
+    async def _get_paginated_results(self, url, results_key='values', parameters={}, use_post=False, page_workers=None):
+        """Async generator for the results of a paginated call that uses 'maxResults', 'startAt',
+        and 'total' attributes. See JiraClient._get_paginated_results.
+
+        Yields:
+            dict: Whatever single object is being retrieved by the paginated call.
+        """
+        parameters = dict(parameters or {})
+        page_workers = page_workers or self.page_workers
+        results_per_page = 1000
+        parameters['maxResults'] = results_per_page
+        parameters['startAt'] = 0
+        response_json = await self._get_page(url, parameters, use_post=use_post)
+
+        # override results per page if call enforces limit
+        if response_json['maxResults'] < results_per_page:
+            results_per_page = response_json['maxResults']
+            if results_per_page <= 0:
+                # some calls report a maxResults of 0, so go by the size of the page instead
+                results_per_page = len(response_json[results_key])
+            parameters['maxResults'] = results_per_page
+
+        for result in response_json[results_key]:
+            yield result
+
+        if results_per_page <= 0:
+            # an empty first page gives no page size to compute the next offsets from
+            if response_json.get('total', 0) > 0 or not response_json.get('isLast', True):
+                _LOGGER.warning(f"{url} returned an empty first page without a page size, stopping")
+            return
+
+        if 'total' not in response_json:
+            # some calls (e.g. agile sprint listings) only report whether the page is the last one,
+            # so the offsets of the remaining pages aren't known up front
+            offset = 0
+            while not response_json.get('isLast', True):
+                offset += results_per_page
+                response_json = await self._get_page(url, dict(parameters, startAt=offset), use_post=use_post)
+                for result in response_json[results_key]:
+                    yield result
+            return
+
+        # keep at most page_workers pages in flight and yield them in order of their offsets
+        offsets = iter(range(results_per_page, response_json['total'], results_per_page))
+        pending = []
+        try:
+            for offset in offsets:
+                pending.append(asyncio.ensure_future(
+                    self._get_page(url, dict(parameters, startAt=offset), use_post=use_post)
+                ))
+                if len(pending) < page_workers:
+                    continue
+                response_json = await pending.pop(0)
+                for result in response_json[results_key]:
+                    yield result
+            while pending:
+                response_json = await pending.pop(0)
+                for result in response_json[results_key]:
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _get_all_paginated_results(self, url, results_key='values', parameters={}, use_post=False, page_workers=None):
+        """Accumulate all yielded results from _get_paginated_results.
+
+        Returns:
+            list: Returns a list of dicts
+        """
+        return [result async for result in self._get_paginated_results(
+            url,
+            results_key=results_key,
+            parameters=parameters,
+            use_post=use_post,
+            page_workers=page_workers
+        )]
+
+    async def _gather_bounded(self, coroutine_function, items, max_workers=None):
+        """Await coroutine_function once per item with a bounded number of calls in flight.
+
+        A fixed number of workers take the items from a shared iterator, so only max_workers
+        coroutines exist at any time however many items there are.
+
+        Returns:
+            list: (item, result, exception) tuples in the order of items. exception is None if the
+                call succeeded and result is None if it failed.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        remaining = iter(enumerate(items))
+
+        async def worker():
+            for i, item in remaining:
+                try:
+                    results[i] = (item, await coroutine_function(item), None)
+                except Exception as exception:
+                    results[i] = (item, None, exception)
+
+        await asyncio.gather(*[worker() for _ in range(min(max_workers or self.max_workers, len(items)))])
+        return results
+
+    async def get(self, url, params=None, json=None, agile=False):
+        """This is a shortcut method. See JiraClient.get.
+
+        Returns:
+            aiohttp.ClientResponse
+        """
+        return await self._request(
+            'GET',
+            f"{self.url_agile_1 if agile else self.url_api_3}/{url}",
+            params=params,
+            json=json
+        )
+
+    ### GROUP METHODS ###
+    async def create_group(self, group):
+        """See JiraClient.create_group"""
+        _LOGGER.debug(f"group: {group}")
+        return await self._request('POST', f"{self.url_api_3}/group", json={'name': group['name']})
+
+    async def delete_group(self, group):
+        """See JiraClient.delete_group"""
+        return await self._request('DELETE', f"{self.url_api_3}/group", params={'groupname': group['name']})
+
+    async def get_all_groups(self):
+        """See JiraClient.get_all_groups"""
+        all_groups = await self._get_all_paginated_results(f"{self.url_api_3}/group/bulk")
+        valid_groups = [g for g in all_groups if not g['name'].startswith('atlassian-addons')]
+        return valid_groups
+
+    async def get_group_members(self, group):
+        """See JiraClient.get_group_members"""
+        return await self._get_all_paginated_results(
+            f"{self.url_api_3}/group/member",
+            parameters={'groupname': group['name']}
+        )
+
+    async def get_all_groups_with_members(self, max_workers=None, progress_callback=None):
+        """See JiraClient.get_all_groups_with_members"""
+        groups = await self.get_all_groups()
+        total = len(groups)
+        failed_groups = []
+        completed = 0
+
+        async def get_group_members(group):
+            nonlocal completed
+            exception = None
+            try:
+                group['members'] = await self.get_group_members(group)
+            except Exception as e:
+                exception = e
+                group['members'] = None
+                _LOGGER.error(f"Failed to get members of group `{group['name']}`: {exception}")
+                failed_groups.append(group['name'])
+            completed += 1
+            if completed % 100 == 0 or completed == total:
+                _LOGGER.info(f"Got members of {completed}/{total} groups")
+            if progress_callback:
+                progress_callback(completed, total, group, exception)
+
+        await self._gather_bounded(get_group_members, groups, max_workers=max_workers)
+        if failed_groups:
+            _LOGGER.error(f"Failed to get members of {len(failed_groups)} groups: {failed_groups}")
+        return groups
+
+    async def add_user_to_group(self, group, user):
+        """See JiraClient.add_user_to_group"""
+        return await self._request(
+            'POST',
+            f"{self.url_api_3}/group/user",
+            params={'groupname': group['name']},
+            json={'accountId': user['accountId']}
+        )
+
+    async def remove_user_from_group(self, group, user):
+        """See JiraClient.remove_user_from_group"""
+        return await self._request(
+            'DELETE',
+            f"{self.url_api_3}/group/user",
+            params={'groupname': group['name'], 'accountId': user['accountId']}
+        )
+
+    ### FIELD METHODS ###
+    async def get_all_fields(self):
+        """See JiraClient.get_all_fields"""
+        response = await self._request('GET', f"{self.url_api_3}/field")
+        if response.status != 200:
+            raise RuntimeError(f"API called failed. Reason: {response.reason}. JSON: {await response.json()}")
+        return await response.json()
+
+    async def get_field_by_name(self, name, exact_match=True):
+        """See JiraClient.get_field_by_name"""
+        fields = await self.get_all_fields()
+        if exact_match:
+            matching_fields = [f for f in fields if f['name'] == name]
+        else:
+            matching_fields = [f for f in fields if name in f['name']]
+
+        if not matching_fields:
+            return None
+        elif len(matching_fields) == 1:
+            return matching_fields[0]
+        else:
+            raise RuntimeError(f"More than one field matching '{name}': {matching_fields}")
+
+    async def get_all_custom_field_contexts(self, field_id, parameters={}):
+        """See JiraClient.get_all_custom_field_contexts"""
+        return await self._get_all_paginated_results(
+            f"{self.url_api_3}/field/{field_id}/context",
+            parameters=parameters
+        )
+
+    async def get_all_custom_field_options_by_context(self, field_id, context_id, parameters={}):
+        """See JiraClient.get_all_custom_field_options_by_context"""
+        return await self._get_all_paginated_results(
+            f"{self.url_api_3}/field/{field_id}/context/{context_id}/option",
+            parameters=parameters
+        )
+
+    async def update_custom_field_options_by_context(self, field_id, context_id, options):
+        """See JiraClient.update_custom_field_options_by_context"""
+        return await self._request(
+            'PUT',
+            f"{self.url_api_3}/field/{field_id}/context/{context_id}/option",
+            json={'options': options}
+        )
+
+    async def create_custom_field_options_by_context(self, field_id, context_id, options):
+        """See JiraClient.create_custom_field_options_by_context"""
+        return await self._request(
+            'POST',
+            f"{self.url_api_3}/field/{field_id}/context/{context_id}/option",
+            json={'options': options}
+        )
+
+    ### COMPONENT RELATED ###
+    async def get_project_components(self, project_key):
+        """See JiraClient.get_project_components"""
+        response = await self._request('GET', f"{self.url_api_3}/project/{project_key}/components")
+        if response.status != 200:
+            raise RuntimeError(f"The call failed with a {response.status}: {response.reason}; JSON: {await response.json()}")
+        return await response.json()
+
+    async def create_component(self, project_key, name, lead_account_id, description='', assignee_type='PROJECT_DEFAULT'):
+        """See JiraClient.create_component"""
+        response = await self._request(
+            'POST',
+            f"{self.url_api_3}/component",
+            json={
+                'project': project_key,
+                'name': name,
+                'description': description,
+                'leadAccountId': lead_account_id,
+                'assigneeType': assignee_type,
+            }
+        )
+        if response.status != 201:
+            _LOGGER.warning(f"Call to create new component `{name}` in {project_key} failed with status code: {response.status}; Reason: {response.reason}; JSON: {await response.json()}")
+        return response
+
+    async def update_component(self, component_id, name=None, description=None, lead_account_id=None, assignee_type=None):
+        """See JiraClient.update_component"""
+        update = {}
+        if name is not None:
+            update['name'] = name
+        if description is not None:
+            update['description'] = description
+        if lead_account_id is not None:
+            update['leadAccountId'] = lead_account_id
+        if assignee_type is not None:
+            update['assigneeType'] = assignee_type
+        response = await self._request('PUT', f"{self.url_api_3}/component/{component_id}", json=update)
+        if response.status != 200:
+            _LOGGER.warning(f"Call to update the component {component_id} {name} failed with status code: {response.status}; Reason: {response.reason}; JSON: {await response.json()}")
+        return response
+
+    # the same diff as JiraClient, so both clients skip the same no-op updates
+    _get_component_changes = staticmethod(JiraClient._get_component_changes)
+
+    async def create_or_update_components(self, project_key, components, include_unchanged=True):
+        """See JiraClient.create_or_update_components. Creates and updates are sent concurrently
+        and components that already match are not updated.
+        """
+        existing_components = await self.get_project_components(project_key)
+        _LOGGER.debug(f"Components already existing in project {project_key}:")
+        _LOGGER.debug([c.get('name') for c in existing_components])
+        existing_by_name = {ec['name']: ec for ec in existing_components}
+        results = [None] * len(components)
+        changes = []
+        for i, c in enumerate(components):
+            exists = existing_by_name.get(c['name'])
+            if not exists:
+                changes.append((i, c, None, None))
+                continue
+            update = self._get_component_changes(exists, c)
+            if update:
+                changes.append((i, c, exists, update))
+            else:
+                _LOGGER.debug(f"Component {c['name']} is unchanged in {project_key}")
+                if include_unchanged:
+                    results[i] = exists
+
+        async def create_or_update(change):
+            _, c, exists, update = change
+            if exists:
+                return await self.update_component(exists['id'], **update)
+            return await self.create_component(
+                project_key,
+                c['name'],
+                c['lead_account_id'],
+                description=c['description'],
+                assignee_type=c['assignee_type'],
+            )
+
+        errors = []
+        for (i, c, _, _), response, exception in await self._gather_bounded(create_or_update, changes):
+            if exception:
+                _LOGGER.error(f"""Call to create/update component "{c['name']}" failed: {exception}""")
+                errors.append(c)
+            elif response.status == 200:
+                _LOGGER.debug(f"Component {c['name']} updated in {project_key}")
+                results[i] = await response.json()
+            elif response.status == 201:
+                _LOGGER.debug(f"Component {c['name']} created in {project_key}")
+                results[i] = await response.json()
+            else:
+                _LOGGER.error(f"""Call to create/update component "{c['name']}" failed with status code {response.status}""")
+                _LOGGER.error(f"Reason: {response.reason}")
+                _LOGGER.error(f"JSON: {await response.json()}")
+                errors.append(c)
+        if errors:
+            _LOGGER.error(f"There were {len(errors)}: {errors}")
+        return [r for r in results if r is not None]
@@ -0,0 +1,72 @@
+"""
+
+Measures the throughput of ADF.to_text and ADF.to_markdown on generated issue descriptions.
+
+Usage:
+    python src/benchmarks/benchmark_adf_render.py --docs 20000 --repeat 3
+
+"""
+
+# TODO: figure out the right way to do this
+import os, sys; sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import argparse
+import random
+import time
+
+from adf import ADF
+
+
+def _paragraph(rng, words=12):
+    content = []
+    for i in range(words):
+        text = ADF.adf_text(text=f"word{rng.randint(0, 999)} ")
+        if i % 5 == 1:
+            ADF.adf_mark(text, 'strong')
+        content.append(text)
+    if rng.random() < 0.3:
+        content.append({'type': 'mention', 'attrs': {'id': f"user-{rng.randint(0, 99)}", 'text': '@someone'}})
+    return ADF.adf_paragraph(content_list=content)
+
+
+def build_doc(rng):
+    """Build a description like the ones found on issues: a few headings with paragraphs, a list
+    and, sometimes, a small table.
+    """
+    content = []
+    for section in range(rng.randint(1, 3)):
+        content.append(ADF.adf_heading(text=f"Section {section}", level=2))
+        content.extend(_paragraph(rng) for _ in range(rng.randint(1, 3)))
+    content.append({'type': 'bulletList', 'content': [
+        {'type': 'listItem', 'content': [_paragraph(rng, words=4)]} for _ in range(rng.randint(2, 5))
+    ]})
+    if rng.random() < 0.3:
+        rows = [ADF.adf_table_row(content_list=[
+            ADF.adf_table_cell(content_list=[ADF.convert_text_to_adf_paragraph(f"{r}-{c}")]) for c in range(3)
+        ]) for r in range(5)]
+        content.append(ADF.adf_table(content_list=rows))
+    return ADF.adf_doc(content_list=content)
+
+
+def run(docs, repeat):
+    rng = random.Random(0)
+    corpus = [build_doc(rng) for _ in range(docs)]
+    nodes = sum(sum(ADF.count_node_types(d).values()) for d in corpus)
+    print(f"{docs} docs, {nodes / docs:.0f} nodes per doc on average")
+    for name, render in (('text', ADF.to_text), ('markdown', ADF.to_markdown)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for doc in corpus:
+                render(doc)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name}: {docs / best:,.0f} docs/s, {docs * 60 / best:,.0f} docs/min")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark rendering ADF to plain text and Markdown')
+    parser.add_argument('--docs', type=int, default=20000, help='Number of documents to render')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs, the best one is reported')
+    args = parser.parse_args()
+    run(args.docs, args.repeat)
@@ -0,0 +1,328 @@
+"""
+
+Streaming export of records (issues, groups, users, ...) to NDJSON, CSV and Parquet files.
+
+Records are consumed from any iterable, such as the generators returned by
+JiraClient._get_paginated_results or JiraClient.search_issues, and written in fixed-size chunks, so
+memory use stays flat however many records there are.
+
+Parquet export needs the optional pyarrow package, which isn't in requirements.txt.
+
+"""
+
+import csv
+import json
+import os
+from contextlib import contextmanager
+from itertools import islice
+
+from utils import get_logger
+
+
+_LOGGER = get_logger('export')
+
+FORMATS = ('ndjson', 'csv', 'parquet')
+
+
+def _get_path(record, keys):
+    value = record
+    for key in keys:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def _flatten(record, prefix='', flat=None):
+    flat = {} if flat is None else flat
+    for key, value in record.items():
+        if isinstance(value, dict):
+            _flatten(value, f"{prefix}{key}.", flat)
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def make_flattener(field_map=None):
+    """Build a function that flattens a record into a flat dict of columns.
+
+    Kwargs:
+        field_map (dict): column name to either a dotted path into the record, e.g.
+            'fields.status.name', or a callable that takes the record. Without a field_map nested
+            dicts are flattened into dotted column names.
+
+    Returns:
+        callable: takes a record and returns a flat dict. Lists and dicts left in the values are
+            encoded as JSON strings.
+    """
+    if field_map:
+        # split the paths once instead of once per record
+        getters = []
+        for column, path in field_map.items():
+            if callable(path):
+                getters.append((column, path))
+            else:
+                getters.append((column, lambda record, keys=tuple(path.split('.')): _get_path(record, keys)))
+
+        def flatten(record):
+            return {column: getter(record) for column, getter in getters}
+    else:
+        flatten = _flatten
+
+    def flatten_record(record):
+        row = flatten(record)
+        for column, value in row.items():
+            if isinstance(value, (list, dict)):
+                row[column] = json.dumps(value)
+        return row
+
+    return flatten_record
+
+
+def _check_columns(rows, columns, first_record):
+    """Make sure the rows of a later chunk have no columns the first chunk didn't have.
+
+    Raises:
+        ValueError: naming the new columns
+    """
+    known = set(columns)
+    new_columns = list(dict.fromkeys(column for row in rows for column in row if column not in known))
+    if new_columns:
+        raise ValueError(
+            f"Columns {new_columns} first appear at record {first_record}, after the columns were set "
+            f"from the first chunk. Pass a field_map or a larger chunk_size."
+        )
+
+
+@contextmanager
+def _replace_on_success(path):
+    """Yield a temporary path next to path that is moved to path only if the block succeeds, so a
+    failed export never leaves a truncated file behind.
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        yield tmp_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+
+def iter_chunks(records, chunk_size):
+    """Split an iterable into lists of at most chunk_size records without reading ahead.
+
+    Yields:
+        list
+    """
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_ndjson(records, path, field_map=None, chunk_size=1000):
+    """Write records to a newline delimited JSON file, one record per line.
+
+    Args:
+        records (iterable[dict]): The records to write.
+        path (str): The path of the file.
+
+    Kwargs:
+        field_map (dict): see make_flattener. Without it records are written unchanged.
+        chunk_size (int): The number of records held in memory and written at once.
+
+    Returns:
+        int: the number of records written
+    """
+    flatten = make_flattener(field_map) if field_map else None
+    count = 0
+    with _replace_on_success(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+        for chunk in iter_chunks(records, chunk_size):
+            if flatten:
+                chunk = [flatten(r) for r in chunk]
+            f.write(''.join(json.dumps(r) + '\n' for r in chunk))
+            count += len(chunk)
+    return count
+
+
+def export_csv(records, path, field_map=None, chunk_size=1000):
+    """Write records to a CSV file with a header row.
+
+    Args:
+        records (iterable[dict]): The records to write.
+        path (str): The path of the file.
+
+    Kwargs:
+        field_map (dict): see make_flattener. Its keys are the columns. Without it the columns are
+            the flattened keys of the first chunk.
+        chunk_size (int): The number of records held in memory and written at once.
+
+    Returns:
+        int: the number of records written
+
+    Raises:
+        ValueError: if there is no field_map and a later chunk has a column the first chunk didn't
+            have. Nothing is written to path.
+    """
+    flatten = make_flattener(field_map)
+    columns = list(field_map) if field_map else None
+    count = 0
+    with _replace_on_success(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = None
+        for chunk in iter_chunks(records, chunk_size):
+            rows = [flatten(r) for r in chunk]
+            if writer is None:
+                if columns is None:
+                    columns = list(dict.fromkeys(column for row in rows for column in row))
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+            elif not field_map:
+                _check_columns(rows, columns, count)
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def export_parquet(records, path, field_map=None, chunk_size=10000):
+    """Write records to a Parquet file, one row group per chunk. Needs pyarrow.
+
+    Args:
+        records (iterable[dict]): The records to write.
+        path (str): The path of the file.
+
+    Kwargs:
+        field_map (dict): see export_csv. The column types are inferred from the first chunk, and
+            columns without any value in it are typed as strings.
+        chunk_size (int): The number of records held in memory and written at once.
+
+    Returns:
+        int: the number of records written
+
+    Raises:
+        ImportError: if pyarrow isn't installed
+        ValueError: if a later chunk has a column the first chunk didn't have (without a
+            field_map) or values that don't fit the type of their column. Nothing is written to
+            path.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Parquet export needs pyarrow. Install it with `pip install pyarrow`.')
+
+    flatten = make_flattener(field_map)
+    columns = list(field_map) if field_map else None
+    count = 0
+    with _replace_on_success(path) as tmp_path:
+        writer = None
+        try:
+            for chunk in iter_chunks(records, chunk_size):
+                rows = [flatten(r) for r in chunk]
+                if columns is None:
+                    columns = list(dict.fromkeys(column for row in rows for column in row))
+                elif not field_map:
+                    _check_columns(rows, columns, count)
+                data = {column: [row.get(column) for row in rows] for column in columns}
+                if writer is None:
+                    table = pyarrow.table(data)
+                    # a column that is empty in the first chunk can't be typed yet, assume strings
+                    schema = pyarrow.schema([
+                        pyarrow.field(f.name, pyarrow.string()) if pyarrow.types.is_null(f.type) else f
+                        for f in table.schema
+                    ])
+                    table = table.cast(schema)
+                    writer = pyarrow.parquet.ParquetWriter(tmp_path, schema)
+                else:
+                    table = _table_with_schema(pyarrow, data, writer.schema, count)
+                writer.write_table(table)
+                count += len(rows)
+            if writer is None:
+                # no records, write an empty file with the field_map columns typed as strings
+                schema = pyarrow.schema([pyarrow.field(column, pyarrow.string()) for column in columns or ()])
+                writer = pyarrow.parquet.ParquetWriter(tmp_path, schema)
+                writer.write_table(schema.empty_table())
+        finally:
+            if writer is not None:
+                writer.close()
+    return count
+
+
+def _table_with_schema(pyarrow, data, schema, first_record):
+    """Build the table of a later Parquet chunk with the schema of the first one.
+
+    Raises:
+        ValueError: naming the first column whose values don't fit its type
+    """
+    arrays = []
+    for field in schema:
+        try:
+            arrays.append(pyarrow.array(data[field.name], type=field.type))
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, OverflowError) as e:
+            raise ValueError(
+                f"Column `{field.name}` of the chunk starting at record {first_record} doesn't fit the "
+                f"type {field.type} inferred from the first chunk: {e}. Pass a field_map that converts "
+                f"it or a larger chunk_size."
+            ) from e
+    return pyarrow.Table.from_arrays(arrays, schema=schema)
+
+
+def export(records, path, format=None, field_map=None, chunk_size=None):
+    """Write records to a file in the format given by format or by the extension of path.
+
+    Args:
+        records (iterable[dict]): The records to write.
+        path (str): The path of the file. `.ndjson`/`.jsonl`, `.csv` and `.parquet` are recognised.
+
+    Kwargs:
+        format (str): one of FORMATS. Overrides the extension.
+        field_map (dict): see make_flattener.
+        chunk_size (int): The number of records held in memory and written at once. Defaults to
+            the default of the format's export function.
+
+    Returns:
+        int: the number of records written
+
+    Raises:
+        ValueError: if the format can't be determined
+    """
+    if format is None:
+        extension = path.rsplit('.', 1)[-1].lower()
+        format = {'jsonl': 'ndjson', 'ndjson': 'ndjson', 'csv': 'csv', 'parquet': 'parquet'}.get(extension)
+    exporters = {'ndjson': export_ndjson, 'csv': export_csv, 'parquet': export_parquet}
+    if format not in exporters:
+        raise ValueError(f"Unknown export format for `{path}`. Valid formats: {FORMATS}")
+    kwargs = {'field_map': field_map}
+    if chunk_size:
+        kwargs['chunk_size'] = chunk_size
+    count = exporters[format](records, path, **kwargs)
+    _LOGGER.info(f"Exported {count} records to {path}")
+    return count
+
+
+def iter_group_membership_rows(client, groups=None):
+    """Stream one row per (group, member) pair, holding at most one page of members in memory.
+
+    Args:
+        client (JiraClient): The client used to fetch groups and members.
+
+    Kwargs:
+        groups (iterable[dict]): The groups to export. Defaults to all groups.
+
+    Yields:
+        dict: with the keys groupName, groupId, accountId, displayName, emailAddress, active and
+            accountType
+    """
+    for group in groups if groups is not None else client.get_all_groups():
+        for member in client.iter_group_members(group):
+            yield {
+                'groupName': group['name'],
+                'groupId': group.get('groupId'),
+                'accountId': member.get('accountId'),
+                'displayName': member.get('displayName'),
+                'emailAddress': member.get('emailAddress'),
+                'active': member.get('active'),
+                'accountType': member.get('accountType'),
+            }
@@ -0,0 +1,193 @@
+"""
+
+Keeps the membership of Jira groups in sync based on a mapping config file.
+
+Example config:
+    {
+        "mappings": [
+            {"source": "engineering", "target": "jira-engineering"},
+            {"source": "design", "target": "jira-design", "remove_extra": false},
+            {"source": "ops", "target": "jira-ops", "direction": "both"}
+        ]
+    }
+
+direction is one of:
+    source_to_target (default): the target gets the members of the source.
+    target_to_source: the source gets the members of the target.
+    both: each group gets the members it is missing from the other. Nobody is removed.
+
+remove_extra (default true) removes members of the receiving group that aren't in the other group.
+It is ignored when direction is both.
+
+"""
+
+import json
+
+from utils import apply_concurrently
+from utils import get_all_concurrently
+from utils import get_logger
+
+
+_LOGGER = get_logger('group_sync')
+
+DIRECTIONS = ('source_to_target', 'target_to_source', 'both')
+
+
+def load_mappings(path):
+    """Load and validate the mappings of a config file.
+
+    Args:
+        path (str): The path of a JSON config file.
+
+    Returns:
+        list[dict]: mappings with the keys source, target, direction and remove_extra
+
+    Raises:
+        ValueError: if a mapping is missing a group name or has an unknown direction
+    """
+    with open(path) as f:
+        config = json.load(f)
+    mappings = []
+    for i, m in enumerate(config.get('mappings', [])):
+        if not m.get('source') or not m.get('target'):
+            raise ValueError(f"Mapping {i} needs both a `source` and a `target` group: {m}")
+        direction = m.get('direction', 'source_to_target')
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Mapping {i} has an unknown direction `{direction}`. Valid values: {DIRECTIONS}")
+        mappings.append({
+            'source': m['source'],
+            'target': m['target'],
+            'direction': direction,
+            'remove_extra': m.get('remove_extra', True),
+        })
+    return mappings
+
+
+class GroupSyncEngine:
+    """Computes the membership changes needed by a list of mappings and applies them concurrently.
+
+    Every group named by the mappings is fetched once, however many mappings use it. Differences are
+    computed with set operations keyed on accountId.
+    """
+
+    def __init__(self, client, max_workers=None):
+        """
+        Args:
+            client (JiraClient): The client used to read and change group membership.
+
+        Kwargs:
+            max_workers (int): The number of calls in flight at the same time. Defaults to the
+                max_workers of the client.
+        """
+        self.client = client
+        self.max_workers = max_workers or client.max_workers
+
+    def _get_memberships(self, group_names):
+        """Fetch the members of each group concurrently.
+
+        Returns:
+            dict: group name to a dict of accountId to user record
+
+        Raises:
+            RuntimeError: if the members of any group can't be fetched, since a partial view of a
+                group would produce wrong removals
+        """
+        members_by_group = get_all_concurrently(
+            lambda name: self.client.get_group_members({'name': name}),
+            sorted(group_names),
+            self.max_workers,
+            'the members of {} groups'
+        )
+        return {name: {m['accountId']: m for m in members} for name, members in members_by_group.items()}
+
+    def plan(self, mappings):
+        """Compute the membership changes for every mapping in one pass.
+
+        A receiving group keeps every member that any of its mappings gives it, so a user is only
+        removed from a group if no mapping wants them there.
+
+        Args:
+            mappings (list[dict]): see load_mappings.
+
+        Returns:
+            list[dict]: mutations with the keys action (`add` or `remove`), group (name), user
+                (user record with at least `accountId`) and mapping (the mapping that needs it)
+        """
+        group_names = {m['source'] for m in mappings} | {m['target'] for m in mappings}
+        memberships = self._get_memberships(group_names)
+
+        adds = {}
+        removes = {}
+        # accountIds each receiving group should have according to any mapping
+        wanted = {}
+        for m in mappings:
+            if m['direction'] == 'target_to_source':
+                pairs = [(m['target'], m['source'], m['remove_extra'])]
+            elif m['direction'] == 'both':
+                pairs = [(m['source'], m['target'], False), (m['target'], m['source'], False)]
+            else:
+                pairs = [(m['source'], m['target'], m['remove_extra'])]
+            for giver, receiver, remove_extra in pairs:
+                giver_members = memberships[giver]
+                receiver_members = memberships[receiver]
+                wanted.setdefault(receiver, set()).update(giver_members.keys())
+                for account_id in giver_members.keys() - receiver_members.keys():
+                    adds.setdefault((receiver, account_id), {
+                        'action': 'add', 'group': receiver, 'user': giver_members[account_id], 'mapping': m
+                    })
+                if remove_extra:
+                    for account_id in receiver_members.keys() - giver_members.keys():
+                        removes.setdefault((receiver, account_id), {
+                            'action': 'remove', 'group': receiver, 'user': receiver_members[account_id], 'mapping': m
+                        })
+
+        plan = list(adds.values())
+        for (group, account_id), mutation in removes.items():
+            if account_id in wanted[group]:
+                _LOGGER.debug(f"Not removing {account_id} from `{group}`, another mapping gives it to the group")
+            else:
+                plan.append(mutation)
+        return sorted(plan, key=lambda x: (x['group'], x['action'], x['user']['accountId']))
+
+    @staticmethod
+    def format_plan(plan):
+        """Render a plan for a dry run.
+
+        Returns:
+            str: one line per mutation, `+` for adds and `-` for removals
+        """
+        lines = []
+        for mutation in plan:
+            user = mutation['user']
+            sign = '+' if mutation['action'] == 'add' else '-'
+            lines.append(f"{sign} {mutation['group']}: {user['accountId']} ({user.get('displayName', '')})")
+        adds = len([x for x in plan if x['action'] == 'add'])
+        lines.append(f"{adds} to add, {len(plan) - adds} to remove")
+        return '\n'.join(lines)
+
+    def _apply_mutation(self, mutation):
+        group = {'name': mutation['group']}
+        if mutation['action'] == 'add':
+            return self.client.add_user_to_group(group, mutation['user'])
+        return self.client.remove_user_from_group(group, mutation['user'])
+
+    def apply(self, plan):
+        """Send the mutations of a plan concurrently.
+
+        Args:
+            plan (list[dict]): see plan.
+
+        Returns:
+            list[dict]: one result per mutation, in the order of the plan, with the keys mutation,
+                ok (bool), status_code (int or None) and error (str or None)
+        """
+        # adding returns 201, removing returns 200
+        results = apply_concurrently(self._apply_mutation, plan, self.max_workers, (200, 201), 'mutation')
+        failures = [r for r in results if not r['ok']]
+        for r in failures:
+            _LOGGER.error(
+                f"Failed to {r['mutation']['action']} {r['mutation']['user']['accountId']} "
+                f"in `{r['mutation']['group']}`: {r['status_code']} {r['error']}"
+            )
+        _LOGGER.info(f"Applied {len(results) - len(failures)} of {len(results)} membership changes")
+        return results
@@ -5,10 +5,23 @@ Jira API Documentation: https://developer.atlassian.com/cloud/jira/platform/rest
 """
 
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from adf import ADFJSONBody
+from adf import encode_json
+from rate_limiter import IDEMPOTENT_METHODS
+from rate_limiter import RETRY_STATUS_CODES
+from rate_limiter import RateLimiter
+from rate_limiter import backoff_delay
+from response_cache import ResponseCache
 from utils import get_logger
+from utils import map_concurrently
 
 
 _JIRA_USER = os.environ.get('JIRA_USER')
@@ -17,23 +30,254 @@ _JIRA_URL = os.environ.get('JIRA_URL')
 
 _LOGGER = get_logger('jira_client')
 
+# the custom field option endpoints accept at most this many options per request
+_MAX_OPTIONS_PER_REQUEST = 1000
+# the agile move issues to sprint endpoint accepts at most this many issues per request
+MAX_ISSUES_PER_SPRINT_MOVE = 50
+
+
+class _FieldCatalogue:
+    """The fields of a Jira instance indexed by id, name and lowercased name."""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.fetched_at = time.monotonic()
+        self.by_id = {}
+        # names aren't unique in Jira, so the name indexes map to lists of fields
+        self.by_name = {}
+        self.by_lower_name = {}
+        for f in fields:
+            self.by_id[f['id']] = f
+            self.by_name.setdefault(f['name'], []).append(f)
+            self.by_lower_name.setdefault(f['name'].lower(), []).append(f)
+
+    def is_fresh(self, ttl):
+        return ttl is not None and time.monotonic() - self.fetched_at < ttl
+
+    def find(self, name, exact_match=True, ignore_case=False):
+        """Get all fields matching name. See JiraClient.get_field_by_name.
+
+        Returns:
+            list: list of dicts of matching fields
+        """
+        index = self.by_lower_name if ignore_case else self.by_name
+        if ignore_case:
+            name = name.lower()
+        if exact_match:
+            return list(index.get(name, []))
+        return [f for field_name, fields in index.items() if name in field_name for f in fields]
+
 
 class JiraClient:
     
-    def __init__(self, user=_JIRA_USER, api_token=_JIRA_API_TOKEN, url=_JIRA_URL):
+    def __init__(
+        self,
+        user=_JIRA_USER,
+        api_token=_JIRA_API_TOKEN,
+        url=_JIRA_URL,
+        page_workers=1,
+        max_workers=8,
+        rate_limiter=None,
+        requests_per_second=10,
+        max_retries=4,
+        pool_connections=10,
+        pool_maxsize=None,
+        pool_block=False,
+        keep_alive=True,
+        compress=True,
+        connect_timeout=10,
+        read_timeout=60,
+        field_cache_ttl=300,
+        response_cache=None,
+        response_cache_ttl=None
+    ):
+        """
+        Kwargs:
+            user (str): The Jira user (email address) used to authenticate.
+            api_token (str): The API token of the user.
+            url (str): The base url of the Jira instance.
+            page_workers (int): The number of pages of a paginated call that may be fetched at the
+                same time. Defaults to 1, which fetches pages one after another.
+            max_workers (int): The number of calls bulk methods may have in flight at the same
+                time, e.g. the number of groups whose members are fetched concurrently.
+            rate_limiter (RateLimiter): The limiter every call is paced by. Pass the same instance
+                to several clients to share one budget. Defaults to a new RateLimiter.
+            requests_per_second (float): The rate of the default RateLimiter. Ignored if
+                rate_limiter is passed.
+            max_retries (int): The number of times a throttled or failed idempotent call is retried.
+            pool_connections (int): The number of hosts connection pools are kept for.
+            pool_maxsize (int): The maximum number of connections kept open per host. Defaults to
+                enough connections for max_workers calls that each fetch page_workers pages.
+            pool_block (bool): Wait for a free connection when all connections to a host are in use,
+                instead of opening a connection that is discarded after the call.
+            keep_alive (bool): Reuse connections between calls. Set to False to close every
+                connection after its call.
+            compress (bool): Ask for gzip/deflate compressed responses.
+            connect_timeout (float): Seconds to wait for a connection to be established. None waits
+                forever.
+            read_timeout (float): Seconds to wait for the server to send data. None waits forever.
+            field_cache_ttl (float): Seconds the field catalogue used by the field lookup methods
+                is reused before it is fetched again. None fetches it for every lookup.
+            response_cache (ResponseCache): Cache for GET responses. Pass the same instance to
+                several clients to share it; the responses of clients of different users are kept
+                apart. Defaults to no cache unless response_cache_ttl is set.
+            response_cache_ttl (float): Creates a ResponseCache whose entries are served without a
+                request for this many seconds. Ignored if response_cache is passed.
+        """
         self._headers = {
             'Accept': 'application/json',
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip, deflate' if compress else 'identity',
         }
+        if not keep_alive:
+            self._headers['Connection'] = 'close'
+        # retries are handled by _request so the adapter doesn't retry on its own
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize or max(10, max_workers * page_workers),
+            pool_block=pool_block,
+            max_retries=0
+        )
         self._session = requests.Session()
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
         self._session.headers.update(self._headers)
         self._session.auth = (user, api_token)
+        self.timeout = (connect_timeout, read_timeout)
         self.url = url
         self.url_api_3 = f"{self.url}/rest/api/3"
         self.url_agile_1 = f"{self.url}/rest/agile/1.0"
+        # private API of the Jira Software UI, only used where the agile API has no equivalent
+        self.url_greenhopper = f"{self.url}/rest/greenhopper/1.0"
+        self.page_workers = page_workers
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or RateLimiter(rate=requests_per_second)
+        self.max_retries = max_retries
+        self.field_cache_ttl = field_cache_ttl
+        self._field_catalogue = None
+        self._field_catalogue_lock = threading.Lock()
+        if response_cache is None and response_cache_ttl is not None:
+            response_cache = ResponseCache(ttl=response_cache_ttl)
+        self.response_cache = response_cache
+
+    def _request(self, method, url, idempotent=None, read_only=False, **kwargs):
+        """Send a request through the session, paced by the client's rate limiter.
+
+        If the client has a response_cache, GET responses are served from it while fresh and stale
+        ones are revalidated with conditional headers. Any other request that isn't read_only clears
+        the cache because it may have changed what the cached calls return.
+
+        Throttled (429) and unavailable (502, 503, 504) responses and connection errors are retried
+        with jittered exponential backoff, honouring the Retry-After header, as long as the request
+        is idempotent. The last response is returned if all retries are used up.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The full url of the API endpoint.
+
+        Kwargs:
+            idempotent (bool): Whether the request may be retried. Defaults to True for GET, HEAD,
+                OPTIONS, PUT and DELETE requests.
+            read_only (bool): Set to True for non-GET requests that don't change anything, such as
+                a search sent as a POST, so they don't clear the response cache.
+            All other kwargs are passed to requests.Session.request. timeout defaults to the
+            timeout of the client.
 
-    def _get_paginated_results(self, url, results_key='values', parameters={}, use_post=False):
+        Returns:
+            requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        cache = self.response_cache
+        if cache is None:
+            return self._send(method, url, idempotent=idempotent, **kwargs)
+        if method.upper() != 'GET':
+            response = self._send(method, url, idempotent=idempotent, **kwargs)
+            if not read_only:
+                cache.clear()
+            return response
+        if kwargs.get('json') is not None or kwargs.get('data') is not None:
+            return self._send(method, url, idempotent=idempotent, **kwargs)
+
+        cache_key = cache.key(url, kwargs.get('params'), user=self._session.auth[0])
+        entry = cache.get(cache_key)
+        if entry is not None and cache.is_fresh(entry):
+            cache.record_hit()
+            return entry.response
+        if entry is not None:
+            kwargs['headers'] = dict(kwargs.get('headers') or {}, **cache.conditional_headers(entry))
+        response = self._send(method, url, idempotent=idempotent, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            cache.revalidated(entry)
+            return entry.response
+        cache.record_miss()
+        if response.status_code == 200:
+            cache.store(cache_key, response)
+        return response
+
+    def _send(self, method, url, idempotent=None, **kwargs):
+        """Send a request, retrying it as described in _request. Doesn't use the response cache.
+
+        Returns:
+            requests.Response
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        max_retries = self.max_retries if idempotent else 0
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                _LOGGER.warning(f"{method} {url} failed: {e}. Retrying in {delay:.1f}s")
+            else:
+                retry_after = self.rate_limiter.update_from_headers(response.headers, response.status_code)
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                    return response
+                delay = backoff_delay(attempt, retry_after=retry_after)
+                if response.status_code == 429 and retry_after is None:
+                    # without a Retry-After every caller of the limiter backs off
+                    self.rate_limiter.pause(delay)
+                _LOGGER.warning(f"{method} {url} returned {response.status_code}. Retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def _get_page(self, url, parameters, use_post=False):
+        """Get a single page of a paginated call.
+
+        Args:
+            url (str): The full url of the API endpoint.
+            parameters (dict): If use_post is False, URL parameters. If use_post is True, json
+                encoded body parameters. Must include 'startAt' and 'maxResults'.
+
+        Kwargs:
+            use_post (bool): Use POST instead of GET.
+
+        Returns:
+            dict: The decoded JSON of the page
+
+        Raises:
+            HTTPError: calls raise_for_status which could raise this error.
+        """
+        if use_post:
+            # paginated POST calls only read data so they are safe to retry
+            response = self._request('POST', url, json=parameters, idempotent=True, read_only=True)
+        else:
+            response = self._request('GET', url, params=parameters)
+        response.raise_for_status()
+        return response.json()
+
+    def _get_paginated_results(self, url, results_key='values', parameters={}, use_post=False, page_workers=None):
         """Get results of a paginated call that uses 'maxResults', 'startAt', and 'total' attributes.
+        Calls that report 'isLast' instead of 'total' are paged one after another.
+
+        The first page is always fetched on its own. Its 'total' and 'maxResults' (the server may
+        enforce a lower limit than requested) determine the remaining 'startAt' offsets. If more
+        than one page worker is allowed, the remaining pages are fetched concurrently, with at most
+        page_workers requests in flight, and results are still yielded in order.
 
         Args:
             url (str): The full url of the API endpoint.
@@ -45,6 +289,8 @@ class JiraClient:
                 encoded body parameters.
             use_post (bool): Use POST instead of GET. Needed if parameters are too long to fit in an
                 URL. If True then parameters are json encoded as body parameters.
+            page_workers (int): The number of pages that may be fetched at the same time. Defaults
+                to the page_workers of the client.
 
         Yields:
             dict: Whatever single object is being retrieved by the paginated call.
@@ -56,33 +302,75 @@ class JiraClient:
             HTTPError: calls raise_for_status which could raise this error. See more info in
                 documentation here: https://docs.python-requests.org/en/latest/api/#requests.Response.raise_for_status
         """
-        parameters = parameters or {}
+        parameters = dict(parameters or {})
+        page_workers = page_workers or self.page_workers
         results_per_page = 1000
         parameters['maxResults'] = results_per_page
-        next = 0
-        while True:
-            parameters['startAt'] = next
-            if use_post:
-                response = self._session.post(url, json=parameters)
-            else:
-                response = self._session.get(url, params=parameters)
-            response.raise_for_status()
-            response_json = response.json()
-            results = response_json[results_key]
+        parameters['startAt'] = 0
+        response_json = self._get_page(url, parameters, use_post=use_post)
 
-            # override results per page if call enforces limit
-            if response_json['maxResults'] < results_per_page:
-                results_per_page = response_json['maxResults']
-                parameters['maxResults'] = results_per_page
+        # override results per page if call enforces limit
+        if response_json['maxResults'] < results_per_page:
+            results_per_page = response_json['maxResults']
+            if results_per_page <= 0:
+                # some calls report a maxResults of 0, so go by the size of the page instead
+                results_per_page = len(response_json[results_key])
+            parameters['maxResults'] = results_per_page
 
-            for result in results:
-                yield result
-            
-            next += results_per_page
-            if next >= response_json['total']:
-                return
+        for result in response_json[results_key]:
+            yield result
+
+        if results_per_page <= 0:
+            # an empty first page gives no page size to compute the next offsets from
+            if response_json.get('total', 0) > 0 or not response_json.get('isLast', True):
+                _LOGGER.warning(f"{url} returned an empty first page without a page size, stopping")
+            return
+
+        if 'total' not in response_json:
+            # some calls (e.g. agile sprint listings) only report whether the page is the last one,
+            # so the offsets of the remaining pages aren't known up front
+            offset = 0
+            while not response_json.get('isLast', True):
+                offset += results_per_page
+                response_json = self._get_page(url, dict(parameters, startAt=offset), use_post=use_post)
+                for result in response_json[results_key]:
+                    yield result
+            return
 
-    def _get_all_paginated_results(self, url, results_key='values', parameters={}, use_post=False):
+        offsets = range(results_per_page, response_json['total'], results_per_page)
+        if page_workers <= 1 or len(offsets) <= 1:
+            for offset in offsets:
+                response_json = self._get_page(url, dict(parameters, startAt=offset), use_post=use_post)
+                for result in response_json[results_key]:
+                    yield result
+            return
+
+        # keep at most page_workers pages in flight and yield them in order of their offsets
+        offsets = iter(offsets)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=page_workers) as executor:
+
+            def submit_next_page():
+                offset = next(offsets, None)
+                if offset is not None:
+                    pending.append(executor.submit(
+                        self._get_page, url, dict(parameters, startAt=offset), use_post=use_post
+                    ))
+
+            try:
+                for _ in range(page_workers):
+                    submit_next_page()
+                while pending:
+                    response_json = pending.popleft().result()
+                    submit_next_page()
+                    for result in response_json[results_key]:
+                        yield result
+            finally:
+                # the caller stopped iterating early or a page failed
+                for future in pending:
+                    future.cancel()
+
+    def _get_all_paginated_results(self, url, results_key='values', parameters={}, use_post=False, page_workers=None):
         """This is a handler function for accumulating all yielded results from _get_paginated_results.
         All parameters are passed into _get_paginated_results.
 
@@ -96,15 +384,64 @@ class JiraClient:
                 encoded body parameters.
             use_post (bool): Use POST instead of GET. Needed if parameters are too long to fit in an
                 URL. If True then parameters are json encoded as body parameters.
+            page_workers (int): The number of pages that may be fetched at the same time. Defaults
+                to the page_workers of the client.
 
         Returns:
             list: Returns a list of dicts
         """
         results = []
-        for result in self._get_paginated_results(url, results_key=results_key, parameters=parameters, use_post=use_post):
+        for result in self._get_paginated_results(
+            url,
+            results_key=results_key,
+            parameters=parameters,
+            use_post=use_post,
+            page_workers=page_workers
+        ):
             results.append(result)
         return results
     
+    def _get_token_paginated_results(self, url, results_key='values', parameters={}, max_results=100):
+        """Get results of a paginated call that uses 'nextPageToken' and 'isLast' attributes
+        instead of 'startAt' and 'total'. Parameters are sent as a json encoded POST body.
+
+        Args:
+            url (str): The full url of the API endpoint.
+
+        Kwargs:
+            results_key (str): The name of the key in the results that contains the list of results.
+                Defaults to 'values'.
+            parameters (dict): json encoded body parameters.
+            max_results (int): The number of results requested per page.
+
+        Yields:
+            dict: Whatever single object is being retrieved by the paginated call.
+
+        Raises:
+            HTTPError: calls raise_for_status which could raise this error.
+        """
+        parameters = dict(parameters or {}, maxResults=max_results)
+        parameters.pop('nextPageToken', None)
+        while True:
+            response = self._request('POST', url, json=parameters, idempotent=True, read_only=True)
+            response.raise_for_status()
+            response_json = response.json()
+            for result in response_json[results_key]:
+                yield result
+            next_page_token = response_json.get('nextPageToken')
+            if response_json.get('isLast', True) or not next_page_token:
+                return
+            parameters['nextPageToken'] = next_page_token
+
+    def _map_concurrently(self, func, items, max_workers=None):
+        """Call func once per item with a bounded number of calls in flight. See
+        utils.map_concurrently. max_workers defaults to the max_workers of the client.
+
+        Yields:
+            tuple: (item, result, exception) in the order the calls complete.
+        """
+        return map_concurrently(func, items, max_workers or self.max_workers)
+
     def get(self, url, params=None, json=None, agile=False):
         """This is a shortcut method. Consider removing after initial development.
         
@@ -112,14 +449,15 @@ class JiraClient:
             url (str): This is the part of the url that comes after either url_api_3 or url_agile_1
         
         Kwargs:
-            params (dict): This gets passed to the params kwarg of _session.get
-            json (dict): This gets passed to the json kwarg of _session.get
+            params (dict): This gets passed to the params kwarg of _request
+            json (dict): This gets passed to the json kwarg of _request
             agile (bool): This can be set to True to use url_agile_1 instead of url_api_3
 
         Returns:
             requests.Response
         """
-        resp = self._session.get(
+        resp = self._request(
+            'GET',
             f"{self.url_agile_1 if agile else self.url_api_3}/{url}",
             params=params,
             json=json
@@ -139,7 +477,8 @@ class JiraClient:
             requests.Response: Returns the response from the API call
         """
         _LOGGER.debug(f"group: {group}")
-        response = self._session.post(
+        response = self._request(
+            'POST',
             f"{self.url_api_3}/group",
             json={'name': group['name']}
         )
@@ -156,7 +495,8 @@ class JiraClient:
         Returns:
             requests.Response: Returns the response from the API call
         """
-        response = self._session.delete(
+        response = self._request(
+            'DELETE',
             f"{self.url_api_3}/group",
             params={'groupname': group['name']}
         )
@@ -184,21 +524,79 @@ class JiraClient:
         Returns:
             list: Returns a list of dicts where each dict is a user record
         """
-        return self._get_all_paginated_results(
+        return list(self.iter_group_members(group))
+
+    def iter_group_members(self, group):
+        """Stream the users associated with a group, one page at a time.
+        https://developer.atlassian.com/cloud/jira/platform/rest/v3/api-group-groups/#api-rest-api-3-group-member-get
+
+        Args:
+            group (dict): This should be a dict that represents a group and contain at least the
+                `name` key.
+
+        Returns:
+            generator: yields dicts where each dict is a user record
+        """
+        return self._get_paginated_results(
             f"{self.url_api_3}/group/member",
             parameters={'groupname': group['name']}
         )
     
-    def get_all_groups_with_members(self):
+    def get_group_member_count(self, group):
+        """This obtains the number of users associated with a group with a single small call.
+        https://developer.atlassian.com/cloud/jira/platform/rest/v3/api-group-groups/#api-rest-api-3-group-member-get
+
+        Args:
+            group (dict): This should be a dict that represents a group and contain at least the
+                `name` key.
+
+        Returns:
+            int: The number of members of the group
+
+        Raises:
+            HTTPError: raised if the call doesn't return a successful status code.
+        """
+        return self._get_page(
+            f"{self.url_api_3}/group/member",
+            {'groupname': group['name'], 'startAt': 0, 'maxResults': 1}
+        )['total']
+
+    def get_all_groups_with_members(self, max_workers=None, progress_callback=None):
         """This obtains all groups in the Jira instances and includes a new key in the group record
         `member` and adds all users records in the key that have membership in the group.
 
+        Members of several groups are fetched concurrently. A group whose members can't be fetched
+        doesn't stop the others: its `members` key is set to None and the failure is logged.
+
+        Kwargs:
+            max_workers (int): The maximum number of groups whose members are fetched at the same
+                time. Defaults to the max_workers of the client.
+            progress_callback (callable): Called after each group is handled with the arguments
+                (completed, total, group, exception). exception is None if the group succeeded.
+
         Returns:
             list: Returns a list of dicts where each dict is a group record
         """
         groups = self.get_all_groups()
-        for group in groups:
-            group['members'] = self.get_group_members(group)
+        total = len(groups)
+        failed_groups = []
+        completed = 0
+        for group, members, exception in self._map_concurrently(
+            self.get_group_members,
+            groups,
+            max_workers=max_workers
+        ):
+            completed += 1
+            group['members'] = members
+            if exception:
+                _LOGGER.error(f"Failed to get members of group `{group['name']}`: {exception}")
+                failed_groups.append(group['name'])
+            if completed % 100 == 0 or completed == total:
+                _LOGGER.info(f"Got members of {completed}/{total} groups")
+            if progress_callback:
+                progress_callback(completed, total, group, exception)
+        if failed_groups:
+            _LOGGER.error(f"Failed to get members of {len(failed_groups)} groups: {failed_groups}")
         return groups
 
     def add_user_to_group(self, group, user):
@@ -214,7 +612,8 @@ class JiraClient:
         Returns:
             requests.Response: Returns the response from the API call
         """
-        response = self._session.post(
+        response = self._request(
+            'POST',
             f"{self.url_api_3}/group/user",
             params={'groupname': group['name']},
             json={'accountId': user['accountId']}
@@ -234,15 +633,169 @@ class JiraClient:
         Returns:
             requests.Response: Returns the response from the API call
         """
-        response = self._session.delete(
+        response = self._request(
+            'DELETE',
             f"{self.url_api_3}/group/user",
             params={'groupname': group['name'], 'accountId': user['accountId']}
         )
         return response
 
+    def _update_group_memberships(self, action, groups, users, memberships=None, max_workers=None):
+        """Add or remove users to/from groups concurrently, skipping calls that wouldn't change
+        anything. Used by the bulk membership methods.
+
+        Args:
+            action (str): `add` or `remove`.
+            groups (list[dict]): group records with at least the `name` key.
+            users (iterable[dict]): user records with at least the `accountId` key.
+
+        Kwargs:
+            memberships (dict): group name to a set of the accountIds of its members. Groups that
+                are missing are fetched, one call per group.
+            max_workers (int): The maximum number of calls in flight. Defaults to the max_workers
+                of the client.
+
+        Returns:
+            dict: group name to a result dict, see add_users_to_group
+        """
+        # one entry per user, even if the same user is passed several times
+        users = list({u['accountId']: u for u in users}.values())
+        memberships = dict(memberships or {})
+        results = {g['name']: {'succeeded': [], 'failed': [], 'skipped': []} for g in groups}
+
+        groups_to_fetch = [g for g in groups if g['name'] not in memberships]
+        for group, members, exception in self._map_concurrently(
+            self.get_group_members,
+            groups_to_fetch,
+            max_workers=max_workers
+        ):
+            if exception:
+                _LOGGER.error(f"Failed to get members of group `{group['name']}`: {exception}")
+                results[group['name']]['failed'] = [
+                    {'user': u, 'status_code': None, 'error': f"Failed to get group members: {exception}"}
+                    for u in users
+                ]
+            else:
+                memberships[group['name']] = {m['accountId'] for m in members}
+
+        calls = []
+        for group in groups:
+            if group['name'] not in memberships:
+                continue
+            members = memberships[group['name']]
+            for user in users:
+                if (user['accountId'] in members) == (action == 'add'):
+                    results[group['name']]['skipped'].append(user)
+                else:
+                    calls.append((group, user))
+
+        call = self.add_user_to_group if action == 'add' else self.remove_user_from_group
+        # adding returns 201, removing returns 200
+        success_status_code = 201 if action == 'add' else 200
+        for (group, user), response, exception in self._map_concurrently(
+            lambda pair: call(*pair),
+            calls,
+            max_workers=max_workers
+        ):
+            result = results[group['name']]
+            if exception:
+                result['failed'].append({'user': user, 'status_code': None, 'error': str(exception)})
+            elif response.status_code != success_status_code:
+                result['failed'].append({'user': user, 'status_code': response.status_code, 'error': response.text})
+            else:
+                result['succeeded'].append(user)
+
+        for name, result in results.items():
+            if result['failed']:
+                _LOGGER.error(f"Failed to {action} {len(result['failed'])} users in group `{name}`: {result['failed']}")
+            _LOGGER.info(
+                f"Group `{name}`: {action} succeeded for {len(result['succeeded'])} users, "
+                f"failed for {len(result['failed'])}, skipped {len(result['skipped'])}"
+            )
+        return results
+
+    def add_users_to_group(self, group, users, existing_members=None, max_workers=None):
+        """Add many users to a group. Users who are already members are skipped, based on one
+        fetch of the group's members, and the remaining calls are sent concurrently.
+
+        Args:
+            group (dict): This should be a dict that represents a group and contain at least the
+                `name` key.
+            users (iterable[dict]): dicts that represent users and contain at least the
+                `accountId` key.
+
+        Kwargs:
+            existing_members (iterable[dict]): the current members of the group, if the caller
+                already has them. Saves fetching them.
+            max_workers (int): The maximum number of calls in flight. Defaults to the max_workers
+                of the client.
+
+        Returns:
+            dict: with the keys
+                succeeded (list[dict]): users that were added
+                failed (list[dict]): dicts with the keys user, status_code and error
+                skipped (list[dict]): users that were already members
+        """
+        memberships = None
+        if existing_members is not None:
+            memberships = {group['name']: {m['accountId'] for m in existing_members}}
+        return self._update_group_memberships(
+            'add', [group], users, memberships=memberships, max_workers=max_workers
+        )[group['name']]
+
+    def remove_users_from_group(self, group, users, existing_members=None, max_workers=None):
+        """Remove many users from a group. Users who aren't members are skipped, based on one
+        fetch of the group's members, and the remaining calls are sent concurrently.
+
+        Args:
+            group (dict): This should be a dict that represents a group and contain at least the
+                `name` key.
+            users (iterable[dict]): dicts that represent users and contain at least the
+                `accountId` key.
+
+        Kwargs:
+            existing_members (iterable[dict]): see add_users_to_group.
+            max_workers (int): see add_users_to_group.
+
+        Returns:
+            dict: see add_users_to_group. skipped lists the users that weren't members.
+        """
+        memberships = None
+        if existing_members is not None:
+            memberships = {group['name']: {m['accountId'] for m in existing_members}}
+        return self._update_group_memberships(
+            'remove', [group], users, memberships=memberships, max_workers=max_workers
+        )[group['name']]
+
+    def add_users_to_groups(self, groups, users, max_workers=None):
+        """Add the same users to several groups, e.g. when onboarding a team. Members of every
+        group are fetched once and all calls share one pool of workers.
+
+        Args:
+            groups (list[dict]): dicts that represent groups and contain at least the `name` key.
+            users (iterable[dict]): dicts that represent users and contain at least the
+                `accountId` key.
+
+        Kwargs:
+            max_workers (int): see add_users_to_group.
+
+        Returns:
+            dict: group name to a result dict, see add_users_to_group
+        """
+        return self._update_group_memberships('add', list(groups), users, max_workers=max_workers)
+
+    def remove_users_from_groups(self, groups, users, max_workers=None):
+        """Remove the same users from several groups, e.g. when offboarding a team. See
+        add_users_to_groups.
+
+        Returns:
+            dict: group name to a result dict, see add_users_to_group
+        """
+        return self._update_group_memberships('remove', list(groups), users, max_workers=max_workers)
+
     ### FIELD METHODS ###
     def get_all_fields(self):
-        """Get all fields for Jira instance
+        """Get all fields for Jira instance. The result also refreshes the client's field catalogue.
         https://developer.atlassian.com/cloud/jira/platform/rest/v3/api-group-issue-fields/#api-rest-api-3-field-get
         
         Returns:
@@ -251,15 +804,38 @@ class JiraClient:
         Raises:
             RuntimeError: raises this error if API call doesn't return a 200 status code
         """
-        response = self._session.get(
+        response = self._request(
+            'GET',
             f"{self.url_api_3}/field"
         )
-        if response.status != 200:
+        if response.status_code != 200:
             raise RuntimeError(f"API called failed. Reason: {response.reason}. JSON: {response.json()}")
-        return response.json()
+        fields = response.json()
+        self._field_catalogue = _FieldCatalogue(fields)
+        return fields
+
+    def _get_field_catalogue(self):
+        """Get the field catalogue, fetching all fields if it is missing or older than
+        field_cache_ttl. Concurrent callers wait for a single fetch.
+
+        Returns:
+            _FieldCatalogue
+        """
+        with self._field_catalogue_lock:
+            catalogue = self._field_catalogue
+            if catalogue is None or not catalogue.is_fresh(self.field_cache_ttl):
+                self.get_all_fields()
+                catalogue = self._field_catalogue
+        return catalogue
+
+    def invalidate_field_cache(self):
+        """Drop the field catalogue so the next lookup fetches all fields again, e.g. after a custom
+        field was created or renamed."""
+        self._field_catalogue = None
 
-    def get_field_by_name(self, name, exact_match=True):
-        """Get one field that matches a passed string
+    def get_field_by_name(self, name, exact_match=True, ignore_case=False):
+        """Get one field that matches a passed string. Uses the client's field catalogue, so
+        repeated lookups don't fetch all fields again until field_cache_ttl has passed.
         
         Args:
             name (str): the string to be used to identify a matching field.
@@ -267,6 +843,7 @@ class JiraClient:
         Kwargs:
             exact_match (bool): by default only a field with a name with an exact match will be 
                 returned. User can set to False to find a field that contains the passed string.
+            ignore_case (bool): match names case-insensitively.
 
         Returns:
             dict or None: will either return a single dict of the single matching field or None if 
@@ -275,18 +852,43 @@ class JiraClient:
         Raises:
             RuntimeError: if more than one field matches raises an error
         """
-        fields = self.get_all_fields()
-        if exact_match:
-            matching_fields = [f for f in fields if f['name'] == name]
-        else:
-            matching_fields = [f for f in fields if name in f['name']]
-        
-        if not matching_fields:
-            return None
-        elif len(matching_fields) == 1:
-            return matching_fields[0]
-        else:
-            raise RuntimeError(f"More than one field matching '{name}': {matching_fields}")
+        return self.get_fields_by_names([name], exact_match=exact_match, ignore_case=ignore_case)[name]
+
+    def get_fields_by_names(self, names, exact_match=True, ignore_case=False):
+        """Get the field matching each of the passed strings with a single fetch of all fields.
+
+        Args:
+            names (iterable[str]): the strings to be used to identify matching fields.
+
+        Kwargs:
+            exact_match (bool): see get_field_by_name.
+            ignore_case (bool): see get_field_by_name.
+
+        Returns:
+            dict: maps each name to the single matching field dict, or None if no field matches
+
+        Raises:
+            RuntimeError: if more than one field matches any of the names
+        """
+        catalogue = self._get_field_catalogue()
+        fields_by_name = {}
+        for name in names:
+            matching_fields = catalogue.find(name, exact_match=exact_match, ignore_case=ignore_case)
+            if len(matching_fields) > 1:
+                raise RuntimeError(f"More than one field matching '{name}': {matching_fields}")
+            fields_by_name[name] = matching_fields[0] if matching_fields else None
+        return fields_by_name
+
+    def get_field_by_id(self, field_id):
+        """Get a field by its ID from the client's field catalogue.
+
+        Args:
+            field_id (str): The ID of the field, e.g. `customfield_10010` or `summary`.
+
+        Returns:
+            dict or None: the field or None if no field has the ID
+        """
+        return self._get_field_catalogue().by_id.get(field_id)
 
     def get_all_custom_field_contexts(self, field_id, parameters={}):
         """Get contexts for a custom field
@@ -325,7 +927,7 @@ class JiraClient:
         """
         results = self._get_all_paginated_results(
             f"{self.url_api_3}/field/{field_id}/context/{context_id}/option",
-            params=parameters
+            parameters=parameters
         )
         return results
 
@@ -342,7 +944,8 @@ class JiraClient:
         Returns:
             requests.Response: returns the response of the API call
         """
-        response = self._session.put(
+        response = self._request(
+            'PUT',
             f"{self.url_api_3}/field/{field_id}/context/{context_id}/option",
             json={'options': options}
         )
@@ -361,12 +964,403 @@ class JiraClient:
         Returns:
             requests.Response: returns the response of the API call
         """
-        response = self._session.post(
+        response = self._request(
+            'POST',
             f"{self.url_api_3}/field/{field_id}/context/{context_id}/option",
             json={'options': options}
         )
         return response
 
+    @staticmethod
+    def _get_custom_field_option_changes(existing_options, desired_options, disable_missing=True):
+        """Diff the options of a context against the desired options.
+
+        Desired options are matched to existing ones by `id` if they have one, otherwise by
+        `value`. Child options of cascading select fields (those with an `optionId`) are ignored.
+
+        Args:
+            existing_options (list[dict]): options as returned by
+                get_all_custom_field_options_by_context.
+            desired_options (list): option values (str) or dicts with a `value` key and optionally
+                `id` and `disabled` keys.
+
+        Kwargs:
+            disable_missing (bool): disable existing options that aren't desired.
+
+        Returns:
+            tuple: (creates, updates, unchanged). creates and updates are lists of option dicts
+                ready to be sent to the API. unchanged is the number of options left as they are.
+        """
+        existing_options = [o for o in existing_options if 'optionId' not in o]
+        by_id = {o['id']: o for o in existing_options}
+        by_value = {o['value']: o for o in existing_options}
+        matched_ids = set()
+        creates = []
+        updates = []
+        unchanged = 0
+        for desired in desired_options:
+            if isinstance(desired, str):
+                desired = {'value': desired}
+            disabled = desired.get('disabled', False)
+            existing = by_id.get(desired.get('id')) or by_value.get(desired['value'])
+            if existing is None:
+                creates.append({'value': desired['value'], 'disabled': disabled})
+                continue
+            matched_ids.add(existing['id'])
+            if existing['value'] != desired['value'] or existing.get('disabled', False) != disabled:
+                updates.append({'id': existing['id'], 'value': desired['value'], 'disabled': disabled})
+            else:
+                unchanged += 1
+        for existing in existing_options:
+            if existing['id'] in matched_ids:
+                continue
+            if disable_missing and not existing.get('disabled', False):
+                updates.append({'id': existing['id'], 'value': existing['value'], 'disabled': True})
+            else:
+                unchanged += 1
+        return creates, updates, unchanged
+
+    def reconcile_custom_field_options(self, field_id, options_by_context, disable_missing=True, max_workers=None):
+        """Make the options of a custom field's contexts match the desired options, sending only the
+        creates and updates that are needed. Options that are no longer desired are disabled
+        rather than deleted, so issues that use them keep their values.
+
+        Writes are chunked to the API limit of options per request. Contexts are reconciled
+        concurrently, and the chunks of one context are sent one after another.
+
+        Args:
+            field_id (str): The ID of the custom field.
+            options_by_context (dict or list): context ID to a list of desired options, see
+                _get_custom_field_option_changes. A list of desired options applies to every context
+                of the field.
+
+        Kwargs:
+            disable_missing (bool): disable existing options that aren't desired.
+            max_workers (int): The maximum number of contexts reconciled at the same time. Defaults
+                to the max_workers of the client.
+
+        Returns:
+            dict: context ID to a dict with the keys
+                created (list[dict]): options created, as returned by the API
+                updated (list[dict]): options updated or disabled, as sent to the API
+                unchanged (int): number of options left as they are
+                failed (list[dict]): dicts with the keys options, status_code and error for every
+                    chunk that failed
+        """
+        if not isinstance(options_by_context, dict):
+            options_by_context = {
+                c['id']: options_by_context for c in self.get_all_custom_field_contexts(field_id)
+            }
+
+        def reconcile_context(context_id):
+            creates, updates, unchanged = self._get_custom_field_option_changes(
+                self.get_all_custom_field_options_by_context(field_id, context_id),
+                options_by_context[context_id],
+                disable_missing=disable_missing
+            )
+            result = {'created': [], 'updated': [], 'unchanged': unchanged, 'failed': []}
+            for options, send, key in [
+                (updates, self.update_custom_field_options_by_context, 'updated'),
+                (creates, self.create_custom_field_options_by_context, 'created'),
+            ]:
+                for i in range(0, len(options), _MAX_OPTIONS_PER_REQUEST):
+                    chunk = options[i:i + _MAX_OPTIONS_PER_REQUEST]
+                    response = send(field_id, context_id, chunk)
+                    if response.status_code != 200:
+                        result['failed'].append({'options': chunk, 'status_code': response.status_code, 'error': response.text})
+                    elif key == 'created':
+                        result['created'].extend(response.json().get('options', []))
+                    else:
+                        result['updated'].extend(chunk)
+            return result
+
+        results = {}
+        for context_id, result, exception in self._map_concurrently(
+            reconcile_context,
+            list(options_by_context),
+            max_workers=max_workers
+        ):
+            if exception:
+                _LOGGER.error(f"Failed to reconcile options of {field_id} in context {context_id}: {exception}")
+                result = {'created': [], 'updated': [], 'unchanged': 0, 'failed': [{'options': None, 'status_code': None, 'error': str(exception)}]}
+            elif result['failed']:
+                _LOGGER.error(f"Failed to write {len(result['failed'])} chunks of options of {field_id} in context {context_id}")
+            _LOGGER.info(
+                f"Options of {field_id} in context {context_id}: {len(result['created'])} created, "
+                f"{len(result['updated'])} updated, {result['unchanged']} unchanged"
+            )
+            results[context_id] = result
+        return results
+
+    ### ISSUE METHODS ###
+    def search_issues(self, jql, fields=None, expand=None, use_token_paging=False, page_workers=None):
+        """Stream the issues matching a JQL query. Pages are only fetched as the issues are
+        consumed, so memory use doesn't grow with the number of matching issues. Ask only for the
+        fields that are needed to keep pages small.
+        https://developer.atlassian.com/cloud/jira/platform/rest/v3/api-group-issue-search/#api-rest-api-3-search-post
+        https://developer.atlassian.com/cloud/jira/platform/rest/v3/api-group-issue-search/#api-rest-api-3-search-jql-post
+
+        Args:
+            jql (str): The JQL query.
+
+        Kwargs:
+            fields (list[str] or str): The fields to return for each issue, e.g.
+                ['summary', 'status']. Defaults to the server default (all navigable fields) for
+                startAt paging and to only the issue id for token paging.
+            expand (list[str] or str): The issue properties to expand, e.g. ['changelog'].
+            use_token_paging (bool): Use the `search/jql` endpoint, which pages with nextPageToken
+                instead of startAt. Required on instances where `search` has been retired.
+            page_workers (int): The number of pages that may be fetched at the same time with startAt
+                paging. Defaults to the page_workers of the client.
+
+        Returns:
+            generator: yields dicts where each dict is an issue
+
+        Raises:
+            HTTPError: raised while iterating if a page can't be fetched, e.g. invalid JQL.
+        """
+        if isinstance(fields, str):
+            fields = [f.strip() for f in fields.split(',')]
+        if isinstance(expand, str):
+            expand = [e.strip() for e in expand.split(',')]
+        parameters = {'jql': jql}
+        if fields:
+            parameters['fields'] = list(fields)
+        if use_token_paging:
+            if expand:
+                parameters['expand'] = ','.join(expand)
+            return self._get_token_paginated_results(
+                f"{self.url_api_3}/search/jql",
+                results_key='issues',
+                parameters=parameters
+            )
+        if expand:
+            parameters['expand'] = list(expand)
+        return self._get_paginated_results(
+            f"{self.url_api_3}/search",
+            results_key='issues',
+            parameters=parameters,
+            use_post=True,
+            page_workers=page_workers
+        )
+
+    def _adf_request_kwargs(self, payload, stream):
+        """Get the request kwargs that send a payload containing ADF, either as one JSON string or
+        streamed with chunked transfer encoding. Both are compact JSON, the encoding the ADF size
+        limits (e.g. the splitting of construct_adf_comments_with_dataframe) are measured in.
+        """
+        if stream:
+            return {'data': ADFJSONBody(payload)}
+        return {'data': encode_json(payload)}
+
+    def add_issue_comment(self, issue_key, body, stream=False):
+        """Add a comment to an issue
+        https://developer.atlassian.com/cloud/jira/platform/rest/v3/api-group-issue-comments/#api-rest-api-3-issue-issueidorkey-comment-post
+
+        Args:
+            issue_key (str): The key or ID of the issue.
+            body (dict or ADFNode): The comment as an ADF doc, e.g. built with ADF or CompactADF.
+
+        Kwargs:
+            stream (bool): Encode the comment while it is sent instead of all at once, which keeps
+                peak memory low for multi-MB documents.
+
+        Returns:
+            requests.Response: returns the response of the API call. A 201 means success.
+        """
+        response = self._request(
+            'POST',
+            f"{self.url_api_3}/issue/{issue_key}/comment",
+            **self._adf_request_kwargs({'body': body}, stream)
+        )
+        if response.status_code != 201:
+            _LOGGER.warning(f"Call to add a comment to {issue_key} failed with status code: {response.status_code}; Reason: {response.reason}; JSON: {response.text}")
+        return response
+
+    def update_issue_description(self, issue_key, description, stream=False):
+        """Replace the description of an issue
+        https://developer.atlassian.com/cloud/jira/platform/rest/v3/api-group-issues/#api-rest-api-3-issue-issueidorkey-put
+
+        Args:
+            issue_key (str): The key or ID of the issue.
+            description (dict or ADFNode): The description as an ADF doc.
+
+        Kwargs:
+            stream (bool): see add_issue_comment.
+
+        Returns:
+            requests.Response: returns the response of the API call. A 204 means success.
+        """
+        response = self._request(
+            'PUT',
+            f"{self.url_api_3}/issue/{issue_key}",
+            **self._adf_request_kwargs({'fields': {'description': description}}, stream)
+        )
+        if response.status_code != 204:
+            _LOGGER.warning(f"Call to update the description of {issue_key} failed with status code: {response.status_code}; Reason: {response.reason}; JSON: {response.text}")
+        return response
+
+    ### AGILE METHODS ###
+    def get_board_sprints(self, board_id, state=None):
+        """Get all sprints of a board
+        https://developer.atlassian.com/cloud/jira/software/rest/api-group-board/#api-rest-agile-1-0-board-boardid-sprint-get
+
+        Args:
+            board_id (int): The ID of the board.
+
+        Kwargs:
+            state (str): Comma separated sprint states to filter by: future, active, closed.
+
+        Returns:
+            list[dict]: list of dicts of sprints
+        """
+        parameters = {'state': state} if state else {}
+        return self._get_all_paginated_results(
+            f"{self.url_agile_1}/board/{board_id}/sprint",
+            parameters=parameters
+        )
+
+    def create_sprint(self, name, board_id, start_date=None, end_date=None, goal=None):
+        """Create a future sprint on a board
+        https://developer.atlassian.com/cloud/jira/software/rest/api-group-sprint/#api-rest-agile-1-0-sprint-post
+
+        Args:
+            name (str): The name of the sprint.
+            board_id (int): The ID of the board the sprint is created on.
+
+        Kwargs:
+            start_date (str): The ISO 8601 start date of the sprint, e.g. 2015-04-11T15:22:00.000+10:00
+            end_date (str): The ISO 8601 end date of the sprint.
+            goal (str): The goal of the sprint.
+
+        Returns:
+            requests.Response: returns the response of the API call. A 201 means success and the
+                JSON is the created sprint.
+        """
+        payload = {'name': name, 'originBoardId': board_id}
+        if start_date:
+            payload['startDate'] = start_date
+        if end_date:
+            payload['endDate'] = end_date
+        if goal:
+            payload['goal'] = goal
+        response = self._request('POST', f"{self.url_agile_1}/sprint", json=payload)
+        if response.status_code != 201:
+            _LOGGER.warning(f"Call to create sprint `{name}` on board {board_id} failed with status code: {response.status_code}; Reason: {response.reason}; JSON: {response.text}")
+        return response
+
+    def get_board_issues(self, board_id, jql=None, fields=None):
+        """Stream the issues of a board, i.e. the issues matching the board's filter, optionally
+        narrowed down by more JQL.
+        https://developer.atlassian.com/cloud/jira/software/rest/api-group-board/#api-rest-agile-1-0-board-boardid-issue-get
+
+        Args:
+            board_id (int): The ID of the board.
+
+        Kwargs:
+            jql (str): JQL that further restricts the issues of the board.
+            fields (list[str]): The fields to return for each issue. Defaults to all navigable
+                fields.
+
+        Returns:
+            generator: yields dicts where each dict is an issue
+        """
+        parameters = {}
+        if jql:
+            parameters['jql'] = jql
+        if fields:
+            parameters['fields'] = ','.join(fields)
+        return self._get_paginated_results(
+            f"{self.url_agile_1}/board/{board_id}/issue",
+            results_key='issues',
+            parameters=parameters
+        )
+
+    def move_issues_to_sprint(self, sprint_id, issue_keys):
+        """Move issues to a sprint. At most MAX_ISSUES_PER_SPRINT_MOVE issues can be moved at once.
+        https://developer.atlassian.com/cloud/jira/software/rest/api-group-sprint/#api-rest-agile-1-0-sprint-sprintid-issue-post
+
+        Args:
+            sprint_id (int): The ID of the sprint.
+            issue_keys (list[str]): The keys or IDs of the issues.
+
+        Returns:
+            requests.Response: returns the response of the API call. A 204 means success.
+        """
+        response = self._request(
+            'POST',
+            f"{self.url_agile_1}/sprint/{sprint_id}/issue",
+            json={'issues': list(issue_keys)},
+            # moving issues to the same sprint again doesn't change anything
+            idempotent=True
+        )
+        if response.status_code != 204:
+            _LOGGER.warning(f"Call to move {len(issue_keys)} issues to sprint {sprint_id} failed with status code: {response.status_code}; Reason: {response.reason}; JSON: {response.text}")
+        return response
+
+    def get_board_quick_filters(self, board_id):
+        """Get all quick filters of a board
+        https://developer.atlassian.com/cloud/jira/software/rest/api-group-board/#api-rest-agile-1-0-board-boardid-quickfilter-get
+
+        Args:
+            board_id (int): The ID of the board.
+
+        Returns:
+            list[dict]: list of dicts of quick filters with the keys id, boardId, name, jql,
+                description and position
+        """
+        return self._get_all_paginated_results(f"{self.url_agile_1}/board/{board_id}/quickfilter")
+
+    def create_board_quick_filter(self, board_id, name, jql, description=None):
+        """Create a quick filter on a board.
+
+        The agile API can only read quick filters, so this uses the endpoint of the board
+        configuration page, which is undocumented and may change without notice.
+
+        Args:
+            board_id (int): The ID of the board.
+            name (str): The name of the quick filter.
+            jql (str): The JQL of the quick filter.
+
+        Kwargs:
+            description (str): The description of the quick filter.
+
+        Returns:
+            requests.Response: returns the response of the API call. A 200 means success.
+        """
+        response = self._request(
+            'POST',
+            f"{self.url_greenhopper}/quickfilters/{board_id}",
+            json={'name': name, 'query': jql, 'description': description or ''}
+        )
+        if response.status_code != 200:
+            _LOGGER.warning(f"Call to create quick filter `{name}` on board {board_id} failed with status code: {response.status_code}; Reason: {response.reason}; JSON: {response.text}")
+        return response
+
+    def update_board_quick_filter(self, board_id, quick_filter_id, name, jql, description=None):
+        """Update a quick filter of a board. See create_board_quick_filter about the endpoint.
+
+        Args:
+            board_id (int): The ID of the board.
+            quick_filter_id (int): The ID of the quick filter.
+            name (str): The name of the quick filter.
+            jql (str): The JQL of the quick filter.
+
+        Kwargs:
+            description (str): The description of the quick filter.
+
+        Returns:
+            requests.Response: returns the response of the API call. A 200 means success.
+        """
+        response = self._request(
+            'PUT',
+            f"{self.url_greenhopper}/quickfilters/{board_id}/{quick_filter_id}",
+            json={'id': quick_filter_id, 'name': name, 'query': jql, 'description': description or ''}
+        )
+        if response.status_code != 200:
+            _LOGGER.warning(f"Call to update quick filter `{name}` ({quick_filter_id}) on board {board_id} failed with status code: {response.status_code}; Reason: {response.reason}; JSON: {response.text}")
+        return response
+
     ### COMPONENT RELATED ###
     def get_project_components(self, project_key):
         """Get all components for a project
@@ -381,7 +1375,8 @@ class JiraClient:
         Raises:
             RuntimeError: raises an error if the call fails
         """
-        response = self._session.get(
+        response = self._request(
+            'GET',
             f"{self.url_api_3}/project/{project_key}/components"
         )
         if response.status_code != 200:
@@ -421,7 +1416,8 @@ class JiraClient:
         Returns:
             requests.Response: returns the response of the API call
         """
-        response = self._session.post(
+        response = self._request(
+            'POST',
             f"{self.url_api_3}/component",
             json={
                 'project': project_key,
@@ -475,7 +1471,8 @@ class JiraClient:
             update['leadAccountId'] = lead_account_id
         if assignee_type is not None:
             update['assigneeType'] = assignee_type
-        response = self._session.put(
+        response = self._request(
+            'PUT',
             f"{self.url_api_3}/component/{component_id}",
             json=update
         )
@@ -483,12 +1480,33 @@ class JiraClient:
             _LOGGER.warning(f"Call to update the component {component_id} {name} failed with status code: {response.status_code}; Reason: {response.reason}; JSON: {response.json()}")
         return response
 
-    def create_or_update_components(self, project_key, components):
+    @staticmethod
+    def _get_component_changes(existing_component, component):
+        """Compare an existing component with a desired one.
+
+        Args:
+            existing_component (dict): a component as returned by get_project_components.
+            component (dict): a component as passed to create_or_update_components.
+
+        Returns:
+            dict: the update_component kwargs of the fields that differ. Empty if nothing changed.
+        """
+        existing_lead = existing_component.get('leadAccountId') or existing_component.get('lead', {}).get('accountId')
+        changes = {}
+        if (component.get('description') or '') != (existing_component.get('description') or ''):
+            changes['description'] = component.get('description') or ''
+        if component.get('lead_account_id') is not None and component['lead_account_id'] != existing_lead:
+            changes['lead_account_id'] = component.get('lead_account_id')
+        if component.get('assignee_type') and component['assignee_type'] != existing_component.get('assigneeType'):
+            changes['assignee_type'] = component['assignee_type']
+        return changes
+
+    def create_or_update_components(self, project_key, components, max_workers=None, include_unchanged=True):
         """Create components in bulk. If component of the same name already exists, the existing
         component will be updated.
 
         Args:
-            project_key (str):
+            project_key (str): the key for the project in Jira
             components (list[dict]): a list of components with the following keys:
                 name (str): The unique name for the component in the project. The maximum length 
                     is 255 characters.
@@ -508,42 +1526,96 @@ class JiraClient:
                         PROJECT_DEFAULT the assignee to any issues created with this component is 
                             nominally the default assignee for the project that the component is in.
         
+        Kwargs:
+            max_workers (int): The maximum number of calls in flight. Defaults to the max_workers
+                of the client.
+            include_unchanged (bool): Also return the existing components that already matched and
+                weren't updated, as they exist, so there is one component per component passed
+                when all calls succeed. Pass False to only get the ones created or updated.
+
         Returns:
-            list[dict]: a list of dicts of successfully updated components
+            list[dict]: a list of dicts of successfully created or updated components, in the order
+                they were passed. Components that already matched aren't updated, and are
+                included unless include_unchanged is False.
         """
-        existing_components = self.get_project_components(project_key)
-        _LOGGER.debug(f"Components already existing in project {project_key}:")
-        _LOGGER.debug([c.get('name') for c in existing_components])
-        created_updated_components = []
+        return self.create_or_update_components_in_projects(
+            {project_key: components},
+            max_workers=max_workers,
+            include_unchanged=include_unchanged
+        )[project_key]
+
+    def create_or_update_components_in_projects(self, components_by_project, max_workers=None, include_unchanged=True):
+        """Create or update components in many projects. Existing components of every project are
+        fetched concurrently, and then all creates and updates share one pool of workers. See
+        create_or_update_components.
+
+        Args:
+            components_by_project (dict): project key to a list of components, see
+                create_or_update_components.
+
+        Kwargs:
+            max_workers (int): The maximum number of calls in flight. Defaults to the max_workers
+                of the client.
+            include_unchanged (bool): see create_or_update_components.
+
+        Returns:
+            dict: project key to a list of dicts of successfully created or updated components,
+                and unchanged ones unless include_unchanged is False
+        """
+        results = {project_key: {} for project_key in components_by_project}
         errors = []
-        for c in components:
-            exists = False
-            for ec in existing_components:
-                if c['name'] == ec['name']:
-                    exists = ec
-                    break
+        changes = []
+        for project_key, existing_components, exception in self._map_concurrently(
+            self.get_project_components,
+            list(components_by_project),
+            max_workers=max_workers
+        ):
+            if exception:
+                _LOGGER.error(f"Failed to get components of project {project_key}: {exception}")
+                errors.extend(components_by_project[project_key])
+                continue
+            _LOGGER.debug(f"Components already existing in project {project_key}:")
+            _LOGGER.debug([c.get('name') for c in existing_components])
+            existing_by_name = {ec['name']: ec for ec in existing_components}
+            for i, c in enumerate(components_by_project[project_key]):
+                exists = existing_by_name.get(c['name'])
+                if not exists:
+                    changes.append((project_key, i, c, None, None))
+                    continue
+                update = self._get_component_changes(exists, c)
+                if update:
+                    changes.append((project_key, i, c, exists, update))
+                else:
+                    _LOGGER.debug(f"Component {c['name']} is unchanged in {project_key}")
+                    if include_unchanged:
+                        results[project_key][i] = exists
+
+        def create_or_update(change):
+            project_key, _, c, exists, update = change
             if exists:
-                response = self.update_component(
-                    exists['id'],
-                    name=c['name'],
-                    description=c['description'],
-                    lead_account_id=c['lead_account_id'],
-                    assignee_type=c['assignee_type'],
-                )
-            else:
-                response = self.create_component(
-                    project_key,
-                    c['name'],
-                    c['lead_account_id'],
-                    description=c['description'],
-                    assignee_type=c['assignee_type'],
-                )
-            if response.status_code == 200:
+                return self.update_component(exists['id'], **update)
+            return self.create_component(
+                project_key,
+                c['name'],
+                c['lead_account_id'],
+                description=c['description'],
+                assignee_type=c['assignee_type'],
+            )
+
+        for (project_key, i, c, _, _), response, exception in self._map_concurrently(
+            create_or_update,
+            changes,
+            max_workers=max_workers
+        ):
+            if exception:
+                _LOGGER.error(f"""Call to create/update component "{c['name']}" in {project_key} failed: {exception}""")
+                errors.append(c)
+            elif response.status_code == 200:
                 _LOGGER.debug(f"Component {c['name']} updated in {project_key}")
-                created_updated_components.append(response.json())
+                results[project_key][i] = response.json()
             elif response.status_code == 201:
                 _LOGGER.debug(f"Component {c['name']} created in {project_key}")
-                created_updated_components.append(response.json())
+                results[project_key][i] = response.json()
             else:
                 _LOGGER.error(f"""Call to create/update component "{c['name']}" failed with status code {response.status_code}""")
                 _LOGGER.error(f"Reason: {response.reason}")
@@ -551,4 +1623,7 @@ class JiraClient:
                 errors.append(c)
         if errors:
             _LOGGER.error(f"There were {len(errors)}: {errors}")
-        return created_updated_components
+        return {
+            project_key: [components[i] for i in sorted(components)]
+            for project_key, components in results.items()
+        }
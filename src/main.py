@@ -1,11 +1,71 @@
 import argparse
 
+from group_sync import GroupSyncEngine
+from group_sync import load_mappings
+from jira_client import JiraClient
+from quick_filters import QuickFilterManager
+from quick_filters import load_config as load_quick_filter_config
+from sprint_assignment import SprintAssignmentEngine
+from sprint_assignment import load_rules
+from sprint_management import SprintManager
+from sprint_management import load_boards
 from utils import get_logger
 
 
+def run_plan(engine, plan, dry_run):
+    """Print a plan and apply it unless dry_run is set.
+
+    Returns:
+        list[dict]: the results of engine.apply, empty for a dry run
+    """
+    print(engine.format_plan(plan))
+    if dry_run:
+        return []
+    return engine.apply(plan)
+
+
+def exit_on_failure(results):
+    if not all(r['ok'] for r in results):
+        raise SystemExit(1)
+
+
+def sync_groups(args):
+    engine = GroupSyncEngine(JiraClient(), max_workers=args.max_workers)
+    plan = engine.plan(load_mappings(args.config))
+    exit_on_failure(run_plan(engine, plan, args.dry_run))
+
+
+def edit_sprints(args):
+    engine = SprintAssignmentEngine(JiraClient(), max_workers=args.max_workers)
+    plan = engine.plan(load_rules(args.config))
+    exit_on_failure(run_plan(engine, plan, args.dry_run))
+
+
+def manage_sprints(args):
+    boards = load_boards(args.config)
+    manager = SprintManager(JiraClient(), max_workers=args.max_workers)
+    plan = manager.plan(boards, args.start, args.end)
+    results = run_plan(manager, plan, args.dry_run)
+    if args.dry_run:
+        return
+    for board in boards:
+        for sprint in manager.get_sprints(board['board_id'], args.start, args.end):
+            print(f"board {board['board_id']}: {sprint['id']} {sprint['name']} ({sprint['startDate']} - {sprint['endDate']})")
+    exit_on_failure(results)
+
+
+def manage_quick_filters(args):
+    board_ids, filters = load_quick_filter_config(args.config)
+    manager = QuickFilterManager(JiraClient(), max_workers=args.max_workers)
+    plan = manager.plan(board_ids, filters)
+    exit_on_failure(run_plan(manager, plan, args.dry_run))
+
+
 def main(args):
 
     _LOGGER = get_logger('main', debug=args.debug)
+    if getattr(args, 'func', None):
+        args.func(args)
 
 
 if __name__ == '__main__':
@@ -18,5 +78,53 @@ if __name__ == '__main__':
         default=False,
         help='Set logger to debug level'
     )
+    subparsers = parser.add_subparsers(title='scripts')
+
+    # the options shared by the scripts that plan changes from a config file and apply them
+    plan_parser = argparse.ArgumentParser(add_help=False)
+    plan_parser.add_argument('--config', required=True, help='Path to the JSON config, see the README')
+    plan_parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        default=False,
+        help='Print the changes without applying them'
+    )
+    plan_parser.add_argument(
+        '--max-workers',
+        type=int,
+        default=None,
+        help='Number of calls in flight at the same time'
+    )
+
+    sync_groups_parser = subparsers.add_parser(
+        'sync-groups',
+        parents=[plan_parser],
+        help='Sync group memberships based on a mapping config file'
+    )
+    sync_groups_parser.set_defaults(func=sync_groups)
+
+    edit_sprints_parser = subparsers.add_parser(
+        'edit-sprints',
+        parents=[plan_parser],
+        help='Move issues to sprints based on board JQL rules in a config file'
+    )
+    edit_sprints_parser.set_defaults(func=edit_sprints)
+
+    manage_sprints_parser = subparsers.add_parser(
+        'manage-sprints',
+        parents=[plan_parser],
+        help='Create the sprints missing from a date range on the boards of a config file'
+    )
+    manage_sprints_parser.add_argument('--start', required=True, help='Start of the range, e.g. 2021-01-04')
+    manage_sprints_parser.add_argument('--end', required=True, help='End of the range (exclusive), e.g. 2021-04-05')
+    manage_sprints_parser.set_defaults(func=manage_sprints)
+
+    quick_filters_parser = subparsers.add_parser(
+        'quick-filters',
+        parents=[plan_parser],
+        help='Create and update the Quick Filters of boards based on a config file'
+    )
+    quick_filters_parser.set_defaults(func=manage_quick_filters)
+
     args = parser.parse_args()
     main(args)
@@ -0,0 +1,180 @@
+"""
+
+Rolls out standard Quick Filters to boards based on a config file.
+
+Example config:
+    {
+        "boards": [12, 34, 56],
+        "filters": [
+            {"name": "Only My Issues", "jql": "assignee = currentUser()"},
+            {"name": "Blocked", "jql": "status = Blocked", "description": "Waiting on someone else"}
+        ]
+    }
+
+Every filter is applied to every board. A filter is matched to the board's existing quick filters by
+name: missing filters are created and filters whose JQL or description differ are updated. A filter
+without a description leaves the existing description alone. Quick filters that aren't in the
+config are never touched.
+
+"""
+
+import json
+
+from utils import apply_concurrently
+from utils import get_all_concurrently
+from utils import get_logger
+
+
+_LOGGER = get_logger('quick_filters')
+
+
+def load_config(path):
+    """Load and validate the boards and filters of a config file.
+
+    Args:
+        path (str): The path of a JSON config file.
+
+    Returns:
+        tuple: (list of board IDs, list of filters with the keys name, jql and description)
+
+    Raises:
+        ValueError: if a filter is missing its name or JQL, or two filters have the same name
+    """
+    with open(path) as f:
+        config = json.load(f)
+    filters = []
+    names = set()
+    for i, f in enumerate(config.get('filters', [])):
+        if not f.get('name') or not f.get('jql'):
+            raise ValueError(f"Filter {i} needs both a `name` and a `jql`: {f}")
+        if f['name'] in names:
+            raise ValueError(f"Filter {i} has the same name as an earlier filter: {f}")
+        names.add(f['name'])
+        filters.append({'name': f['name'], 'jql': f['jql'], 'description': f.get('description')})
+    return list(dict.fromkeys(config.get('boards', []))), filters
+
+
+class QuickFilterManager:
+    """Computes the quick filter creates and updates needed on many boards and sends them
+    concurrently. The existing filters of each board are fetched once, concurrently.
+    """
+
+    def __init__(self, client, max_workers=None):
+        """
+        Args:
+            client (JiraClient): The client used to read and write quick filters.
+
+        Kwargs:
+            max_workers (int): The number of calls in flight at the same time. Defaults to the
+                max_workers of the client.
+        """
+        self.client = client
+        self.max_workers = max_workers or client.max_workers
+
+    @staticmethod
+    def _get_filter_changes(existing, desired):
+        """Get the fields of an existing quick filter that differ from the desired one.
+
+        Returns:
+            dict: field name to desired value, empty if nothing needs to change
+        """
+        changes = {}
+        # whitespace differences in JQL don't change what the filter matches
+        if ' '.join(existing.get('jql', '').split()) != ' '.join(desired['jql'].split()):
+            changes['jql'] = desired['jql']
+        if desired['description'] is not None and (existing.get('description') or '') != desired['description']:
+            changes['description'] = desired['description']
+        return changes
+
+    def plan(self, board_ids, filters):
+        """Compute the changes needed to give every board the filters.
+
+        Args:
+            board_ids (list[int]): The boards to update.
+            filters (list[dict]): see load_config.
+
+        Returns:
+            list[dict]: changes with the keys action (`create` or `update`), board_id, filter (the
+                desired filter), existing (the existing quick filter, for updates) and changes (the
+                fields that differ, for updates)
+
+        Raises:
+            RuntimeError: if the filters of any board can't be fetched
+        """
+        # a board whose filters are unknown would get duplicates
+        existing_by_board = get_all_concurrently(
+            self.client.get_board_quick_filters,
+            board_ids,
+            self.max_workers,
+            'the quick filters of {} boards'
+        )
+        existing_by_board = {board_id: {f['name']: f for f in existing} for board_id, existing in existing_by_board.items()}
+
+        plan = []
+        for board_id in board_ids:
+            for desired in filters:
+                existing = existing_by_board[board_id].get(desired['name'])
+                if existing is None:
+                    plan.append({'action': 'create', 'board_id': board_id, 'filter': desired, 'existing': None, 'changes': None})
+                    continue
+                changes = self._get_filter_changes(existing, desired)
+                if changes:
+                    plan.append({'action': 'update', 'board_id': board_id, 'filter': desired, 'existing': existing, 'changes': changes})
+        _LOGGER.info(f"{len(plan)} quick filter changes needed on {len(board_ids)} boards for {len(filters)} filters")
+        return plan
+
+    @staticmethod
+    def format_plan(plan):
+        """Render a plan for a dry run.
+
+        Returns:
+            str: one line per change, `+` for creates and `~` for updates
+        """
+        lines = []
+        for change in plan:
+            if change['action'] == 'create':
+                lines.append(f"+ board {change['board_id']}: {change['filter']['name']}: {change['filter']['jql']}")
+            else:
+                lines.append(f"~ board {change['board_id']}: {change['filter']['name']}: {change['changes']}")
+        creates = len([x for x in plan if x['action'] == 'create'])
+        lines.append(f"{creates} to create, {len(plan) - creates} to update")
+        return '\n'.join(lines)
+
+    def _apply_change(self, change):
+        desired = change['filter']
+        if change['action'] == 'create':
+            return self.client.create_board_quick_filter(
+                change['board_id'],
+                desired['name'],
+                desired['jql'],
+                description=desired['description']
+            )
+        existing = change['existing']
+        description = desired['description']
+        return self.client.update_board_quick_filter(
+            change['board_id'],
+            existing['id'],
+            desired['name'],
+            desired['jql'],
+            description=existing.get('description') if description is None else description
+        )
+
+    def apply(self, plan):
+        """Send the changes of a plan concurrently.
+
+        Args:
+            plan (list[dict]): see plan.
+
+        Returns:
+            list[dict]: one result per change, in the order of the plan, with the keys change, ok,
+                status_code and error
+        """
+        results = apply_concurrently(self._apply_change, plan, self.max_workers, (200,), 'change')
+        failures = [r for r in results if not r['ok']]
+        for r in failures:
+            _LOGGER.error(
+                f"Failed to {r['change']['action']} quick filter `{r['change']['filter']['name']}` "
+                f"on board {r['change']['board_id']}: {r['status_code']} {r['error']}"
+            )
+        _LOGGER.info(f"Applied {len(results) - len(failures)} of {len(results)} quick filter changes")
+        return results
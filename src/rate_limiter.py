@@ -0,0 +1,204 @@
+"""
+
+Client side rate limiting for the Jira Cloud REST API.
+
+Jira Cloud rate limiting documentation: https://developer.atlassian.com/cloud/jira/platform/rate-limiting/
+
+"""
+
+import random
+import threading
+import time
+from datetime import datetime
+from datetime import timezone
+
+
+# status codes that are worth retrying; 429 means the request was throttled
+RETRY_STATUS_CODES = frozenset([429, 502, 503, 504])
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header, which is either a number of seconds or an HTTP date.
+
+    Returns:
+        float or None: The number of seconds to wait, or None if the value can't be parsed
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = datetime.strptime(value, '%a, %d %b %Y %H:%M:%S GMT').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def parse_rate_limit_reset(value):
+    """Parse an X-RateLimit-Reset header, which is an ISO 8601 timestamp.
+
+    Returns:
+        float or None: The number of seconds until the reset, or None if the value can't be parsed
+    """
+    if not value:
+        return None
+    try:
+        reset_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt, retry_after=None, base=0.5, cap=30.0):
+    """Get a jittered delay before retrying a request.
+
+    Args:
+        attempt (int): The number of the attempt that failed, starting at 0.
+
+    Kwargs:
+        retry_after (float): The delay requested by the server, if any. It is used as the minimum.
+        base (float): The delay of the first retry before jitter is applied.
+        cap (float): The maximum delay before jitter is applied.
+
+    Returns:
+        float: The number of seconds to wait
+    """
+    if retry_after is not None:
+        # spread out the callers that were all told to come back at the same time
+        return retry_after + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RateLimiter:
+    """Thread-safe token bucket. One instance is shared by every call a client makes, and it can be
+    shared between clients, so that parallel and bulk calls are paced together.
+
+    Tokens are added at `rate` per second up to `burst`. Every request takes one token and waits if
+    none are left. A 429 with a Retry-After header, or an exhausted X-RateLimit-Remaining, pauses
+    every caller until the server says requests may resume.
+    """
+
+    def __init__(self, rate=10.0, burst=None):
+        """
+        Kwargs:
+            rate (float): The number of requests per second allowed on average.
+            burst (int): The number of requests that may be sent at once after a quiet period.
+                Defaults to rate.
+        """
+        self.rate = float(rate)
+        self.burst = burst or max(1, int(rate))
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        # tokens are refilled from this point in time; it lies in the future while paused
+        self._updated = time.monotonic()
+        self._throttled_count = 0
+        self._limit = None
+        self._remaining = None
+        self._reset = None
+        self._near_limit = False
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self):
+        """Take a token without waiting for it. Useful for callers that wait in their own way,
+        e.g. with asyncio.sleep.
+
+        Returns:
+            float: The number of seconds the caller must wait before sending its request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            return max(0.0, self._updated - now) + max(0.0, -self._tokens) / self.rate
+
+    def acquire(self):
+        """Take a token, blocking the calling thread until the request may be sent."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the passed number of seconds.
+
+        Args:
+            seconds (float): The number of seconds every caller should wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            until = now + seconds
+            if until > self._updated:
+                self._tokens = min(self._tokens, 0.0)
+                self._updated = until
+
+    def update_from_headers(self, headers, status_code=None):
+        """Adjust the limiter with the rate limit headers of a response.
+
+        Args:
+            headers (dict): The response headers.
+
+        Kwargs:
+            status_code (int): The status code of the response.
+
+        Returns:
+            float or None: The Retry-After delay of the response in seconds, if any
+        """
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        limit = headers.get('X-RateLimit-Limit')
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        near_limit = headers.get('X-RateLimit-NearLimit')
+        with self._lock:
+            if status_code == 429:
+                self._throttled_count += 1
+            if limit is not None:
+                self._limit = limit
+            if remaining is not None:
+                self._remaining = remaining
+            if reset is not None:
+                self._reset = reset
+            if near_limit is not None:
+                self._near_limit = near_limit.lower() == 'true'
+                if self._near_limit:
+                    # stop bursting and send at the steady rate until the server is comfortable again
+                    self._tokens = min(self._tokens, 0.0)
+        if retry_after is not None and (status_code == 429 or status_code == 503):
+            self.pause(retry_after)
+        elif remaining is not None and remaining.strip() == '0':
+            reset_in = parse_rate_limit_reset(reset)
+            if reset_in:
+                self.pause(reset_in)
+        return retry_after
+
+    def state(self):
+        """Get the current state of the limiter.
+
+        Returns:
+            dict: with the keys rate, burst, tokens, paused_for (seconds until tokens are handed out
+                again), throttled_count (number of 429 responses seen) and the last seen values of
+                the X-RateLimit-Limit, X-RateLimit-Remaining, X-RateLimit-Reset and
+                X-RateLimit-NearLimit headers
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': self._tokens,
+                'paused_for': max(0.0, self._updated - now),
+                'throttled_count': self._throttled_count,
+                'limit': self._limit,
+                'remaining': self._remaining,
+                'reset': self._reset,
+                'near_limit': self._near_limit,
+            }
@@ -0,0 +1,154 @@
+"""
+
+In-memory cache of GET responses that revalidates stale entries with conditional requests.
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class _CacheEntry:
+    __slots__ = ('response', 'stored_at', 'size')
+
+    def __init__(self, response):
+        self.response = response
+        self.stored_at = time.monotonic()
+        self.size = len(response.content or b'')
+
+
+class ResponseCache:
+    """Thread-safe, size-bounded LRU cache of successful GET responses.
+
+    Entries younger than `ttl` seconds are served without a request. Older entries are kept and,
+    if the server sent an ETag or Last-Modified header, are revalidated with If-None-Match or
+    If-Modified-Since, so an unchanged resource costs a 304 instead of the full body.
+    """
+
+    def __init__(self, ttl=60, max_entries=256, max_bytes=50 * 1024 * 1024):
+        """
+        Kwargs:
+            ttl (float): Seconds an entry is served without asking the server.
+            max_entries (int): The maximum number of responses kept.
+            max_bytes (int): The maximum total size of the response bodies kept.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(url, params=None, user=None):
+        """Build the cache key of a request.
+
+        Args:
+            url (str): The full url of the request.
+
+        Kwargs:
+            params (dict): The URL parameters of the request.
+            user (str): The user the request is authenticated as. What a call returns depends on
+                the permissions of the user, so a cache shared by clients of different users keeps
+                their responses apart.
+
+        Returns:
+            tuple
+        """
+        if not params:
+            return (user, url, ())
+        return (user, url, tuple(sorted((str(k), str(v)) for k, v in params.items())))
+
+    def get(self, key):
+        """Get the entry stored for key, marking it as recently used.
+
+        Returns:
+            _CacheEntry or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry):
+        return time.monotonic() - entry.stored_at < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Get the headers that revalidate an entry with the server.
+
+        Returns:
+            dict: possibly empty if the server sent no validators
+        """
+        headers = {}
+        etag = entry.response.headers.get('ETag')
+        last_modified = entry.response.headers.get('Last-Modified')
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def revalidated(self, entry):
+        """Mark an entry as confirmed unchanged by the server (a 304 response)."""
+        with self._lock:
+            entry.stored_at = time.monotonic()
+            self.revalidations += 1
+
+    def store(self, key, response):
+        """Store a response, evicting the least recently used entries if the cache is full.
+        Responses larger than max_bytes are not stored.
+
+        Args:
+            key (tuple): The cache key from ResponseCache.key.
+            response (requests.Response): The response.
+        """
+        entry = _CacheEntry(response)
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Get the cache counters.
+
+        Returns:
+            dict: with the keys hits, misses, revalidations, evictions, entries and bytes
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
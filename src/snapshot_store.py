@@ -0,0 +1,243 @@
+"""
+
+Local SQLite snapshots of groups and their memberships that can be refreshed incrementally.
+
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+
+from utils import get_logger
+from utils import map_concurrently
+
+
+_LOGGER = get_logger('snapshot_store')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (
+    name TEXT PRIMARY KEY,
+    group_id TEXT,
+    member_count INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    group_name TEXT NOT NULL REFERENCES groups (name) ON DELETE CASCADE,
+    account_id TEXT NOT NULL,
+    member_json TEXT NOT NULL,
+    PRIMARY KEY (group_name, account_id)
+);
+CREATE INDEX IF NOT EXISTS members_account_id ON members (account_id);
+"""
+
+
+def _content_hash(members):
+    """Hash the member records of a group independently of their order."""
+    digest = hashlib.sha256()
+    for member in sorted(members, key=lambda m: m['accountId']):
+        digest.update(json.dumps(member, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class GroupSnapshotStore:
+    """Stores the output of JiraClient.get_all_groups and JiraClient.get_group_members in a SQLite
+    file, keyed by group name, with the time each group was fetched and a hash of its members.
+
+    Example:
+        with GroupSnapshotStore('groups.sqlite') as store:
+            summary = store.refresh(JiraClient(), ttl=24 * 60 * 60)
+            store.get_user_groups('5b10ac8d82e05b22cc7d4ef5')
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The path of the SQLite file. It is created if it doesn't exist.
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._connection.close()
+
+    ### READ METHODS ###
+    def get_groups(self):
+        """Get the snapshot metadata of every stored group.
+
+        Returns:
+            list[dict]: dicts with the keys name, group_id, member_count, content_hash, fetched_at
+        """
+        rows = self._connection.execute('SELECT * FROM groups ORDER BY name')
+        return [dict(row) for row in rows]
+
+    def get_group(self, name):
+        """Get the snapshot metadata of a group.
+
+        Returns:
+            dict or None: see get_groups, or None if the group isn't stored
+        """
+        row = self._connection.execute('SELECT * FROM groups WHERE name = ?', (name,)).fetchone()
+        return dict(row) if row else None
+
+    def get_group_members(self, name):
+        """Get the stored members of a group.
+
+        Returns:
+            list[dict]: the user records as returned by JiraClient.get_group_members
+        """
+        rows = self._connection.execute(
+            'SELECT member_json FROM members WHERE group_name = ? ORDER BY account_id',
+            (name,)
+        )
+        return [json.loads(row['member_json']) for row in rows]
+
+    def get_user_groups(self, account_id):
+        """Get the names of the stored groups a user is a member of.
+
+        Returns:
+            list[str]
+        """
+        rows = self._connection.execute(
+            'SELECT group_name FROM members WHERE account_id = ? ORDER BY group_name',
+            (account_id,)
+        )
+        return [row['group_name'] for row in rows]
+
+    ### WRITE METHODS ###
+    def save_group(self, group, members, fetched_at=None):
+        """Store a group and its members, replacing any previous snapshot of the group.
+
+        Args:
+            group (dict): A group record with at least the `name` key.
+            members (list[dict]): User records with at least the `accountId` key.
+
+        Kwargs:
+            fetched_at (float): The epoch time the members were fetched. Defaults to now.
+
+        Returns:
+            dict: the delta against the previous snapshot with the keys `added` and `removed`, each
+                a sorted list of accountIds
+        """
+        fetched_at = fetched_at or time.time()
+        content_hash = _content_hash(members)
+        previous = self.get_group(group['name'])
+        with self._connection:
+            # REPLACE would delete the group row and cascade to its members, so update in place
+            values = (group.get('groupId'), len(members), content_hash, fetched_at, group['name'])
+            if not self._connection.execute(
+                'UPDATE groups SET group_id = ?, member_count = ?, content_hash = ?, fetched_at = ? '
+                'WHERE name = ?',
+                values
+            ).rowcount:
+                self._connection.execute(
+                    'INSERT INTO groups (group_id, member_count, content_hash, fetched_at, name) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    values
+                )
+            if previous and previous['content_hash'] == content_hash:
+                return {'added': [], 'removed': []}
+            stored_ids = {row['account_id'] for row in self._connection.execute(
+                'SELECT account_id FROM members WHERE group_name = ?', (group['name'],)
+            )}
+            fetched_ids = {m['accountId'] for m in members}
+            removed = stored_ids - fetched_ids
+            self._connection.executemany(
+                'DELETE FROM members WHERE group_name = ? AND account_id = ?',
+                [(group['name'], account_id) for account_id in removed]
+            )
+            # rewrite every record, a member's details (e.g. displayName) may have changed
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO members (group_name, account_id, member_json) VALUES (?, ?, ?)',
+                [(group['name'], m['accountId'], json.dumps(m, sort_keys=True)) for m in members]
+            )
+        return {'added': sorted(fetched_ids - stored_ids), 'removed': sorted(removed)}
+
+    def delete_group(self, name):
+        """Remove a group and its members from the store.
+
+        Returns:
+            dict: the delta with the keys `added` (empty) and `removed`
+        """
+        removed = [m['accountId'] for m in self.get_group_members(name)]
+        with self._connection:
+            self._connection.execute('DELETE FROM groups WHERE name = ?', (name,))
+        return {'added': [], 'removed': removed}
+
+    def refresh(self, client, ttl=24 * 60 * 60, max_workers=None):
+        """Bring the store up to date with Jira, re-downloading only what may have changed.
+
+        A group's members are fetched again if the group is new, if its snapshot is older than ttl,
+        or if its member count (fetched with one small call) differs from the snapshot. Groups that
+        no longer exist are removed. A group whose members were swapped without the count changing
+        is picked up once its snapshot is older than ttl.
+
+        Args:
+            client (JiraClient): The client used to fetch groups and members.
+
+        Kwargs:
+            ttl (float): Seconds after which a snapshot is re-downloaded even if its count matches.
+            max_workers (int): The number of groups checked at the same time. Defaults to the
+                max_workers of the client.
+
+        Returns:
+            dict: with the keys
+                refreshed (list[str]): groups whose members were downloaded
+                unchanged (list[str]): groups whose snapshot was kept
+                removed_groups (list[str]): groups that no longer exist
+                failed (dict): group name to the exception raised while checking it
+                deltas (dict): group name to a dict of `added` and `removed` accountIds, for every
+                    group whose membership changed
+        """
+        snapshots = {g['name']: g for g in self.get_groups()}
+        groups = client.get_all_groups()
+        now = time.time()
+
+        def fetch_members_if_changed(group):
+            snapshot = snapshots.get(group['name'])
+            if snapshot and now - snapshot['fetched_at'] < ttl:
+                if client.get_group_member_count(group) == snapshot['member_count']:
+                    return None
+            return client.get_group_members(group), time.time()
+
+        summary = {'refreshed': [], 'unchanged': [], 'removed_groups': [], 'failed': {}, 'deltas': {}}
+        # members are fetched on worker threads but only written from this thread
+        for group, result, exception in map_concurrently(
+            fetch_members_if_changed,
+            groups,
+            max_workers or client.max_workers
+        ):
+            if exception:
+                _LOGGER.error(f"Failed to refresh group `{group['name']}`: {exception}")
+                summary['failed'][group['name']] = exception
+                continue
+            if result is None:
+                summary['unchanged'].append(group['name'])
+                continue
+            members, fetched_at = result
+            delta = self.save_group(group, members, fetched_at=fetched_at)
+            summary['refreshed'].append(group['name'])
+            if delta['added'] or delta['removed']:
+                summary['deltas'][group['name']] = delta
+
+        existing_names = {g['name'] for g in groups}
+        for name in snapshots:
+            if name not in existing_names:
+                summary['removed_groups'].append(name)
+                summary['deltas'][name] = self.delete_group(name)
+
+        _LOGGER.info(
+            f"Refreshed {len(summary['refreshed'])} groups, kept {len(summary['unchanged'])}, "
+            f"removed {len(summary['removed_groups'])}, {len(summary['failed'])} failed"
+        )
+        return summary
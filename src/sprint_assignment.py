@@ -0,0 +1,186 @@
+"""
+
+Bulk edit the sprint of issues based on JQL criteria associated with boards in a config file.
+
+Example config:
+    {
+        "rules": [
+            {"board_id": 12, "jql": "labels = platform", "sprint": "active"},
+            {"board_id": 12, "jql": "priority = Highest", "sprint": "next"},
+            {"board_id": 34, "jql": "component = API", "sprint": 1056}
+        ]
+    }
+
+Each rule selects the issues of its board (the board's filter) that also match its JQL. sprint is a
+sprint ID, `active` for the board's active sprint or `next` for its earliest future sprint.
+
+Rules are evaluated in order and an issue matching several rules is moved once, by the last rule it
+matches.
+
+"""
+
+import json
+
+from jira_client import MAX_ISSUES_PER_SPRINT_MOVE
+from utils import apply_concurrently
+from utils import get_all_concurrently
+from utils import get_logger
+
+
+_LOGGER = get_logger('sprint_assignment')
+
+
+def load_rules(path):
+    """Load and validate the rules of a config file.
+
+    Args:
+        path (str): The path of a JSON config file.
+
+    Returns:
+        list[dict]: rules with the keys board_id, jql and sprint
+
+    Raises:
+        ValueError: if a rule is missing a key
+    """
+    with open(path) as f:
+        config = json.load(f)
+    rules = []
+    for i, r in enumerate(config.get('rules', [])):
+        missing = [k for k in ('board_id', 'jql', 'sprint') if r.get(k) in (None, '')]
+        if missing:
+            raise ValueError(f"Rule {i} is missing {missing}: {r}")
+        rules.append({'board_id': r['board_id'], 'jql': r['jql'], 'sprint': r['sprint']})
+    return rules
+
+
+class SprintAssignmentEngine:
+    """Resolves rules into the sprint each issue should be in and moves the issues with the bulk
+    sprint endpoint, in batches of the maximum size, sent concurrently.
+    """
+
+    def __init__(self, client, max_workers=None):
+        """
+        Args:
+            client (JiraClient): The client used to search issues and move them.
+
+        Kwargs:
+            max_workers (int): The number of calls in flight at the same time. Defaults to the
+                max_workers of the client.
+        """
+        self.client = client
+        self.max_workers = max_workers or client.max_workers
+
+    def _resolve_sprint_id(self, board_id, sprint, board_sprints):
+        """Get the sprint ID a rule refers to.
+
+        Raises:
+            ValueError: if the board has no matching sprint, or several active sprints
+        """
+        if sprint not in ('active', 'next'):
+            return int(sprint)
+        if board_id not in board_sprints:
+            board_sprints[board_id] = self.client.get_board_sprints(board_id, state='active,future')
+        sprints = board_sprints[board_id]
+        if sprint == 'active':
+            active = [s for s in sprints if s['state'] == 'active']
+            if len(active) != 1:
+                raise ValueError(f"Board {board_id} has {len(active)} active sprints, expected exactly 1")
+            return active[0]['id']
+        future = [s for s in sprints if s['state'] == 'future']
+        if not future:
+            raise ValueError(f"Board {board_id} has no future sprint")
+        # sprints without a start date are ordered after those with one, by creation (ID)
+        return min(future, key=lambda s: (s.get('startDate') is None, s.get('startDate') or '', s['id']))['id']
+
+    def plan(self, rules):
+        """Work out which sprint each issue should be moved to.
+
+        The issues of every rule are fetched concurrently. Rules are then applied in order so that
+        an issue matching several rules ends up with the sprint of the last one.
+
+        Args:
+            rules (list[dict]): see load_rules.
+
+        Returns:
+            dict: issue key to sprint ID
+        """
+        board_sprints = {}
+        sprint_ids = [self._resolve_sprint_id(r['board_id'], r['sprint'], board_sprints) for r in rules]
+
+        def get_issue_keys(i):
+            return [issue['key'] for issue in self.client.get_board_issues(
+                rules[i]['board_id'],
+                jql=rules[i]['jql'],
+                fields=['key']
+            )]
+
+        # moving issues based on a partial view could leave them in the wrong sprint
+        issue_keys_by_rule = get_all_concurrently(get_issue_keys, range(len(rules)), self.max_workers, 'the issues of {} rules')
+
+        plan = {}
+        for i in range(len(rules)):
+            overridden = 0
+            for key in issue_keys_by_rule[i]:
+                if key in plan:
+                    overridden += 1
+                plan[key] = sprint_ids[i]
+            _LOGGER.info(f"Rule {i} matched {len(issue_keys_by_rule[i])} issues, {overridden} of them also matched an earlier rule")
+        return plan
+
+    @staticmethod
+    def get_batches(plan):
+        """Group a plan into calls of at most MAX_ISSUES_PER_SPRINT_MOVE issues per sprint.
+
+        Returns:
+            list[tuple]: (sprint ID, list of issue keys)
+        """
+        issue_keys_by_sprint = {}
+        for key, sprint_id in plan.items():
+            issue_keys_by_sprint.setdefault(sprint_id, []).append(key)
+        batches = []
+        for sprint_id, issue_keys in sorted(issue_keys_by_sprint.items()):
+            for i in range(0, len(issue_keys), MAX_ISSUES_PER_SPRINT_MOVE):
+                batches.append((sprint_id, issue_keys[i:i + MAX_ISSUES_PER_SPRINT_MOVE]))
+        return batches
+
+    @classmethod
+    def format_plan(cls, plan):
+        """Render a plan for a dry run.
+
+        Returns:
+            str: one line per sprint with the number of issues moved to it and their keys
+        """
+        issue_keys_by_sprint = {}
+        for key, sprint_id in plan.items():
+            issue_keys_by_sprint.setdefault(sprint_id, []).append(key)
+        lines = [
+            f"sprint {sprint_id}: {len(issue_keys)} issues: {', '.join(issue_keys)}"
+            for sprint_id, issue_keys in sorted(issue_keys_by_sprint.items())
+        ]
+        lines.append(f"{len(plan)} issues to move in {len(cls.get_batches(plan))} calls")
+        return '\n'.join(lines)
+
+    def apply(self, plan):
+        """Move the issues of a plan to their sprints.
+
+        Args:
+            plan (dict): see plan.
+
+        Returns:
+            list[dict]: one result per batch of get_batches, in the same order, with the keys batch
+                ((sprint ID, list of issue keys)), ok, status_code and error
+        """
+        batches = self.get_batches(plan)
+        results = apply_concurrently(
+            lambda batch: self.client.move_issues_to_sprint(*batch),
+            batches,
+            self.max_workers,
+            (204,),
+            'batch'
+        )
+        moved = sum(len(r['batch'][1]) for r in results if r['ok'])
+        _LOGGER.info(f"Moved {moved} of {len(plan)} issues in {len(batches)} calls")
+        failed = [r for r in results if not r['ok']]
+        if failed:
+            _LOGGER.error(f"{len(failed)} calls failed: {failed}")
+        return results
@@ -0,0 +1,321 @@
+"""
+
+Finds the sprints of boards by date and creates the sprints missing from a date range based on a
+config file.
+
+Example config:
+    {
+        "boards": [
+            {"board_id": 12, "duration_days": 14},
+            {"board_id": 34, "duration_days": 7, "name_format": "API {start:%Y-%m-%d}"}
+        ]
+    }
+
+duration_days (default 14) is the length of the sprints created for the board. name_format
+(default `Sprint {start:%Y-%m-%d}`) is a str.format template that gets board_id, start and end
+(datetimes) and number (the position of the sprint in the range, starting at 1).
+
+"""
+
+import json
+from bisect import bisect_left
+from bisect import bisect_right
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from utils import apply_concurrently
+from utils import get_all_concurrently
+from utils import get_logger
+
+
+_LOGGER = get_logger('sprint_management')
+
+DEFAULT_NAME_FORMAT = 'Sprint {start:%Y-%m-%d}'
+
+
+def parse_date(value):
+    """Parse an ISO 8601 date or datetime as returned by the agile API, e.g.
+    2015-04-11T15:22:00.000Z. Dates without a timezone are taken as UTC.
+
+    Returns:
+        datetime: a timezone aware datetime
+    """
+    if isinstance(value, datetime):
+        date = value
+    else:
+        # fromisoformat doesn't accept Z before Python 3.11
+        date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date
+
+
+def format_date(date):
+    """Format a datetime the way the agile API expects, e.g. 2015-04-11T15:22:00.000+00:00"""
+    return date.isoformat(timespec='milliseconds')
+
+
+def load_boards(path):
+    """Load and validate the boards of a config file.
+
+    Args:
+        path (str): The path of a JSON config file.
+
+    Returns:
+        list[dict]: boards with the keys board_id, duration_days and name_format
+
+    Raises:
+        ValueError: if a board is missing its ID or has a duration that isn't positive
+    """
+    with open(path) as f:
+        config = json.load(f)
+    boards = []
+    for i, b in enumerate(config.get('boards', [])):
+        if b.get('board_id') is None:
+            raise ValueError(f"Board {i} is missing `board_id`: {b}")
+        duration_days = b.get('duration_days', 14)
+        if duration_days <= 0:
+            raise ValueError(f"Board {i} needs a positive `duration_days`: {b}")
+        boards.append({
+            'board_id': b['board_id'],
+            'duration_days': duration_days,
+            'name_format': b.get('name_format', DEFAULT_NAME_FORMAT),
+        })
+    return boards
+
+
+class SprintIndex:
+    """The sprints of a board sorted by start date, answering date lookups with binary search.
+
+    Sprints are intervals [startDate, endDate). Since they may overlap, a lookup bisects on the
+    start dates and then scans back only as far as the longest sprint could reach.
+    Sprints without both dates can't be placed and are kept in `undated`.
+    """
+
+    def __init__(self, sprints=()):
+        """
+        Kwargs:
+            sprints (iterable[dict]): sprints as returned by JiraClient.get_board_sprints.
+        """
+        self._starts = []
+        self._ends = []
+        self._sprints = []
+        self._max_duration = timedelta(0)
+        self.undated = []
+        for sprint in sorted(sprints, key=lambda s: s.get('startDate') or ''):
+            self.add(sprint)
+
+    @classmethod
+    def from_board(cls, client, board_id):
+        """Build the index of a board with a single paginated read of all its sprints."""
+        return cls(client.get_board_sprints(board_id))
+
+    def __len__(self):
+        return len(self._sprints)
+
+    def __iter__(self):
+        return iter(self._sprints)
+
+    def add(self, sprint):
+        """Insert a sprint, keeping the index sorted."""
+        if not sprint.get('startDate') or not sprint.get('endDate'):
+            self.undated.append(sprint)
+            return
+        start = parse_date(sprint['startDate'])
+        end = parse_date(sprint['endDate'])
+        i = bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._ends.insert(i, end)
+        self._sprints.insert(i, sprint)
+        self._max_duration = max(self._max_duration, end - start)
+
+    def _candidates(self, start, end):
+        """Yield the positions of the sprints overlapping [start, end), latest start first."""
+        # sprints starting at or after end can't overlap, those starting before
+        # start - max_duration have ended before start
+        earliest = start - self._max_duration
+        for i in range(bisect_left(self._starts, end) - 1, -1, -1):
+            if self._starts[i] < earliest:
+                return
+            if self._ends[i] > start:
+                yield i
+
+    def sprint_for_date(self, date):
+        """Get the sprint covering a date. If sprints overlap, the one that started last wins.
+
+        Args:
+            date (datetime or str): see parse_date.
+
+        Returns:
+            dict or None: the sprint, or None if no sprint covers the date
+        """
+        date = parse_date(date)
+        for i in self._candidates(date, date + timedelta(microseconds=1)):
+            return self._sprints[i]
+        return None
+
+    def sprints_in_range(self, start, end):
+        """Get the sprints overlapping [start, end).
+
+        Args:
+            start (datetime or str): see parse_date.
+            end (datetime or str): see parse_date.
+
+        Returns:
+            list[dict]: the sprints, sorted by start date
+        """
+        return [self._sprints[i] for i in reversed(list(self._candidates(parse_date(start), parse_date(end))))]
+
+    def get_missing_intervals(self, start, end, duration):
+        """Split [start, end) into sprint-long intervals, skipping the time already covered by
+        sprints. An interval is created wherever a full duration fits before the next sprint, and
+        the last one may run past end.
+
+        Args:
+            start (datetime): The start of the range.
+            end (datetime): The end of the range.
+            duration (timedelta): The length of a sprint.
+
+        Returns:
+            list[tuple]: (start, end) datetimes
+
+        Raises:
+            ValueError: if duration isn't positive
+        """
+        if duration <= timedelta(0):
+            raise ValueError(f"The sprint duration must be positive, got {duration}")
+        intervals = []
+        cursor = start
+        while cursor < end:
+            covering = self.sprints_in_range(cursor, cursor + duration)
+            if not covering:
+                intervals.append((cursor, cursor + duration))
+                cursor += duration
+                continue
+            # jump past the sprints in the way, they end after cursor so this always moves forward
+            cursor = max(parse_date(s['endDate']) for s in covering)
+        return intervals
+
+
+class SprintManager:
+    """Keeps one SprintIndex per board, loaded once, and creates missing sprints concurrently."""
+
+    def __init__(self, client, max_workers=None):
+        """
+        Args:
+            client (JiraClient): The client used to read and create sprints.
+
+        Kwargs:
+            max_workers (int): The number of calls in flight at the same time. Defaults to the
+                max_workers of the client.
+        """
+        self.client = client
+        self.max_workers = max_workers or client.max_workers
+        self.indexes = {}
+
+    def load(self, board_ids):
+        """Load the sprints of the boards that aren't indexed yet, one board per worker.
+
+        Raises:
+            RuntimeError: if the sprints of any board can't be loaded, since a partial view would
+                create duplicate sprints
+        """
+        self.indexes.update(get_all_concurrently(
+            lambda board_id: SprintIndex.from_board(self.client, board_id),
+            [b for b in dict.fromkeys(board_ids) if b not in self.indexes],
+            self.max_workers,
+            'the sprints of {} boards'
+        ))
+
+    def get_index(self, board_id):
+        if board_id not in self.indexes:
+            self.load([board_id])
+        return self.indexes[board_id]
+
+    def plan(self, boards, start, end):
+        """Work out the sprints needed to cover [start, end) on every board.
+
+        Args:
+            boards (list[dict]): see load_boards.
+            start (datetime or str): see parse_date.
+            end (datetime or str): see parse_date.
+
+        Returns:
+            list[dict]: sprints to create with the keys board_id, name, startDate and endDate
+        """
+        start = parse_date(start)
+        end = parse_date(end)
+        self.load([b['board_id'] for b in boards])
+        plan = []
+        for board in boards:
+            intervals = self.indexes[board['board_id']].get_missing_intervals(
+                start,
+                end,
+                timedelta(days=board['duration_days'])
+            )
+            for number, (sprint_start, sprint_end) in enumerate(intervals, 1):
+                plan.append({
+                    'board_id': board['board_id'],
+                    'name': board['name_format'].format(
+                        board_id=board['board_id'],
+                        start=sprint_start,
+                        end=sprint_end,
+                        number=number
+                    ),
+                    'startDate': format_date(sprint_start),
+                    'endDate': format_date(sprint_end),
+                })
+        return plan
+
+    @staticmethod
+    def format_plan(plan):
+        """Render a plan for a dry run.
+
+        Returns:
+            str: one line per sprint to create
+        """
+        lines = [f"+ board {s['board_id']}: {s['name']} ({s['startDate']} - {s['endDate']})" for s in plan]
+        lines.append(f"{len(plan)} sprints to create")
+        return '\n'.join(lines)
+
+    def apply(self, plan):
+        """Create the sprints of a plan concurrently and add them to the indexes.
+
+        Args:
+            plan (list[dict]): see plan.
+
+        Returns:
+            list[dict]: one result per sprint, in the order of the plan, with the keys sprint (the
+                planned sprint), ok, status_code and error
+        """
+        created = []
+
+        def create_sprint(sprint):
+            response = self.client.create_sprint(
+                sprint['name'],
+                sprint['board_id'],
+                start_date=sprint['startDate'],
+                end_date=sprint['endDate']
+            )
+            if response.status_code == 201:
+                created.append((sprint['board_id'], response.json()))
+            return response
+
+        results = apply_concurrently(create_sprint, plan, self.max_workers, (201,), 'sprint')
+        # the indexes aren't thread-safe, so they're updated once every call is done
+        for board_id, sprint in created:
+            self.get_index(board_id).add(sprint)
+        failures = [r for r in results if not r['ok']]
+        for r in failures:
+            _LOGGER.error(f"Failed to create sprint `{r['sprint']['name']}` on board {r['sprint']['board_id']}: {r['status_code']} {r['error']}")
+        _LOGGER.info(f"Created {len(results) - len(failures)} of {len(results)} sprints")
+        return results
+
+    def get_sprints(self, board_id, start, end):
+        """Get the sprints of a board overlapping [start, end), including those created by apply.
+
+        Returns:
+            list[dict]: see SprintIndex.sprints_in_range
+        """
+        return self.get_index(board_id).sprints_in_range(start, end)
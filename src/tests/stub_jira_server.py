@@ -0,0 +1,113 @@
+"""
+
+A stub Jira server for offline tests of JiraClient. It runs on a free local port in a background
+thread, answers with handler functions and records every request it gets.
+
+Usage:
+    def search(request):
+        return 200, {'issues': []}
+
+    with StubJiraServer({('POST', '/rest/api/3/search/jql'): search}) as server:
+        client = JiraClient(user='user', api_token='token', url=server.url)
+        ...
+        assert server.requests[0].json == {...}
+
+"""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qsl
+from urllib.parse import urlsplit
+
+
+class StubRequest:
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+    @property
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+
+class StubJiraServer:
+
+    def __init__(self, routes):
+        """
+        Args:
+            routes (dict): (method, path) to a function that takes a StubRequest and returns
+                (status code, JSON body or None) or (status code, JSON body or None, headers).
+        """
+        self.routes = routes
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _read_body(self):
+                if self.headers.get('Transfer-Encoding') != 'chunked':
+                    return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0], 16)
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+                    if not size:
+                        return b''.join(chunks)
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                body = self._read_body()
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                request = StubRequest(self.command, url.path, dict(parse_qsl(url.query)), dict(self.headers), body)
+                with server._lock:
+                    server.requests.append(request)
+                handler = server.routes.get((self.command, url.path))
+                if handler is None:
+                    status, payload, headers = 404, {'errorMessages': [f"No route for {self.command} {url.path}"]}, {}
+                else:
+                    status, payload, *headers = handler(request)
+                    headers = headers[0] if headers else {}
+                data = b'' if payload is None else json.dumps(payload).encode()
+                self.send_response(status)
+                if payload is not None:
+                    self.send_header('Content-Type', 'application/json')
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def requests_to(self, method, path):
+        return [r for r in self.requests if r.method == method and r.path == path]
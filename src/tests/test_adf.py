@@ -0,0 +1,250 @@
+# TODO: figure out the right way to do this
+import sys; sys.path.append('..')
+
+import json
+
+import pytest
+
+from adf import ADF
+from adf import ADFNode
+from adf import CompactADF
+from adf import MAX_BODY_SIZE
+from adf import TrustedADF
+from adf import encode_json
+from adf import iter_json
+
+
+def _build_doc(adf):
+    header = adf.adf_table_row(content_list=[
+        adf.adf_table_header(content_list=[adf.convert_text_to_adf_paragraph('name')])
+    ])
+    row = adf.adf_table_row(content_list=[
+        adf.adf_table_cell(content_list=[adf.convert_text_to_adf_paragraph('')])
+    ])
+    text = adf.adf_mark(adf.adf_text(text='bold'), 'strong')
+    return adf.adf_doc(content_list=[
+        adf.adf_heading(text='Report', level=2),
+        adf.adf_paragraph(content_list=[text, adf.adf_br()]),
+        adf.adf_table(content_list=[header, row]),
+    ])
+
+
+def test_compact_adf_serializes_like_adf():
+    doc = _build_doc(CompactADF)
+    assert isinstance(doc, ADFNode)
+    assert json.dumps(ADF.to_dict(doc)) == json.dumps(_build_doc(ADF))
+
+
+def test_compact_adf_shares_default_attrs():
+    first = CompactADF.adf_table(content_list=[])
+    second = CompactADF.adf_table(content_list=[])
+    assert first.attrs is second.attrs
+    # dict nodes still get their own attrs
+    assert ADF.adf_table(content_list=[])['attrs'] is not ADF.adf_table(content_list=[])['attrs']
+
+
+def test_iter_json_matches_json_dumps():
+    payload = {'fields': {'description': _build_doc(CompactADF), 'labels': [], 'priority': None}}
+    expected = {'fields': {'description': _build_doc(ADF), 'labels': [], 'priority': None}}
+    chunks = list(iter_json(payload, chunk_size=16))
+    assert len(chunks) > 1
+    assert json.loads(b''.join(chunks)) == expected
+
+
+def test_validate_reports_paths():
+    doc = TrustedADF.adf_doc(content_list=[
+        TrustedADF.adf_paragraph(content_list=[TrustedADF.adf_text(text='')]),
+        TrustedADF.adf_table(content_list=[TrustedADF.adf_paragraph(content_list=[])]),
+    ])
+    assert ADF.validate(_build_doc(ADF)) == []
+    assert ADF.validate(_build_doc(CompactADF)) == []
+    assert ADF.validate(doc) == [
+        'doc.content[0].content[0]: text nodes may not be empty',
+        'doc.content[1].content[0]: table nodes may not contain paragraph nodes',
+    ]
+
+
+def test_heading_outline_and_sections():
+    doc = ADF.adf_doc(content_list=[
+        ADF.convert_text_to_adf_paragraph('intro'),
+        ADF.adf_heading(text='A', level=1),
+        ADF.adf_heading(text='A.1', level=2),
+        ADF.convert_text_to_adf_paragraph('body'),
+        ADF.adf_heading(text='B', level=1),
+    ])
+    sections = ADF.split_doc_by_headings(doc)
+    assert [s['heading_text'] for s in sections] == ['', 'A', 'B']
+    assert len(sections[1]['content']) == 2
+    outline = ADF.get_heading_outline(doc)
+    assert [(s['heading_text'], s['start'], s['end']) for s in outline] == [('A', 1, 4), ('B', 4, 5)]
+    assert [(s['heading_text'], s['start'], s['end']) for s in outline[0]['children']] == [('A.1', 2, 4)]
+
+
+def test_walker_handles_deep_docs():
+    doc = ADF.adf_doc(content_list=[])
+    node = doc
+    for _ in range(5000):
+        child = {'type': 'blockquote', 'content': []}
+        node['content'].append(child)
+        node = child
+    node['content'].append({'type': 'paragraph', 'content': [
+        {'type': 'hardBreak'},
+        {'type': 'mention', 'attrs': {'id': 'user-1', 'text': '@user'}},
+    ]})
+    assert ADF.count_node_types(doc)['blockquote'] == 5000
+    assert ADF.collect_mentions(doc) == [{'id': 'user-1', 'text': '@user'}]
+    assert not ADF.adf_node_is_empty(doc)
+    assert ADF.adf_node_is_empty(ADF.adf_table(content_list=[ADF.adf_table_row(content_list=[])]))
+    assert not ADF.adf_node_is_empty({'type': 'status', 'attrs': {'text': 'DONE'}})
+
+
+def test_render_text_and_markdown():
+    doc = _build_doc(ADF)
+    doc['content'].append({'type': 'bulletList', 'content': [
+        {'type': 'listItem', 'content': [ADF.convert_text_to_adf_paragraph('one')]},
+        {'type': 'listItem', 'content': [ADF.convert_text_to_adf_paragraph('two')]},
+    ]})
+    assert ADF.to_text(doc) == 'Report\nbold\n\nname\n\n- one\n- two'
+    assert ADF.to_markdown(doc) == (
+        '## Report\n\n**bold**\\\n\n\n| name |\n| --- |\n|  |\n\n- one\n- two'
+    )
+    assert ADF.to_text(_build_doc(CompactADF)) == ADF.to_text(_build_doc(ADF))
+
+
+def test_render_into_shared_buffer():
+    first = ADF.adf_doc(content_list=[ADF.convert_text_to_adf_paragraph('one'), ADF.convert_text_to_adf_paragraph('two')])
+    second = ADF.adf_doc(content_list=[ADF.adf_heading(text='Three', level=1)])
+    for markdown, expected in ((False, 'one\ntwo\n\nThree'), (True, 'one\n\ntwo\n\n# Three')):
+        out = []
+        for doc in (first, ADF.adf_doc(content_list=[]), second):
+            assert ADF.render(doc, markdown=markdown, out=out) is None
+        # documents are separated by a blank line, and empty ones add nothing
+        assert ''.join(out) == expected
+
+
+def _text(text, *mark_types, href=None):
+    marks = [{'type': 'link', 'attrs': {'href': href}}] if href else []
+    marks.extend({'type': t} for t in mark_types)
+    return {'type': 'text', 'text': text, 'marks': marks} if marks else {'type': 'text', 'text': text}
+
+
+def test_render_markdown_merges_marks():
+    def paragraph(*content):
+        return ADF.to_markdown(ADF.adf_doc(content_list=[ADF.adf_paragraph(content_list=list(content))]))
+
+    assert paragraph(_text('a ', 'strong'), _text('b', 'strong', 'em'), _text(' c', 'strong')) == '**a *b* c**'
+    assert paragraph(_text('a', 'strong'), _text('b', 'strong')) == '**ab**'
+    # marks that overlap without nesting are closed and opened again, whitespace outside the delimiters
+    assert paragraph(_text('a ', 'strong'), _text('b', 'strong', 'em'), _text(' c', 'em')) == '**a *b*** *c*'
+    assert paragraph(_text('see ', href='https://a.b'), _text('this', 'strong', href='https://a.b')) == '[see **this**](https://a.b)'
+    assert paragraph(_text('x', 'code'), _text('y', 'code', href='https://a.b')) == '`x`[`y`](https://a.b)'
+
+
+def test_markdown_round_trips_syntax_in_text():
+    paragraphs = [
+        [_text('a*b*c and snake_case, [not a link](x) <https://no.link> ~~no~~ \\')],
+        [_text('# not a heading')],
+        [_text('1. not a list '), _text('but', 'em'), _text(' '), _text('*this* is', 'strong')],
+        [_text('- nor this'), {'type': 'hardBreak'}, _text('> nor this')],
+        [_text('code with ` and `` in it', 'code')],
+    ]
+    content = [ADF.adf_paragraph(content_list=p) for p in paragraphs]
+    content.append(ADF.adf_table(content_list=[ADF.adf_table_row(content_list=[
+        ADF.adf_table_header(content_list=[ADF.adf_paragraph(content_list=[_text('x | y')])]),
+        ADF.adf_table_header(content_list=[ADF.adf_paragraph(content_list=[_text('a|b', 'code')])]),
+    ])]))
+    doc = ADF.adf_doc(content_list=content)
+    markdown = ADF.to_markdown(doc)
+    assert markdown.startswith('a\\*b\\*c and snake\\_case, \\[not a link\\](x) \\<https://no.link> \\~\\~no\\~\\~ \\\\\n\n\\# not')
+    assert '\n```code with ` and `` in it```\n' in markdown
+    assert ADF.to_dict(ADF.from_markdown(markdown)) == ADF.to_dict(doc)
+
+
+def test_from_markdown():
+    doc = ADF.from_markdown(
+        '# Title\n'
+        '\n'
+        'Some **bold** and `code`, see [docs](https://example.com). snake_case and 2 * 3\n'
+        '\n'
+        '- one\n'
+        '  - nested\n'
+        '\n'
+        '| Key | Summary |\n'
+        '| --- | --- |\n'
+        '| A-1 | Fix |\n'
+    )
+    assert ADF.validate(doc) == []
+    assert [n['type'] for n in doc['content']] == ['heading', 'paragraph', 'bulletList', 'table']
+    assert [(n['text'], [m['type'] for m in n.get('marks', [])]) for n in doc['content'][1]['content']] == [
+        ('Some ', []),
+        ('bold', ['strong']),
+        (' and ', []),
+        ('code', ['code']),
+        (', see ', []),
+        ('docs', ['link']),
+        ('. snake_case and 2 * 3', []),
+    ]
+    assert ADF.to_dict(CompactADF.from_markdown(ADF.to_markdown(doc))) == doc
+
+
+def test_from_markdown_merges_soft_wrapped_lines():
+    for adf in (ADF, CompactADF):
+        # emphasis can go over a soft line break too
+        doc = adf.from_markdown('a wrapped\nparagraph with **bold\ntext**\n*and* more')
+        assert ADF.to_dict(doc)['content'][0]['content'] == [
+            {'type': 'text', 'text': 'a wrapped paragraph with '},
+            {'type': 'text', 'text': 'bold text', 'marks': [{'type': 'strong'}]},
+            {'type': 'text', 'text': ' '},
+            {'type': 'text', 'text': 'and', 'marks': [{'type': 'em'}]},
+            {'type': 'text', 'text': ' more'},
+        ]
+
+
+def test_markdown_code_fences_outlast_the_code():
+    code = 'Use a fence:\n```python\nprint(1)\n```\nor ````'
+    doc = ADF.adf_doc(content_list=[
+        {'type': 'codeBlock', 'attrs': {'language': 'markdown'}, 'content': [_text(code)]},
+        ADF.convert_text_to_adf_paragraph('after'),
+    ])
+    markdown = ADF.to_markdown(doc)
+    assert markdown.startswith('`````markdown\n') and markdown.endswith('\n`````\n\nafter')
+    assert ADF.to_dict(ADF.from_markdown(markdown)) == ADF.to_dict(doc)
+    # a closing fence is at least as long as the opening one, and has no info string
+    assert ADF.from_markdown('````\n```\n````x\n`````')['content'][0]['content'][0]['text'] == '```\n````x'
+
+
+def _cell_texts(row):
+    return [''.join(t['text'] for t in cell['content'][0]['content']) for cell in row['content']]
+
+
+def test_dataframe_tables_split_by_size():
+    pd = pytest.importorskip('pandas')
+    # duplicate, non-default index labels and duplicate column names
+    df = pd.DataFrame([[f"A-{i}", 'x' * (i % 40), ''] for i in range(300)], index=[7] * 300, columns=['key', 'summary', 'key'])
+    df.index.name = 'n'
+    tables = list(ADF.iter_dataframe_tables(df, max_size=4000, include_index=True))
+    assert len(tables) > 1
+    for table in tables:
+        assert len(encode_json(table)) <= 4000
+        # every table repeats the header row
+        assert _cell_texts(table['content'][0]) == ['n', 'key', 'summary', 'key']
+    rows = [_cell_texts(row) for table in tables for row in table['content'][1:]]
+    assert rows == [['7', f"A-{i}", 'x' * (i % 40), ''] for i in range(300)]
+    assert ADF.validate(ADF.adf_doc(content_list=tables)) == []
+
+    # a row that is too large for any table gets a table to itself
+    df = pd.DataFrame({'a': ['small', 'y' * 5000, 'small']})
+    assert [len(t['content']) - 1 for t in ADF.iter_dataframe_tables(df, max_size=1000)] == [1, 1, 1]
+    assert [len(t['content']) for t in ADF.iter_dataframe_tables(df.iloc[:0], max_size=1000)] == [1]
+
+
+def test_dataframe_comments_fit_the_body_size():
+    pd = pytest.importorskip('pandas')
+    df = pd.DataFrame({'key': [f"A-{i}" for i in range(3000)], 'summary': ['Some summary text'] * 3000})
+    docs = CompactADF.construct_adf_comments_with_dataframe(df, heading='Report', post_table_text='The end')
+    assert len(docs) > 1
+    # the size is measured in the encoding the client sends
+    assert all(len(encode_json(doc)) <= MAX_BODY_SIZE for doc in docs)
+    assert docs[0].content[0].type == 'heading'
+    assert docs[-1].content[-1].type == 'paragraph'
+    assert sum(len(doc.content[-1 if doc is not docs[-1] else -2].content) - 1 for doc in docs) == 3000
@@ -0,0 +1,249 @@
+# TODO: figure out the right way to do this
+import sys; sys.path.append('..')
+
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from async_jira_client import AsyncJiraClient
+
+
+GROUPS = [{'name': f"group-{i}"} for i in range(5)] + [{'name': 'atlassian-addons-admin'}]
+MEMBERS = [{'accountId': f"user-{i}"} for i in range(120)]
+PAGE_LIMIT = 50
+
+
+def _page(request, values):
+    start_at = int(request.query['startAt'])
+    max_results = min(int(request.query['maxResults']), PAGE_LIMIT)
+    return web.json_response({
+        'startAt': start_at,
+        'maxResults': max_results,
+        'total': len(values),
+        'values': values[start_at:start_at + max_results],
+    })
+
+
+async def _group_bulk(request):
+    return _page(request, GROUPS)
+
+
+THINGS = list(range(7))
+
+
+async def _things(request):
+    # a page size of 3 that is reported as 0
+    start_at = int(request.query['startAt'])
+    return web.json_response({'startAt': start_at, 'maxResults': 0, 'total': len(THINGS), 'values': THINGS[start_at:start_at + 3]})
+
+
+async def _empty(request):
+    return web.json_response({'startAt': 0, 'maxResults': 0, 'total': len(THINGS), 'values': []})
+
+
+async def _sprints(request):
+    # agile listings have isLast instead of total
+    start_at = int(request.query['startAt'])
+    return web.json_response({'startAt': start_at, 'maxResults': 3, 'isLast': start_at + 3 >= len(THINGS), 'values': THINGS[start_at:start_at + 3]})
+
+
+async def _group_member(request):
+    if request.query['groupname'] == 'group-3':
+        return web.json_response({'errorMessages': ['Boom']}, status=500)
+    return _page(request, MEMBERS)
+
+
+async def _group_user(request):
+    request.app['added'].append((request.query['groupname'], (await request.json())['accountId']))
+    request.app['authorization'].append(request.headers.get('Authorization'))
+    return web.json_response({'name': request.query['groupname']}, status=201)
+
+
+async def _field(request):
+    return web.json_response([{'id': 'customfield_1', 'name': 'Team'}, {'id': 'summary', 'name': 'Summary'}])
+
+
+async def _throttled(request):
+    request.app['throttled_calls'] += 1
+    if request.app['throttled_calls'] == 1:
+        return web.json_response({'errorMessages': ['Too many requests']}, status=429, headers={'Retry-After': '0'})
+    return web.json_response({'ok': True})
+
+
+COMPONENTS = [
+    {'id': '1', 'name': 'Same', 'description': 'd', 'leadAccountId': 'lead-1', 'assigneeType': 'PROJECT_DEFAULT'},
+    {'id': '2', 'name': 'Changed', 'description': 'old', 'leadAccountId': 'lead-1', 'assigneeType': 'PROJECT_DEFAULT'},
+]
+
+
+async def _project_components(request):
+    return web.json_response(COMPONENTS)
+
+
+async def _create_component(request):
+    request.app['component_writes'].append(('POST', await request.json()))
+    return web.json_response({'id': '3', 'name': (await request.json())['name']}, status=201)
+
+
+async def _update_component(request):
+    request.app['component_writes'].append(('PUT', await request.json()))
+    component = [c for c in COMPONENTS if c['id'] == request.match_info['component_id']][0]
+    return web.json_response(dict(component, **(await request.json())))
+
+
+def _run_with_stub_server(test_coroutine):
+    """Start a stub Jira server on a free local port and run test_coroutine(app, client)."""
+
+    async def run():
+        app = web.Application()
+        app['added'] = []
+        app['authorization'] = []
+        app['throttled_calls'] = 0
+        app['component_writes'] = []
+        app.router.add_get('/rest/api/3/group/bulk', _group_bulk)
+        app.router.add_get('/rest/api/3/group/member', _group_member)
+        app.router.add_post('/rest/api/3/group/user', _group_user)
+        app.router.add_get('/rest/api/3/field', _field)
+        app.router.add_get('/rest/api/3/things', _things)
+        app.router.add_get('/rest/api/3/empty', _empty)
+        app.router.add_get('/rest/api/3/sprints', _sprints)
+        app.router.add_get('/rest/api/3/throttled', _throttled)
+        app.router.add_get('/rest/api/3/project/P/components', _project_components)
+        app.router.add_post('/rest/api/3/component', _create_component)
+        app.router.add_put('/rest/api/3/component/{component_id}', _update_component)
+        server = TestServer(app, host='127.0.0.1')
+        await server.start_server()
+        try:
+            async with AsyncJiraClient(user='user', api_token='token', url=f"http://127.0.0.1:{server.port}", page_workers=3) as client:
+                await test_coroutine(app, client)
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+
+def test_get_all_groups():
+
+    async def test(app, client):
+        groups = await client.get_all_groups()
+        assert [g['name'] for g in groups] == [g['name'] for g in GROUPS[:5]]
+
+    _run_with_stub_server(test)
+
+
+def test_get_group_members_in_order():
+
+    async def test(app, client):
+        members = await client.get_group_members({'name': 'group-0'})
+        assert members == MEMBERS
+
+    _run_with_stub_server(test)
+
+
+def test_get_all_groups_with_members():
+
+    async def test(app, client):
+        progress = []
+        groups = await client.get_all_groups_with_members(
+            progress_callback=lambda completed, total, group, exception: progress.append(group['name'])
+        )
+        assert [g['name'] for g in groups] == [g['name'] for g in GROUPS[:5]]
+        assert sorted(progress) == sorted(g['name'] for g in groups)
+        for g in groups:
+            if g['name'] == 'group-3':
+                assert g['members'] is None
+            else:
+                assert g['members'] == MEMBERS
+
+    _run_with_stub_server(test)
+
+
+def test_zero_max_results_falls_back_to_page_size():
+
+    async def test(app, client):
+        assert await client._get_all_paginated_results(f"{client.url_api_3}/things") == THINGS
+        # nothing to go by, so it stops instead of looping or failing
+        assert await client._get_all_paginated_results(f"{client.url_api_3}/empty") == []
+        assert await client._get_all_paginated_results(f"{client.url_api_3}/sprints") == THINGS
+
+    _run_with_stub_server(test)
+
+
+def test_add_user_to_group():
+
+    async def test(app, client):
+        response = await client.add_user_to_group({'name': 'group-0'}, {'accountId': 'user-0'})
+        assert response.status == 201
+        assert (await response.json()) == {'name': 'group-0'}
+        assert app['added'] == [('group-0', 'user-0')]
+        # user:token
+        assert app['authorization'] == ['Basic dXNlcjp0b2tlbg==']
+
+    _run_with_stub_server(test)
+
+
+def test_get_field_by_name():
+
+    async def test(app, client):
+        assert (await client.get_field_by_name('Team'))['id'] == 'customfield_1'
+        assert await client.get_field_by_name('Missing') is None
+
+    _run_with_stub_server(test)
+
+
+def test_gather_bounded_keeps_order_with_few_workers():
+    in_flight = 0
+    most_in_flight = 0
+
+    async def call(item):
+        nonlocal in_flight, most_in_flight
+        in_flight += 1
+        most_in_flight = max(most_in_flight, in_flight)
+        # later items finish first
+        await asyncio.sleep(0.001 * (20 - item))
+        in_flight -= 1
+        if item == 7:
+            raise RuntimeError('Boom')
+        return item * 10
+
+    async def test():
+        client = AsyncJiraClient(user='user', api_token='token', url='http://127.0.0.1', max_workers=3)
+        return await client._gather_bounded(call, range(20))
+
+    results = asyncio.run(test())
+    assert most_in_flight == 3
+    assert [(item, result) for item, result, _ in results] == [(i, None if i == 7 else i * 10) for i in range(20)]
+    assert [item for item, _, exception in results if exception] == [7]
+
+
+def test_throttled_call_is_retried():
+
+    async def test(app, client):
+        response = await client.get('throttled')
+        assert response.status == 200
+        assert app['throttled_calls'] == 2
+        assert client.rate_limiter.state()['throttled_count'] == 1
+
+    _run_with_stub_server(test)
+
+
+def test_create_or_update_components_skips_unchanged():
+
+    async def test(app, client):
+        desired = [
+            {'name': 'New', 'description': 'n', 'lead_account_id': 'lead-1', 'assignee_type': 'PROJECT_DEFAULT'},
+            {'name': 'Same', 'description': 'd', 'lead_account_id': 'lead-1', 'assignee_type': 'PROJECT_DEFAULT'},
+            {'name': 'Changed', 'description': 'new', 'lead_account_id': 'lead-1', 'assignee_type': 'PROJECT_DEFAULT'},
+        ]
+        components = await client.create_or_update_components('P', desired, include_unchanged=False)
+        assert [c['name'] for c in components] == ['New', 'Changed']
+        assert sorted(app['component_writes'], key=lambda w: w[0]) == [
+            ('POST', {'project': 'P', 'name': 'New', 'description': 'n', 'leadAccountId': 'lead-1', 'assigneeType': 'PROJECT_DEFAULT'}),
+            ('PUT', {'description': 'new'}),
+        ]
+        # by default there is one component per desired one, as before unchanged ones were skipped
+        components = await client.create_or_update_components('P', desired)
+        assert [c['name'] for c in components] == ['New', 'Same', 'Changed']
+
+    _run_with_stub_server(test)
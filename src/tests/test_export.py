@@ -0,0 +1,92 @@
+# TODO: figure out the right way to do this
+import sys; sys.path.append('..')
+
+import csv
+import json
+
+import pytest
+
+from export import export
+from export import export_csv
+from export import export_ndjson
+from export import export_parquet
+
+
+def _issues(count, late_field_at=None):
+    """Generate issue-like records, only consumable once like the client's generators."""
+    for i in range(count):
+        fields = {'summary': f"Issue {i}", 'status': {'name': 'Done' if i % 2 else 'To Do'}, 'labels': ['a', 'b'][:i % 3]}
+        if late_field_at is not None and i >= late_field_at:
+            fields['resolution'] = 'Fixed'
+        yield {'key': f"A-{i}", 'fields': fields}
+
+
+def test_export_ndjson(tmp_path):
+    path = str(tmp_path / 'issues.ndjson')
+    assert export_ndjson(_issues(5), path, chunk_size=2) == 5
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == list(_issues(5))
+    assert export(_issues(3), str(tmp_path / 'issues.jsonl'), field_map={'key': 'key', 'status': 'fields.status.name'}) == 3
+    with open(tmp_path / 'issues.jsonl') as f:
+        assert json.loads(f.readline()) == {'key': 'A-0', 'status': 'To Do'}
+
+
+def test_export_csv(tmp_path):
+    path = str(tmp_path / 'issues.csv')
+    assert export_csv(_issues(5), path, chunk_size=2) == 5
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ['key', 'fields.summary', 'fields.status.name', 'fields.labels']
+    assert [r['fields.labels'] for r in rows] == ['[]', '["a"]', '["a", "b"]', '[]', '["a"]']
+    field_map = {'key': 'key', 'status': 'fields.status.name', 'summary': lambda r: r['fields']['summary'].upper()}
+    assert export(_issues(2), path, field_map=field_map) == 2
+    with open(path, newline='') as f:
+        assert list(csv.reader(f)) == [['key', 'status', 'summary'], ['A-0', 'To Do', 'ISSUE 0'], ['A-1', 'Done', 'ISSUE 1']]
+
+
+def test_export_csv_fails_on_late_columns(tmp_path):
+    path = tmp_path / 'issues.csv'
+    with pytest.raises(ValueError, match=r"\['fields.resolution'\] first appear at record 4"):
+        export_csv(_issues(6, late_field_at=5), str(path), chunk_size=4)
+    assert not path.exists()
+    assert list(tmp_path.iterdir()) == []
+    # a late column is fine if the first chunk already has it
+    assert export_csv(_issues(6, late_field_at=5), str(path), chunk_size=10) == 6
+
+
+def test_export_parquet(tmp_path):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'issues.parquet')
+
+    def records():
+        # the first chunk has no assignee, so the column is typed as strings
+        for i in range(6):
+            yield {'key': f"A-{i}", 'points': i, 'assignee': f"user-{i}" if i >= 4 else None}
+
+    assert export_parquet(records(), path, chunk_size=3) == 6
+    table = pyarrow_parquet.read_table(path)
+    assert table.column('assignee').to_pylist() == [None] * 4 + ['user-4', 'user-5']
+    assert table.column('points').to_pylist() == list(range(6))
+
+
+def test_export_parquet_fails_on_type_change(tmp_path):
+    pytest.importorskip('pyarrow.parquet')
+    path = tmp_path / 'issues.parquet'
+    records = ({'key': f"A-{i}", 'points': i if i < 3 else 'many'} for i in range(6))
+    with pytest.raises(ValueError, match='Column `points` of the chunk starting at record 3'):
+        export_parquet(records, str(path), chunk_size=3)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_export_empty_records(tmp_path):
+    assert export_ndjson([], str(tmp_path / 'issues.ndjson')) == 0
+    assert (tmp_path / 'issues.ndjson').read_text() == ''
+    assert export_csv(iter([]), str(tmp_path / 'issues.csv')) == 0
+    assert (tmp_path / 'issues.csv').exists()
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+    assert export_parquet([], str(tmp_path / 'none.parquet')) == 0
+    assert pyarrow_parquet.read_table(str(tmp_path / 'none.parquet')).num_rows == 0
+    assert export_parquet(iter([]), str(tmp_path / 'mapped.parquet'), field_map={'key': 'key', 'status': 'fields.status.name'}) == 0
+    table = pyarrow_parquet.read_table(str(tmp_path / 'mapped.parquet'))
+    assert (table.num_rows, table.column_names) == (0, ['key', 'status'])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['issues.csv', 'issues.ndjson', 'mapped.parquet', 'none.parquet']
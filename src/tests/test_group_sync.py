@@ -0,0 +1,128 @@
+# TODO: figure out the right way to do this
+import sys; sys.path.append('..')
+
+import json
+import time
+
+import pytest
+
+import main
+from group_sync import GroupSyncEngine
+from group_sync import load_mappings
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeClient:
+    """Answers the group calls of GroupSyncEngine from a dict of group name to accountIds."""
+
+    max_workers = 4
+
+    def __init__(self, groups, failing_account_ids=()):
+        self.groups = groups
+        self.failing_account_ids = set(failing_account_ids)
+        self.calls = []
+
+    def get_group_members(self, group):
+        if group['name'] not in self.groups:
+            raise RuntimeError(f"No group {group['name']}")
+        return [{'accountId': a, 'displayName': a.upper()} for a in self.groups[group['name']]]
+
+    def _change(self, action, group, user, status_code):
+        # finish the calls out of order so results have to be put back in plan order
+        time.sleep(0.01 * (len(self.calls) % 3))
+        self.calls.append((action, group['name'], user['accountId']))
+        if user['accountId'] in self.failing_account_ids:
+            raise RuntimeError('Boom')
+        if user['accountId'] == 'rejected':
+            return FakeResponse(400, 'Bad request')
+        return FakeResponse(status_code)
+
+    def add_user_to_group(self, group, user):
+        return self._change('add', group, user, 201)
+
+    def remove_user_from_group(self, group, user):
+        return self._change('remove', group, user, 200)
+
+
+def _write_config(tmp_path, mappings):
+    path = tmp_path / 'sync.json'
+    path.write_text(json.dumps({'mappings': mappings}))
+    return str(path)
+
+
+def test_load_mappings(tmp_path):
+    mappings = load_mappings(_write_config(tmp_path, [
+        {'source': 'a', 'target': 'b'},
+        {'source': 'c', 'target': 'd', 'direction': 'both', 'remove_extra': False},
+    ]))
+    assert mappings == [
+        {'source': 'a', 'target': 'b', 'direction': 'source_to_target', 'remove_extra': True},
+        {'source': 'c', 'target': 'd', 'direction': 'both', 'remove_extra': False},
+    ]
+    with pytest.raises(ValueError, match='needs both'):
+        load_mappings(_write_config(tmp_path, [{'source': 'a'}]))
+    with pytest.raises(ValueError, match='unknown direction'):
+        load_mappings(_write_config(tmp_path, [{'source': 'a', 'target': 'b', 'direction': 'sideways'}]))
+
+
+def test_plan():
+    client = FakeClient({
+        'eng': ['u1', 'u2'],
+        'jira-eng': ['u2', 'u3'],
+        'ops': ['u3'],
+        'design': ['u4'],
+        'jira-design': ['u5'],
+    })
+    engine = GroupSyncEngine(client)
+    plan = engine.plan([
+        {'source': 'eng', 'target': 'jira-eng', 'direction': 'source_to_target', 'remove_extra': True},
+        # another mapping gives u3 to jira-eng, so it isn't removed
+        {'source': 'ops', 'target': 'jira-eng', 'direction': 'source_to_target', 'remove_extra': True},
+        {'source': 'design', 'target': 'jira-design', 'direction': 'both', 'remove_extra': True},
+    ])
+    assert [(m['action'], m['group'], m['user']['accountId']) for m in plan] == [
+        ('add', 'design', 'u5'),
+        ('add', 'jira-design', 'u4'),
+        ('add', 'jira-eng', 'u1'),
+    ]
+    assert engine.format_plan(plan).splitlines() == [
+        '+ design: u5 (U5)',
+        '+ jira-design: u4 (U4)',
+        '+ jira-eng: u1 (U1)',
+        '3 to add, 0 to remove',
+    ]
+
+
+def test_plan_fails_on_missing_group():
+    engine = GroupSyncEngine(FakeClient({'eng': ['u1']}))
+    with pytest.raises(RuntimeError, match='the members of 1 groups'):
+        engine.plan([{'source': 'eng', 'target': 'missing', 'direction': 'source_to_target', 'remove_extra': True}])
+
+
+def test_apply_keeps_plan_order_and_reports_failures():
+    client = FakeClient({'eng': ['u1', 'u2', 'rejected', 'broken'], 'jira-eng': ['u9']}, failing_account_ids=['broken'])
+    engine = GroupSyncEngine(client, max_workers=3)
+    plan = engine.plan([{'source': 'eng', 'target': 'jira-eng', 'direction': 'source_to_target', 'remove_extra': True}])
+    results = engine.apply(plan)
+    assert [r['mutation'] for r in results] == plan
+    assert [(r['mutation']['user']['accountId'], r['ok'], r['status_code'], r['error']) for r in results] == [
+        ('broken', False, None, 'Boom'),
+        ('rejected', False, 400, 'Bad request'),
+        ('u1', True, 201, None),
+        ('u2', True, 201, None),
+        ('u9', True, 200, None),
+    ]
+
+
+def test_dry_run_prints_the_plan(capsys):
+    engine = GroupSyncEngine(FakeClient({'eng': ['u1'], 'jira-eng': []}))
+    plan = engine.plan([{'source': 'eng', 'target': 'jira-eng', 'direction': 'source_to_target', 'remove_extra': True}])
+    assert main.run_plan(engine, plan, dry_run=True) == []
+    assert capsys.readouterr().out == '+ jira-eng: u1 (U1)\n1 to add, 0 to remove\n'
+    assert engine.client.calls == []
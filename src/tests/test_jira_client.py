@@ -44,6 +44,18 @@ def test_get_group_members():
     pass
 
 
+def test_get_all_groups_with_page_workers():
+    """Fetching pages concurrently should return the same groups in the same order."""
+
+    jc_concurrent = JiraClient(
+        user=TEST_JIRA_USER,
+        api_token=TEST_JIRA_API_TOKEN,
+        url=TEST_JIRA_URL,
+        page_workers=4
+    )
+    assert jc_concurrent.get_all_groups() == JC.get_all_groups()
+
+
 def test_get_all_groups_with_members():
     """This is a lazy test that is dependent on get_all_groups working properly. Additionally, this
     test assumes that at least one group in your test server environment has at least one member.
@@ -96,6 +108,15 @@ def test_add_user_to_group():
     assert test_user_in_test_group
 
 
+def test_add_users_to_group_skips_existing_members():
+
+    # test user should already be a member after test_add_user_to_group
+    result = JC.add_users_to_group(TEST_GROUP, [TEST_USER])
+    assert result['succeeded'] == []
+    assert result['failed'] == []
+    assert [u['accountId'] for u in result['skipped']] == [TEST_USER['accountId']]
+
+
 def test_remove_user_from_group():
 
     # method should return successful status code
@@ -135,3 +156,13 @@ def test_delete_group():
             test_group_retrieved_after_delete = True
             break
     assert test_group_retrieved_after_delete is False
+
+
+def test_get_fields_by_names():
+
+    # every Jira instance has a Summary field
+    fields_by_name = JC.get_fields_by_names(['Summary', 'summary'], ignore_case=True)
+    assert fields_by_name['Summary']['id'] == 'summary'
+    assert fields_by_name['summary'] == fields_by_name['Summary']
+    assert JC.get_field_by_name('Summary') == fields_by_name['Summary']
+    assert JC.get_field_by_id('summary') == fields_by_name['Summary']
@@ -0,0 +1,395 @@
+# TODO: figure out the right way to do this
+import sys; sys.path.append('..')
+
+import json
+import random
+import time
+
+import pytest
+import requests
+
+from adf import ADF
+from adf import CompactADF
+from adf import encode_json
+from jira_client import JiraClient
+from response_cache import ResponseCache
+from stub_jira_server import StubJiraServer
+
+
+def _client(server, **kwargs):
+    return JiraClient(user='user', api_token='token', url=server.url, requests_per_second=1000, **kwargs)
+
+
+def _paginated(values, page_limit=100, reported_max_results=None, delay=0):
+    """A handler of a startAt/maxResults/total paginated call that returns at most page_limit
+    values per page, optionally after a random delay so concurrent pages finish out of order.
+    """
+
+    def handler(request):
+        time.sleep(random.random() * delay)
+        start_at = int(request.query['startAt'])
+        max_results = min(int(request.query['maxResults']), page_limit)
+        return 200, {
+            'startAt': start_at,
+            'maxResults': max_results if reported_max_results is None else reported_max_results,
+            'total': len(values),
+            'isLast': start_at + max_results >= len(values),
+            'values': values[start_at:start_at + max_results],
+        }
+
+    return handler
+
+
+### PAGINATION ###
+def test_concurrent_pages_are_yielded_in_order():
+    values = list(range(1234))
+    with StubJiraServer({('GET', '/rest/api/3/things'): _paginated(values, page_limit=50, delay=0.01)}) as server:
+        client = _client(server, page_workers=4)
+        assert client._get_all_paginated_results(f"{client.url_api_3}/things") == values
+    offsets = sorted(int(r.query['startAt']) for r in server.requests)
+    assert offsets == list(range(0, 1234, 50))
+    # pages after the first ask for the page size the server enforces
+    assert {r.query['maxResults'] for r in server.requests[1:]} == {'50'}
+
+
+def test_zero_max_results_falls_back_to_page_size():
+    values = list(range(7))
+    routes = {
+        ('GET', '/rest/api/3/things'): _paginated(values, page_limit=3, reported_max_results=0),
+        ('GET', '/rest/api/3/empty'): _paginated(values, page_limit=0, reported_max_results=0),
+    }
+    with StubJiraServer(routes) as server:
+        client = _client(server, page_workers=2)
+        assert client._get_all_paginated_results(f"{client.url_api_3}/things") == values
+        # nothing to go by, so it stops instead of looping or failing
+        assert client._get_all_paginated_results(f"{client.url_api_3}/empty") == []
+
+
+### COMPONENTS ###
+EXISTING_COMPONENTS = [
+    {'id': '1', 'name': 'Same', 'description': 'd', 'lead': {'accountId': 'lead-1'}, 'assigneeType': 'PROJECT_DEFAULT'},
+    {'id': '2', 'name': 'Description', 'description': 'old', 'leadAccountId': 'lead-1', 'assigneeType': 'PROJECT_DEFAULT'},
+    {'id': '3', 'name': 'Lead', 'description': '', 'leadAccountId': 'lead-1', 'assigneeType': 'PROJECT_DEFAULT'},
+    {'id': '4', 'name': 'Assignee', 'leadAccountId': 'lead-1', 'assigneeType': 'PROJECT_DEFAULT'},
+]
+DESIRED_COMPONENTS = [
+    {'name': 'New', 'description': 'n', 'lead_account_id': 'lead-1', 'assignee_type': 'PROJECT_DEFAULT'},
+    {'name': 'Same', 'description': 'd', 'lead_account_id': 'lead-1', 'assignee_type': 'PROJECT_DEFAULT'},
+    {'name': 'Description', 'description': 'new', 'lead_account_id': 'lead-1', 'assignee_type': 'PROJECT_DEFAULT'},
+    {'name': 'Lead', 'description': None, 'lead_account_id': 'lead-2', 'assignee_type': 'PROJECT_DEFAULT'},
+    {'name': 'Assignee', 'description': '', 'lead_account_id': 'lead-1', 'assignee_type': 'COMPONENT_LEAD'},
+]
+
+
+def _component_routes():
+    routes = {
+        ('GET', '/rest/api/3/project/P/components'): lambda request: (200, EXISTING_COMPONENTS),
+        ('POST', '/rest/api/3/component'): lambda request: (201, {'id': '5', 'name': request.json['name']}),
+    }
+    for c in EXISTING_COMPONENTS:
+        routes[('PUT', f"/rest/api/3/component/{c['id']}")] = lambda request, c=c: (200, dict(c, **request.json))
+    return routes
+
+
+def test_get_component_changes():
+    changes = JiraClient._get_component_changes
+    existing = {c['name']: c for c in EXISTING_COMPONENTS}
+    assert [changes(existing[c['name']], c) for c in DESIRED_COMPONENTS[1:]] == [
+        {},
+        {'description': 'new'},
+        {'lead_account_id': 'lead-2'},
+        {'assignee_type': 'COMPONENT_LEAD'},
+    ]
+
+
+def test_create_or_update_components():
+    with StubJiraServer(_component_routes()) as server:
+        client = _client(server, max_workers=4)
+        components = client.create_or_update_components('P', DESIRED_COMPONENTS, include_unchanged=False)
+        writes = [(r.method, r.path, r.json) for r in server.requests if r.method != 'GET']
+        with_unchanged = client.create_or_update_components('P', DESIRED_COMPONENTS)
+    # unchanged components aren't sent, only returned by default, and all keep the order they were passed in
+    assert [c['name'] for c in components] == ['New', 'Description', 'Lead', 'Assignee']
+    assert [c['name'] for c in with_unchanged] == [c['name'] for c in DESIRED_COMPONENTS]
+    assert sorted(writes, key=lambda w: w[1]) == [
+        ('POST', '/rest/api/3/component', {
+            'project': 'P', 'name': 'New', 'description': 'n', 'leadAccountId': 'lead-1', 'assigneeType': 'PROJECT_DEFAULT'
+        }),
+        ('PUT', '/rest/api/3/component/2', {'description': 'new'}),
+        ('PUT', '/rest/api/3/component/3', {'leadAccountId': 'lead-2'}),
+        ('PUT', '/rest/api/3/component/4', {'assigneeType': 'COMPONENT_LEAD'}),
+    ]
+
+
+### CUSTOM FIELD OPTIONS ###
+EXISTING_OPTIONS = [
+    {'id': '1', 'value': 'A', 'disabled': False},
+    {'id': '2', 'value': 'B', 'disabled': False},
+    {'id': '3', 'value': 'C', 'disabled': False},
+    {'id': '4', 'value': 'D', 'disabled': True},
+    # a child option of a cascading select is never touched
+    {'id': '5', 'value': 'A1', 'optionId': '1', 'disabled': False},
+]
+
+
+def _option_routes(existing):
+    path = '/rest/api/3/field/customfield_1/context/10/option'
+
+    def create(request):
+        return 200, {'options': [dict(o, id=f"new-{o['value']}") for o in request.json['options']]}
+
+    return {
+        ('GET', '/rest/api/3/field/customfield_1/context'): _paginated([{'id': '10'}]),
+        ('GET', path): _paginated(existing),
+        ('POST', path): create,
+        ('PUT', path): lambda request: (200, None),
+    }
+
+
+def test_get_custom_field_option_changes():
+    creates, updates, unchanged = JiraClient._get_custom_field_option_changes(
+        EXISTING_OPTIONS,
+        # matched by id and renamed, matched by value, new, and re-enabled
+        [{'id': '1', 'value': 'A renamed'}, 'B', 'E', {'value': 'D', 'disabled': False}]
+    )
+    assert creates == [{'value': 'E', 'disabled': False}]
+    # C is no longer desired so it is disabled rather than deleted
+    assert updates == [
+        {'id': '1', 'value': 'A renamed', 'disabled': False},
+        {'id': '4', 'value': 'D', 'disabled': False},
+        {'id': '3', 'value': 'C', 'disabled': True},
+    ]
+    assert unchanged == 1
+    creates, updates, unchanged = JiraClient._get_custom_field_option_changes(EXISTING_OPTIONS, ['A'], disable_missing=False)
+    assert (creates, updates, unchanged) == ([], [], 4)
+
+
+def test_reconcile_custom_field_options_chunks_writes():
+    values = [f"V{i:04d}" for i in range(1001)]
+    with StubJiraServer(_option_routes(EXISTING_OPTIONS)) as server:
+        results = _client(server).reconcile_custom_field_options('customfield_1', ['A', 'B'] + values)
+    writes = [r for r in server.requests if r.method != 'GET']
+    assert [(r.method, len(r.json['options'])) for r in writes] == [('PUT', 1), ('POST', 1000), ('POST', 1)]
+    assert [o['value'] for r in writes[1:] for o in r.json['options']] == values
+    assert [o['value'] for o in results['10']['created']] == values
+    assert results['10']['updated'] == [{'id': '3', 'value': 'C', 'disabled': True}]
+    assert results['10']['unchanged'] == 3
+    assert results['10']['failed'] == []
+    assert not any(r.method == 'DELETE' for r in server.requests)
+
+
+### GROUPS ###
+GROUPS = [{'name': f"group-{i}", 'groupId': f"id-{i}"} for i in range(6)] + [{'name': 'atlassian-addons-admin'}]
+MEMBERS = [{'accountId': f"user-{i}"} for i in range(120)]
+
+
+def _group_member(request):
+    if request.query['groupname'] in ('group-2', 'group-4'):
+        return 500, {'errorMessages': ['Boom']}
+    return _paginated(MEMBERS, page_limit=50)(request)
+
+
+def test_get_all_groups_with_members_keeps_going_on_failures():
+    routes = {
+        ('GET', '/rest/api/3/group/bulk'): _paginated(GROUPS),
+        ('GET', '/rest/api/3/group/member'): _group_member,
+    }
+    progress = []
+    with StubJiraServer(routes) as server:
+        groups = _client(server, max_workers=3, page_workers=2).get_all_groups_with_members(
+            progress_callback=lambda completed, total, group, exception: progress.append(
+                (completed, total, group['name'], exception is not None)
+            )
+        )
+    assert [g['name'] for g in groups] == [g['name'] for g in GROUPS[:6]]
+    assert {g['name']: g['members'] is None for g in groups} == {
+        'group-0': False, 'group-1': False, 'group-2': True, 'group-3': False, 'group-4': True, 'group-5': False,
+    }
+    assert all(g['members'] == MEMBERS for g in groups if g['members'] is not None)
+    # the callback is called once per group, with a running count
+    assert [p[0] for p in progress] == [1, 2, 3, 4, 5, 6]
+    assert {p[1] for p in progress} == {6}
+    assert sorted((p[2], p[3]) for p in progress) == sorted((g['name'], g['members'] is None) for g in groups)
+
+
+### CONNECTIONS ###
+def test_adapter_and_headers():
+    with StubJiraServer({('GET', '/rest/api/3/myself'): lambda request: (200, {'accountId': 'me'})}) as server:
+        client = _client(server, max_workers=8, page_workers=4, pool_connections=3, pool_block=True, keep_alive=False, compress=False)
+        assert client.get('myself').json() == {'accountId': 'me'}
+    for prefix in ('http://', 'https://'):
+        adapter = client._session.get_adapter(f"{prefix}example.com")
+        assert adapter is client._session.get_adapter('http://127.0.0.1')
+        assert (adapter._pool_connections, adapter._pool_maxsize, adapter._pool_block) == (3, 32, True)
+        # retries are done by the client, not by urllib3
+        assert adapter.max_retries.total == 0
+    headers = server.requests[0].headers
+    assert headers['Connection'] == 'close'
+    assert headers['Accept-Encoding'] == 'identity'
+    assert client.timeout == (10, 60)
+
+
+def test_read_timeout():
+
+    def slow(request):
+        time.sleep(0.5)
+        return 200, {}
+
+    with StubJiraServer({('GET', '/rest/api/3/slow'): slow}) as server:
+        client = _client(server, read_timeout=0.1, max_retries=0)
+        with pytest.raises(requests.exceptions.ReadTimeout):
+            client.get('slow')
+        # a per call timeout overrides the client's
+        assert client._request('GET', f"{client.url_api_3}/slow", timeout=(1, 2)).status_code == 200
+
+
+### RESPONSE CACHE ###
+class FakeResponse:
+
+    def __init__(self, size):
+        self.content = b'x' * size
+        self.headers = {}
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=3, max_bytes=100)
+    for name in 'abc':
+        cache.store(ResponseCache.key(name), FakeResponse(10))
+    # reading a marks it as recently used, so b is evicted first
+    assert cache.get(ResponseCache.key('a')) is not None
+    cache.store(ResponseCache.key('d'), FakeResponse(10))
+    assert [cache.get(ResponseCache.key(name)) is not None for name in 'abcd'] == [True, False, True, True]
+    # by size: the 80 bytes of e only fit once the least recently used entry, a, is evicted
+    cache.store(ResponseCache.key('e'), FakeResponse(80))
+    assert [cache.get(ResponseCache.key(name)) is not None for name in 'acde'] == [False, True, True, True]
+    # a response larger than the whole cache isn't stored
+    cache.store(ResponseCache.key('f'), FakeResponse(101))
+    assert cache.get(ResponseCache.key('f')) is None
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'revalidations': 0, 'evictions': 2, 'entries': 3, 'bytes': 100}
+    assert ResponseCache.key('u', {'b': 1, 'a': True}) == ResponseCache.key('u', {'a': 'True', 'b': '1'})
+    assert ResponseCache.key('u', user='a') != ResponseCache.key('u', user='b')
+
+
+def test_client_response_cache():
+
+    def field(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return 304, None, {'ETag': '"v1"'}
+        return 200, [{'id': 'summary', 'name': 'Summary'}], {'ETag': '"v1"'}
+
+    routes = {
+        ('GET', '/rest/api/3/field'): field,
+        ('POST', '/rest/api/3/search/jql'): lambda request: (200, {'issues': [], 'isLast': True}),
+        ('POST', '/rest/api/3/component'): lambda request: (201, {'id': '1'}),
+    }
+    with StubJiraServer(routes) as server:
+        fresh = _client(server, response_cache_ttl=60)
+        assert fresh.get('field').json() == fresh.get('field').json()
+        assert len(server.requests) == 1
+        assert fresh.response_cache.stats()['hits'] == 1
+
+        # a read-only POST leaves the cache alone, a write clears it
+        list(fresh.search_issues('project = A', use_token_paging=True))
+        fresh.get('field')
+        assert len(server.requests_to('GET', '/rest/api/3/field')) == 1
+        fresh.create_component('A', 'New', 'lead-1')
+        fresh.get('field')
+        assert len(server.requests_to('GET', '/rest/api/3/field')) == 2
+
+        # stale entries are revalidated and a 304 reuses the cached body
+        stale = _client(server, response_cache=ResponseCache(ttl=0))
+        assert stale.get('field').json() == [{'id': 'summary', 'name': 'Summary'}]
+        assert stale.get('field').json() == [{'id': 'summary', 'name': 'Summary'}]
+        revalidation = server.requests_to('GET', '/rest/api/3/field')[-1]
+        assert revalidation.headers['If-None-Match'] == '"v1"'
+        assert stale.response_cache.stats()['revalidations'] == 1
+
+        # a cache shared by clients of different users never serves one user's response to another
+        shared = ResponseCache(ttl=60)
+        calls = len(server.requests)
+        _client(server, response_cache=shared).get('field')
+        JiraClient(user='other', api_token='token', url=server.url, requests_per_second=1000, response_cache=shared).get('field')
+        _client(server, response_cache=shared).get('field')
+        assert len(server.requests) == calls + 2
+        assert server.requests[calls].headers['Authorization'] != server.requests[calls + 1].headers['Authorization']
+        assert shared.stats()['hits'] == 1
+
+
+### ISSUE SEARCH ###
+ISSUES = [{'id': str(i), 'key': f"A-{i}"} for i in range(7)]
+
+
+def _token_search(request):
+    start_at = int(request.json.get('nextPageToken') or 0)
+    page = ISSUES[start_at:start_at + request.json['maxResults']]
+    end = start_at + len(page)
+    response = {'issues': page, 'isLast': end >= len(ISSUES)}
+    if end < len(ISSUES):
+        response['nextPageToken'] = str(end)
+    return 200, response
+
+
+def _search(request):
+    start_at = request.json['startAt']
+    max_results = min(request.json['maxResults'], 3)
+    return 200, {'startAt': start_at, 'maxResults': max_results, 'total': len(ISSUES), 'issues': ISSUES[start_at:start_at + max_results]}
+
+
+def test_search_issues_request_bodies():
+    routes = {('POST', '/rest/api/3/search/jql'): _token_search, ('POST', '/rest/api/3/search'): _search}
+    with StubJiraServer(routes) as server:
+        client = _client(server, page_workers=2)
+        assert list(client.search_issues('project = A', fields='summary, status', expand=['changelog'])) == ISSUES
+        assert list(client.search_issues('project = A', fields=['key'], expand='changelog,names', use_token_paging=True)) == ISSUES
+    searches = server.requests_to('POST', '/rest/api/3/search')
+    assert sorted(r.json['startAt'] for r in searches) == [0, 3, 6]
+    assert searches[0].json == {'jql': 'project = A', 'fields': ['summary', 'status'], 'expand': ['changelog'], 'maxResults': 1000, 'startAt': 0}
+    assert all(r.json['maxResults'] == 3 for r in searches[1:])
+    token_searches = server.requests_to('POST', '/rest/api/3/search/jql')
+    # token paging sends expand as a comma separated string and has no startAt
+    assert [r.json for r in token_searches] == [
+        {'jql': 'project = A', 'fields': ['key'], 'expand': 'changelog,names', 'maxResults': 100},
+    ]
+
+
+def test_token_pagination():
+    with StubJiraServer({('POST', '/rest/api/3/things'): _token_search}) as server:
+        client = _client(server)
+        url = f"{client.url_api_3}/things"
+        # a stale token passed in is dropped, then tokens are followed until isLast
+        assert list(client._get_token_paginated_results(url, results_key='issues', parameters={'nextPageToken': '5'}, max_results=3)) == ISSUES
+        assert [r.json.get('nextPageToken') for r in server.requests] == [None, '3', '6']
+        # isLast without a token, or a token with isLast, both stop
+        server.routes[('POST', '/rest/api/3/things')] = lambda request: (200, {'issues': ISSUES[:1], 'isLast': False})
+        assert list(client._get_token_paginated_results(url, results_key='issues')) == ISSUES[:1]
+        server.routes[('POST', '/rest/api/3/things')] = lambda request: (200, {'issues': ISSUES[:1], 'isLast': True, 'nextPageToken': 'x'})
+        assert list(client._get_token_paginated_results(url, results_key='issues')) == ISSUES[:1]
+        # token pages are read-only POSTs, so a throttled one is retried
+        calls = []
+
+        def throttled(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return 429, {'errorMessages': ['Slow down']}, {'Retry-After': '0'}
+            return 200, {'issues': ISSUES[:2], 'isLast': True}
+
+        server.routes[('POST', '/rest/api/3/things')] = throttled
+        assert list(client._get_token_paginated_results(url, results_key='issues')) == ISSUES[:2]
+        assert len(calls) == 2
+
+
+### ADF BODIES ###
+def test_adf_bodies_are_sent_as_compact_json():
+    doc = CompactADF.adf_doc(content_list=[CompactADF.convert_text_to_adf_paragraph('Hello, world: "quoted" é')])
+    routes = {('POST', '/rest/api/3/issue/A-1/comment'): lambda request: (201, {'id': '1'})}
+    with StubJiraServer(routes) as server:
+        client = _client(server)
+        assert client.add_issue_comment('A-1', doc).status_code == 201
+        assert client.add_issue_comment('A-1', doc, stream=True).status_code == 201
+    sent, streamed = server.requests
+    # the same bytes either way, and the size the ADF splitting was measured with
+    assert sent.body == streamed.body == encode_json({'body': doc})
+    assert len(sent.body) == len('{"body":}') + ADF._json_size(doc)
+    assert json.loads(sent.body) == {'body': ADF.to_dict(doc)}
+    assert sent.headers['Content-Type'] == 'application/json'
+    assert streamed.headers.get('Transfer-Encoding') == 'chunked'
@@ -0,0 +1,82 @@
+# TODO: figure out the right way to do this
+import sys; sys.path.append('..')
+
+from snapshot_store import GroupSnapshotStore
+
+
+class FakeClient:
+    """Answers the group calls of GroupSnapshotStore.refresh from a dict of group name to members."""
+
+    max_workers = 4
+
+    def __init__(self, groups):
+        self.groups = groups
+        self.member_calls = []
+
+    def get_all_groups(self):
+        return [{'name': name, 'groupId': f"id-{name}"} for name in self.groups]
+
+    def get_group_member_count(self, group):
+        return len(self.groups[group['name']])
+
+    def get_group_members(self, group):
+        if group['name'] == 'broken':
+            raise RuntimeError('Boom')
+        self.member_calls.append(group['name'])
+        return [{'accountId': a, 'displayName': a.upper()} for a in self.groups[group['name']]]
+
+
+def _members(*account_ids, suffix=''):
+    return [{'accountId': a, 'displayName': f"{a}{suffix}"} for a in account_ids]
+
+
+def test_save_group_returns_delta():
+    with GroupSnapshotStore(':memory:') as store:
+        assert store.save_group({'name': 'eng'}, _members('u1', 'u2')) == {'added': ['u1', 'u2'], 'removed': []}
+        # same members in another order
+        assert store.save_group({'name': 'eng'}, _members('u2', 'u1')) == {'added': [], 'removed': []}
+        assert store.save_group({'name': 'eng'}, _members('u2', 'u3')) == {'added': ['u3'], 'removed': ['u1']}
+        # a changed record isn't a membership change but is stored
+        assert store.save_group({'name': 'eng'}, _members('u2', 'u3', suffix='!')) == {'added': [], 'removed': []}
+        assert store.get_group_members('eng') == _members('u2', 'u3', suffix='!')
+        assert store.get_group('eng')['member_count'] == 2
+        store.save_group({'name': 'ops'}, _members('u3'))
+        assert store.get_user_groups('u3') == ['eng', 'ops']
+        assert store.delete_group('eng') == {'added': [], 'removed': ['u2', 'u3']}
+        assert store.get_user_groups('u3') == ['ops']
+        assert store.get_group_members('eng') == []
+
+
+def test_refresh_only_downloads_what_may_have_changed():
+    client = FakeClient({'eng': ['u1', 'u2'], 'ops': ['u3'], 'old': ['u4']})
+    with GroupSnapshotStore(':memory:') as store:
+        summary = store.refresh(client)
+        assert sorted(summary['refreshed']) == ['eng', 'old', 'ops']
+        assert summary['deltas']['ops'] == {'added': ['u3'], 'removed': []}
+
+        # within the TTL, a group is only downloaded again if its member count changed
+        client.member_calls.clear()
+        client.groups['eng'] = ['u1', 'u2', 'u5']
+        client.groups['ops'] = ['u6']
+        del client.groups['old']
+        summary = store.refresh(client)
+        assert client.member_calls == ['eng']
+        assert summary['unchanged'] == ['ops']
+        assert summary['removed_groups'] == ['old']
+        assert summary['deltas'] == {'eng': {'added': ['u5'], 'removed': []}, 'old': {'added': [], 'removed': ['u4']}}
+
+        # the swap in ops that kept the count is picked up once the snapshot is older than the TTL
+        client.member_calls.clear()
+        summary = store.refresh(client, ttl=0)
+        assert sorted(client.member_calls) == ['eng', 'ops']
+        assert summary['deltas'] == {'ops': {'added': ['u6'], 'removed': ['u3']}}
+        assert store.get_user_groups('u6') == ['ops']
+
+
+def test_refresh_reports_failures():
+    client = FakeClient({'eng': ['u1'], 'broken': ['u2']})
+    with GroupSnapshotStore(':memory:') as store:
+        summary = store.refresh(client)
+        assert summary['refreshed'] == ['eng']
+        assert list(summary['failed']) == ['broken']
+        assert store.get_group('broken') is None
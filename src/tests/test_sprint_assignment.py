@@ -0,0 +1,100 @@
+# TODO: figure out the right way to do this
+import sys; sys.path.append('..')
+
+import json
+
+import pytest
+
+from jira_client import MAX_ISSUES_PER_SPRINT_MOVE
+from sprint_assignment import SprintAssignmentEngine
+from sprint_assignment import load_rules
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeClient:
+    """Answers the board calls of SprintAssignmentEngine from dicts of board ID to sprints and of
+    (board ID, JQL) to issue keys.
+    """
+
+    max_workers = 4
+
+    def __init__(self, sprints, issues, failing_sprint_ids=()):
+        self.sprints = sprints
+        self.issues = issues
+        self.failing_sprint_ids = set(failing_sprint_ids)
+        self.moves = []
+
+    def get_board_sprints(self, board_id, state=None):
+        return self.sprints[board_id]
+
+    def get_board_issues(self, board_id, jql=None, fields=None):
+        return [{'key': key} for key in self.issues[(board_id, jql)]]
+
+    def move_issues_to_sprint(self, sprint_id, issue_keys):
+        self.moves.append((sprint_id, issue_keys))
+        if sprint_id in self.failing_sprint_ids:
+            return FakeResponse(400, 'Sprint is closed')
+        return FakeResponse(204)
+
+
+SPRINTS = {12: [
+    {'id': 3, 'state': 'future', 'startDate': None},
+    {'id': 2, 'state': 'future', 'startDate': '2021-02-01T00:00:00.000Z'},
+    {'id': 1, 'state': 'active', 'startDate': '2021-01-18T00:00:00.000Z'},
+]}
+
+
+def test_load_rules(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'rules': [{'board_id': 12, 'jql': 'labels = a', 'sprint': 'active'}]}))
+    assert load_rules(str(path)) == [{'board_id': 12, 'jql': 'labels = a', 'sprint': 'active'}]
+    path.write_text(json.dumps({'rules': [{'board_id': 12, 'jql': ''}]}))
+    with pytest.raises(ValueError, match=r"\['jql', 'sprint'\]"):
+        load_rules(str(path))
+
+
+def test_last_matching_rule_wins():
+    client = FakeClient(SPRINTS, {
+        (12, 'labels = a'): ['A-1', 'A-2', 'A-3'],
+        (12, 'labels = b'): ['A-2'],
+        (12, 'labels = c'): ['A-3'],
+    })
+    plan = SprintAssignmentEngine(client).plan([
+        {'board_id': 12, 'jql': 'labels = a', 'sprint': 'active'},
+        {'board_id': 12, 'jql': 'labels = b', 'sprint': 'next'},
+        {'board_id': 12, 'jql': 'labels = c', 'sprint': 99},
+    ])
+    assert plan == {'A-1': 1, 'A-2': 2, 'A-3': 99}
+
+
+@pytest.mark.parametrize('issue_count,batch_sizes', [
+    (MAX_ISSUES_PER_SPRINT_MOVE, [50]),
+    (MAX_ISSUES_PER_SPRINT_MOVE + 1, [50, 1]),
+])
+def test_batches_split_at_the_maximum(issue_count, batch_sizes):
+    plan = {f"A-{i}": 1 for i in range(issue_count)}
+    plan['B-1'] = 2
+    batches = SprintAssignmentEngine.get_batches(plan)
+    assert [(sprint_id, len(keys)) for sprint_id, keys in batches] == [(1, n) for n in batch_sizes] + [(2, 1)]
+    assert [key for _, keys in batches for key in keys] == list(plan)
+
+
+def test_apply_reports_each_batch():
+    client = FakeClient(SPRINTS, {}, failing_sprint_ids=[2])
+    engine = SprintAssignmentEngine(client, max_workers=2)
+    plan = {f"A-{i}": 1 for i in range(51)}
+    plan.update({'B-1': 2, 'B-2': 2})
+    results = engine.apply(plan)
+    assert [r['batch'] for r in results] == engine.get_batches(plan)
+    assert [(r['ok'], r['status_code'], r['error']) for r in results] == [
+        (True, 204, None),
+        (True, 204, None),
+        (False, 400, 'Sprint is closed'),
+    ]
+    assert sorted(len(keys) for _, keys in client.moves) == [1, 2, 50]
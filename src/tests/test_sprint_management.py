@@ -0,0 +1,145 @@
+# TODO: figure out the right way to do this
+import sys; sys.path.append('..')
+
+import random
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import pytest
+
+from sprint_management import SprintIndex
+from sprint_management import SprintManager
+from sprint_management import format_date
+from sprint_management import parse_date
+
+
+START = datetime(2021, 1, 4, tzinfo=timezone.utc)
+
+
+def _sprint(sprint_id, start_day, days):
+    start = START + timedelta(days=start_day)
+    return {'id': sprint_id, 'name': f"S{sprint_id}", 'startDate': format_date(start), 'endDate': format_date(start + timedelta(days=days))}
+
+
+def _overlapping(sprints, start, end):
+    """The sprints overlapping [start, end) found with a linear scan."""
+    return sorted(
+        (s for s in sprints if parse_date(s['startDate']) < end and parse_date(s['endDate']) > start),
+        key=lambda s: parse_date(s['startDate'])
+    )
+
+
+def test_parse_date():
+    assert parse_date('2015-04-11T15:22:00.000Z') == datetime(2015, 4, 11, 15, 22, tzinfo=timezone.utc)
+    assert parse_date('2015-04-11') == datetime(2015, 4, 11, tzinfo=timezone.utc)
+
+
+def test_boundaries():
+    # touching sprints, an overlapping one and one without dates
+    index = SprintIndex([_sprint(1, 0, 14), _sprint(2, 14, 14), _sprint(3, 10, 7), {'id': 4, 'name': 'S4'}])
+    assert [s['id'] for s in index] == [1, 3, 2]
+    assert [s['id'] for s in index.undated] == [4]
+    # the end of a sprint is exclusive
+    assert index.sprint_for_date(START + timedelta(days=14))['id'] == 2
+    assert index.sprint_for_date(START - timedelta(microseconds=1)) is None
+    # when sprints overlap the one that started last wins
+    assert index.sprint_for_date(START + timedelta(days=12))['id'] == 3
+    assert [s['id'] for s in index.sprints_in_range(START + timedelta(days=14), START + timedelta(days=15))] == [3, 2]
+    assert index.sprints_in_range(START + timedelta(days=28), START + timedelta(days=40)) == []
+    # a zero-length range only overlaps the sprints strictly around it
+    assert [s['id'] for s in index.sprints_in_range(START + timedelta(days=14), START + timedelta(days=14))] == [3]
+
+
+def test_longer_sprint_added_later():
+    index = SprintIndex([_sprint(1, 0, 1), _sprint(2, 5, 1)])
+    index.add(_sprint(3, -30, 60))
+    assert index.sprint_for_date(START + timedelta(days=20))['id'] == 3
+    assert [s['id'] for s in index.sprints_in_range(START + timedelta(days=4), START + timedelta(days=6))] == [3, 2]
+
+
+def test_matches_linear_scan():
+    rng = random.Random(0)
+    sprints = [_sprint(i, rng.randint(0, 200), rng.choice([0, 1, 7, 14, 60])) for i in range(300)]
+    index = SprintIndex(sprints[:150])
+    for sprint in sprints[150:]:
+        index.add(sprint)
+    for _ in range(500):
+        start = START + timedelta(days=rng.randint(-10, 270), hours=rng.choice([0, 12]))
+        end = start + timedelta(days=rng.choice([0, 0, 1, 14, 30]))
+        expected = _overlapping(sprints, start, end)
+        assert sorted(s['id'] for s in index.sprints_in_range(start, end)) == sorted(s['id'] for s in expected)
+        covering = _overlapping(sprints, start, start + timedelta(microseconds=1))
+        latest_start = max((parse_date(s['startDate']) for s in covering), default=None)
+        found = index.sprint_for_date(start)
+        assert (found and parse_date(found['startDate'])) == latest_start
+
+
+def test_get_missing_intervals():
+    index = SprintIndex([_sprint(1, 7, 7), _sprint(2, 20, 3)])
+    day = timedelta(days=1)
+    intervals = index.get_missing_intervals(START, START + 30 * day, 7 * day)
+    # a full sprint doesn't fit between day 14 and day 20
+    assert [((s - START).days, (e - START).days) for s, e in intervals] == [(0, 7), (23, 30)]
+    assert index.get_missing_intervals(START, START, 7 * day) == []
+    with pytest.raises(ValueError):
+        index.get_missing_intervals(START, START + day, timedelta(0))
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, payload=None, text=''):
+        self.status_code = status_code
+        self.payload = payload
+        self.text = text
+
+    def json(self):
+        return self.payload
+
+
+class FakeClient:
+
+    max_workers = 4
+
+    def __init__(self, sprints):
+        self.sprints = sprints
+        self.created = []
+
+    def get_board_sprints(self, board_id, state=None):
+        if board_id not in self.sprints:
+            raise RuntimeError(f"No board {board_id}")
+        return self.sprints[board_id]
+
+    def create_sprint(self, name, board_id, start_date=None, end_date=None, goal=None):
+        if name.startswith('Bad'):
+            return FakeResponse(400, text='Bad name')
+        self.created.append(name)
+        sprint = {'id': 100 + len(self.created), 'name': name, 'startDate': start_date, 'endDate': end_date}
+        return FakeResponse(201, sprint)
+
+
+def test_manager_plan_and_apply():
+    client = FakeClient({12: [_sprint(1, 7, 7)], 34: []})
+    manager = SprintManager(client)
+    boards = [
+        {'board_id': 12, 'duration_days': 7, 'name_format': 'Sprint {number}'},
+        {'board_id': 34, 'duration_days': 14, 'name_format': 'Bad {number}'},
+    ]
+    plan = manager.plan(boards, START, START + timedelta(days=21))
+    assert [(s['board_id'], s['name'], s['startDate']) for s in plan] == [
+        (12, 'Sprint 1', '2021-01-04T00:00:00.000+00:00'),
+        (12, 'Sprint 2', '2021-01-18T00:00:00.000+00:00'),
+        (34, 'Bad 1', '2021-01-04T00:00:00.000+00:00'),
+        (34, 'Bad 2', '2021-01-18T00:00:00.000+00:00'),
+    ]
+    results = manager.apply(plan)
+    assert [r['sprint'] for r in results] == plan
+    assert [(r['ok'], r['status_code']) for r in results] == [(True, 201), (True, 201), (False, 400), (False, 400)]
+    # the created sprints are indexed, so planning again has nothing to do on board 12
+    assert [s['name'] for s in manager.get_sprints(12, START, START + timedelta(days=21))] == ['Sprint 1', 'S1', 'Sprint 2']
+    assert [s['board_id'] for s in manager.plan(boards, START, START + timedelta(days=21))] == [34, 34]
+
+
+def test_manager_load_fails_on_missing_board():
+    with pytest.raises(RuntimeError, match='the sprints of 1 boards'):
+        SprintManager(FakeClient({12: []})).load([12, 56])
@@ -1,4 +1,7 @@
 import logging
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 
 
 def get_logger(name, debug=False, info=True):
@@ -20,6 +23,103 @@ def get_logger(name, debug=False, info=True):
 _LOGGER = get_logger(__name__)
 
 
+def map_concurrently(func, items, max_workers):
+    """Call func once per item on a thread pool with a bounded number of calls in flight.
+    Items are consumed lazily so a large iterable is never submitted all at once.
+
+    Args:
+        func (callable): A function that takes a single item.
+        items (iterable): The items to pass to func.
+        max_workers (int): The maximum number of calls in flight.
+
+    Yields:
+        tuple: (item, result, exception) in the order the calls complete. exception is None if the
+            call succeeded and result is None if it failed.
+    """
+    items = iter(items)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def submit_next_item():
+            for item in items:
+                in_flight[executor.submit(func, item)] = item
+                return
+
+        try:
+            for _ in range(max_workers):
+                submit_next_item()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    submit_next_item()
+                    exception = future.exception()
+                    yield item, None if exception else future.result(), exception
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def get_all_concurrently(func, items, max_workers, description):
+    """Call func once per item with map_concurrently and fail if any call fails. Used to read the
+    state a plan is computed from, since a plan based on a partial view would make wrong changes.
+
+    Args:
+        func (callable): A function that takes a single item.
+        items (iterable): The items to pass to func.
+        max_workers (int): The maximum number of calls in flight.
+        description (str): What is read, for the error message, with {} standing for the number
+            of failed items, e.g. `the members of {} groups`.
+
+    Returns:
+        dict: item to result, in the order of the items
+
+    Raises:
+        RuntimeError: if func raises for any item
+    """
+    items = list(items)
+    results = {}
+    failed = {}
+    for item, result, exception in map_concurrently(func, items, max_workers):
+        if exception:
+            failed[item] = exception
+        else:
+            results[item] = result
+    if failed:
+        raise RuntimeError(f"Failed to get {description.format(len(failed))}: {failed}")
+    return {item: results[item] for item in items}
+
+
+def apply_concurrently(func, plan, max_workers, ok_status_codes, key):
+    """Call func once per change of a plan with map_concurrently and collect one result per
+    change, in the order of the plan.
+
+    Args:
+        func (callable): A function that takes a single change and returns a response.
+        plan (list): The changes to pass to func.
+        max_workers (int): The maximum number of calls in flight.
+        ok_status_codes (tuple[int]): The status codes of a successful response.
+        key (str): The key of the change in its result.
+
+    Returns:
+        list[dict]: one result per change with the keys <key> (the change), ok (bool), status_code
+            (int or None) and error (str or None)
+    """
+    results = [None] * len(plan)
+    for i, response, exception in map_concurrently(lambda i: func(plan[i]), range(len(plan)), max_workers):
+        if exception:
+            results[i] = {key: plan[i], 'ok': False, 'status_code': None, 'error': str(exception)}
+            continue
+        ok = response.status_code in ok_status_codes
+        results[i] = {
+            key: plan[i],
+            'ok': ok,
+            'status_code': response.status_code,
+            'error': None if ok else response.text,
+        }
+    return results
+
+
 def y_n_input(prompt):
     answer = None
     invalid_prefix = ''